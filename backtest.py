@@ -0,0 +1,327 @@
+import os
+import json
+import argparse
+import contextlib
+import numpy as np
+from client import order_body
+from portfolio import PortfolioSnapshot
+from strategy import OPEN
+from trading import TradingBot
+from signals import Signal
+from config import (
+    SYMBOL, BASE_CURRENCY, QUOTE_CURRENCY,
+    SIGNAL_CHECK_INTERVAL, BACKTEST_FEE
+)
+
+SCAN_BLOCK = 1 << 16    # ticks/polls examined per vectorized search step
+
+
+class SimulatedClient:
+    """Drop-in for OKXClient during a backtest.
+
+    Market orders fill at the current replay price with OKX spot semantics:
+    a buy's `sz` is USDT, a sell's `sz` is PI, and the fee comes off what
+    is received. Orders larger than the available balance are rejected.
+    Limit-type orders fill the same way at once (there is no book to rest on).
+    """
+
+    def __init__(self, usdt, pi, fee=BACKTEST_FEE):
+        self.balances = {BASE_CURRENCY: float(usdt), QUOTE_CURRENCY: float(pi)}
+        self.fee = fee
+        self.price = None
+        self.index = 0
+        self.order_listeners = []
+        self.price_feed = None
+        self.fills = []                             # (index, side, price, base, quote, fee)
+        self.balance_history = [(0, float(usdt), float(pi))]
+        self.orders = {}                            # clOrdId -> OKX-shaped order
+
+    def get_price(self, symbol=SYMBOL):
+        return self.price
+
+    def get_balances(self, currencies):
+        return {ccy: self.balances.get(ccy, 0.0) for ccy in currencies}
+
+    def get_balance(self, currency):
+        return self.balances.get(currency, 0.0)
+
+    def get_position_size(self, currency):
+        return self.get_balance(currency)
+
+    def place_order(self, side, amount, symbol=SYMBOL, ord_type="market", px=None, cl_ord_id=None):
+        price = self.price
+        if side == "long":
+            quote = amount if ord_type == "market" else amount * price
+            if not 0 < quote <= self.balances[BASE_CURRENCY]:
+                return {"code": "51008", "msg": "Insufficient USDT balance", "data": []}
+            base = quote / price
+            fee = base * self.fee
+            self.balances[BASE_CURRENCY] -= quote
+            self.balances[QUOTE_CURRENCY] += base - fee
+            fee *= price
+        else:
+            base = amount
+            if not 0 < base <= self.balances[QUOTE_CURRENCY]:
+                return {"code": "51008", "msg": "Insufficient PI balance", "data": []}
+            quote = base * price
+            fee = quote * self.fee
+            self.balances[QUOTE_CURRENCY] -= base
+            self.balances[BASE_CURRENCY] += quote - fee
+
+        self.fills.append((self.index, side, price, base, quote, fee))
+        self.balance_history.append((self.index, self.balances[BASE_CURRENCY], self.balances[QUOTE_CURRENCY]))
+        ord_id = str(len(self.fills))
+        self.orders[cl_ord_id or ord_id] = {
+            "ordId": ord_id, "clOrdId": cl_ord_id or "", "state": "filled", "accFillSz": str(base),
+            "avgPx": str(price), "fee": str(-(fee / price if side == "long" else fee)),
+        }
+        response = {"code": "0", "msg": "", "data": [{"ordId": ord_id, "clOrdId": cl_ord_id or "", "sCode": "0"}]}
+        for listener in self.order_listeners:
+            listener(order_body(side, amount, symbol, ord_type, px, cl_ord_id), response)
+        return response
+
+    def place_orders(self, orders):
+        data = []
+        for order in orders:
+            response = self.place_order(**order)
+            data.extend(response["data"] or [{"clOrdId": order.get("cl_ord_id") or "", "sCode": response["code"],
+                                               "sMsg": response["msg"]}])
+        return {"code": "0" if all(item["sCode"] == "0" for item in data) else "2", "msg": "", "data": data}
+
+    def get_order(self, symbol=SYMBOL, ord_id=None, cl_ord_id=None):
+        order = self.orders.get(cl_ord_id or ord_id)
+        if order is None:
+            return {"code": "51603", "msg": "Order does not exist", "data": []}
+        return {"code": "0", "msg": "", "data": [order]}
+
+    def cancel_order(self, symbol=SYMBOL, ord_id=None, cl_ord_id=None):
+        # Everything fills on placement, so there is never anything to cancel
+        return {"code": "1", "msg": "", "data": [{"sCode": "51400", "sMsg": "Order already filled"}]}
+
+
+def load_prices(path):
+    # .npz with `ts` (ms) and `price` arrays, or CSV with a ts column and `close` or `price`
+    if path.endswith(".npz"):
+        data = np.load(path)
+        return data["ts"].astype(np.int64), data["price"].astype(np.float64)
+    table = np.genfromtxt(path, delimiter=",", names=True)
+    column = "close" if "close" in table.dtype.names else "price"
+    return table["ts"].astype(np.int64), table[column].astype(np.float64)
+
+
+def load_signals(path):
+    # JSON lines, one recorded signal-server payload per line plus its `ts` (ms)
+    signals = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                signals.append(json.loads(line))
+    signals.sort(key=lambda item: int(item["ts"]))
+    return np.array([int(item["ts"]) for item in signals], dtype=np.int64), signals
+
+
+def trailing_scan(trailing, values, pi_balance):
+    """PortfolioTrailing.on_value applied to every element of `values` at once.
+
+    Balances are constant between fills, so the only state is the running
+    peak. Returns (offset of the first force-sell or None, point, trigger,
+    active), where the state is what on_value would hold after
+    values[:offset] (or after all values when nothing fires).
+    """
+    point, trigger, active = trailing.init_tracking_point, trailing.tracking_trigger, trailing.tracking_active
+    if not len(values):
+        return None, point, trigger, active
+    start = 0
+    if not active:
+        above = values > point * trailing.activate
+        if not above.any():
+            return None, point, trigger, active
+        start = int(above.argmax())
+
+    peak = np.maximum.accumulate(np.maximum(values[start:], point))
+    triggers = np.where(peak > point, peak * trailing.giveback, trigger)
+
+    if pi_balance > 0:
+        hits = values[start:] < triggers
+        if hits.any():
+            offset = int(hits.argmax())
+            if offset == 0:
+                return start, point, trigger, active
+            return start + offset, float(peak[offset - 1]), float(triggers[offset - 1]), True
+    return None, float(peak[-1]), float(triggers[-1]), True
+
+
+class Backtest:
+    """Replays a price series and a recorded signal stream through TradingBot.
+
+    All decisions are made by the live TradingBot / PositionState code
+    against a SimulatedClient. NumPy is only used to jump over stretches
+    where that code provably does nothing: ticks while idle, ticks below
+    the TP/DCA levels of an open position, and bot_loop polls where the
+    portfolio trailing stop does not fire and no trade can open.
+    """
+
+    def __init__(self, ts, prices, signal_ts, signals, usdt=1000.0, pi=0.0,
+                 poll_interval=SIGNAL_CHECK_INTERVAL, fee=BACKTEST_FEE, params=None):
+        self.ts = ts
+        self.prices = prices
+        self.signals = [Signal.from_payload(item) for item in signals]
+
+        self.client = SimulatedClient(usdt, pi, fee)
+        self.client.price = float(prices[0])
+        self.bot = TradingBot(exchange=self.client, snapshot=PortfolioSnapshot(self.client, ttl=0), params=params).warm()
+
+        # bot_loop polls every poll_interval seconds and sees the last tick at or before the poll
+        poll_times = np.arange(ts[0], ts[-1] + 1, int(poll_interval * 1000))
+        self.polls = np.unique(np.maximum(np.searchsorted(ts, poll_times, side="right") - 1, 0))
+
+        # The signal server always answers with its latest signal; the trailing 0
+        # makes index -1 (no signal recorded yet) read as "nothing to trade"
+        sides = np.array([self._side(signal) for signal in self.signals] + [0], dtype=np.int8)
+        self.poll_signal = np.searchsorted(signal_ts, ts[self.polls], side="right") - 1
+        self.poll_side = sides[self.poll_signal]
+
+    @classmethod
+    def from_files(cls, prices_path, signals_path, **kwargs):
+        ts, prices = load_prices(prices_path)
+        signal_ts, signals = load_signals(signals_path)
+        return cls(ts, prices, signal_ts, signals, **kwargs)
+
+    @staticmethod
+    def _side(signal):
+        if signal.pair != SYMBOL.upper():
+            return 0
+        return {"long": 1, "short": -1}.get(signal.signal, 0)
+
+    def run(self, quiet=True):
+        with open(os.devnull, "w") as devnull:
+            with contextlib.redirect_stdout(devnull) if quiet else contextlib.nullcontext():
+                self._run()
+        return self.results()
+
+    def _run(self):
+        n, polls = len(self.prices), self.polls
+        i, k = 0, 0
+        while True:
+            j = self._next_tick_event(i)
+            # A poll on the same tick as a tick event runs after it
+            k_end = len(polls) if j >= n else int(np.searchsorted(polls, j, side="left"))
+            act = self._next_poll_event(k, k_end)
+            if act is not None:
+                self._poll(act)
+                i = max(i, int(polls[act]) + 1)
+                k = act + 1
+                continue
+            k = k_end
+            if j >= n:
+                break
+            self._tick(j)
+            i = j + 1
+
+    def _next_tick_event(self, i):
+        position = self.bot.position
+        n = len(self.prices)
+        if not position.active:
+            return n
+        if position.state != OPEN:
+            return i        # armed/trailing: the locked TP moves, step every tick
+
+        entry, long = position.entry_price, position.side == "long"
+        for start in range(i, n, SCAN_BLOCK):
+            p = self.prices[start:start + SCAN_BLOCK]
+            change = (p - entry) / entry
+            if not long:
+                change = -change
+            dca = p <= position.dca_target if long else p >= position.dca_target
+            hit = (change >= position.tp_threshold) | ((change <= position.sl_threshold) & dca)
+            if hit.any():
+                return start + int(hit.argmax())
+        return n
+
+    def _next_poll_event(self, k, k_end):
+        trailing = self.bot.trailing
+        usdt = self.client.balances[BASE_CURRENCY]
+        pi = self.client.balances[QUOTE_CURRENCY]
+        idle = not self.bot.position.active
+        long_threshold = self.bot.params["long_threshold"]
+        short_threshold = self.bot.params["short_threshold"]
+
+        for start in range(k, k_end, SCAN_BLOCK):
+            stop = min(start + SCAN_BLOCK, k_end)
+            p = self.prices[self.polls[start:stop]]
+            values = usdt + (pi * p)
+
+            fire, *state = trailing_scan(trailing, values, pi)
+            opening = None
+            if idle:
+                side = self.poll_side[start:stop]
+                can_long = (side == 1) & ~(usdt < long_threshold * values)
+                can_short = (side == -1) & ~(pi * p < short_threshold * values)
+                candidates = can_long | can_short
+                if candidates.any():
+                    opening = int(candidates.argmax())
+
+            if opening is not None and (fire is None or opening < fire):
+                _, *state = trailing_scan(trailing, values[:opening], pi)
+                fire = opening
+            trailing.init_tracking_point, trailing.tracking_trigger, trailing.tracking_active = state
+            if fire is not None:
+                return start + fire
+        return None
+
+    def _poll(self, k):
+        q = int(self.polls[k])
+        price = float(self.prices[q])
+        self.client.price, self.client.index = price, q
+        try:
+            self.bot.check_portfolio_trailing()
+            if not self.bot.active_position and self.poll_side[k] != 0:
+                signal = self.signals[self.poll_signal[k]]
+                self.bot.open_position(signal.signal, price, signal)
+        except Exception as e:
+            print(f"[ERROR] Main loop logic failed: {e}")
+
+    def _tick(self, j):
+        price = float(self.prices[j])
+        self.client.price, self.client.index = price, j
+        self.bot.check_tp_sl(price)
+
+    def results(self):
+        history = np.array(self.client.balance_history)
+        segment = np.searchsorted(history[:, 0], self.polls, side="right") - 1
+        equity = history[segment, 1] + history[segment, 2] * self.prices[self.polls]
+        peak = np.maximum.accumulate(equity)
+
+        start_value = history[0, 1] + history[0, 2] * self.prices[0]
+        final_value = self.client.balances[BASE_CURRENCY] + self.client.balances[QUOTE_CURRENCY] * self.prices[-1]
+        return {
+            "start_value": round(float(start_value), 4),
+            "final_value": round(float(final_value), 4),
+            "pnl": round(float(final_value - start_value), 4),
+            "pnl_percent": round(float((final_value - start_value) / start_value * 100), 4),
+            "max_drawdown_percent": round(float(((peak - equity) / peak).max() * 100), 4),
+            "trade_count": len(self.client.fills),
+            "fees": round(sum(fill[5] for fill in self.client.fills), 6),
+            "tp_count": self.bot.tp_count,
+            "dca_count": self.bot.dca_count,
+            "profit_capture": self.bot.profit_capture,
+            "loss_limit": self.bot.loss_limit,
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the TradingBot strategy on recorded data")
+    parser.add_argument("prices", help="CSV (ts,price|close) or .npz (ts, price) price series, ts in ms")
+    parser.add_argument("signals", help="JSON lines of recorded signal payloads with a ts field (ms)")
+    parser.add_argument("--usdt", type=float, default=1000.0)
+    parser.add_argument("--pi", type=float, default=0.0)
+    parser.add_argument("--poll-interval", type=float, default=SIGNAL_CHECK_INTERVAL)
+    parser.add_argument("--fee", type=float, default=BACKTEST_FEE)
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's own log lines")
+    args = parser.parse_args()
+
+    backtest = Backtest.from_files(
+        args.prices, args.signals, usdt=args.usdt, pi=args.pi,
+        poll_interval=args.poll_interval, fee=args.fee
+    )
+    print(json.dumps(backtest.run(quiet=not args.verbose), indent=2))
@@ -0,0 +1,336 @@
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import tempfile
+import argparse
+import threading
+import contextlib
+
+# The API benchmark boots main.py against the local simulator; these must be
+# set before config is imported so nothing can reach the real exchange.
+_workdir = tempfile.mkdtemp(prefix="okx-bench-")
+os.environ.update({
+    "OKX_API_KEY": "bench", "OKX_SECRET_KEY": "bench", "OKX_PASSPHRASE": "bench",
+    "SIGNAL_SERVER_URL": "",
+    "STATE_DIR": os.path.join(_workdir, "state"),
+    "HISTORY_DB_PATH": os.path.join(_workdir, "history.db"),
+    "TAPE_DIR": os.path.join(_workdir, "tapes"),
+})
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+SIM_PORT = _free_port()
+os.environ["OKX_BASE_URL"] = f"http://127.0.0.1:{SIM_PORT}"
+os.environ["OKX_WS_PUBLIC_URL"] = f"ws://127.0.0.1:{SIM_PORT}/ws/v5/public"
+os.environ["OKX_WS_PRIVATE_URL"] = f"ws://127.0.0.1:{SIM_PORT}/ws/v5/private"
+
+import numpy as np
+import httpx
+import uvicorn
+from backtest import SimulatedClient
+from portfolio import PortfolioSnapshot
+from order_book import OrderBook
+from trading import TradingBot
+from signals import Signal, SignalInbox
+from indicators import IndicatorEngine
+from ledger import TradeLedger
+from simulator import SimulatedExchange, SimulatorServer
+from config import SYMBOL
+
+DEFAULT_BASELINE = "bench_baseline.json"
+TOLERANCE = 0.25            # allowed p99 growth over the baseline
+NOISE_FLOOR_US = 50         # p99 changes below this are never a regression
+
+
+class CountingClient(SimulatedClient):
+    """SimulatedClient that counts every exchange call the bot makes."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+
+    def get_price(self, symbol=SYMBOL):
+        self.calls += 1
+        return super().get_price(symbol)
+
+    def get_balances(self, currencies):
+        self.calls += 1
+        return super().get_balances(currencies)
+
+    def place_order(self, side, amount, symbol=SYMBOL, **order):
+        self.calls += 1
+        return super().place_order(side, amount, symbol, **order)
+
+    def get_order(self, symbol=SYMBOL, **ids):
+        self.calls += 1
+        return super().get_order(symbol, **ids)
+
+
+@contextlib.contextmanager
+def quiet_and_awake():
+    # Bot methods print freely and must never block on time.sleep during a benchmark
+    sleep, time.sleep = time.sleep, lambda seconds: None
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            yield
+    finally:
+        time.sleep = sleep
+
+
+def summarize(samples_ns, calls=None):
+    samples = np.asarray(samples_ns, dtype=np.float64) / 1000
+    result = {
+        "ops": len(samples),
+        "mean_us": round(float(samples.mean()), 3),
+        "p50_us": round(float(np.percentile(samples, 50)), 3),
+        "p99_us": round(float(np.percentile(samples, 99)), 3),
+    }
+    if calls is not None:
+        result["requests_per_op"] = round(calls / len(samples), 3)
+    return result
+
+
+def _timed(op, count, client, setup=None):
+    samples = []
+    calls = 0
+    for i in range(count):
+        if setup:
+            setup(i)
+        before = client.calls
+        start = time.perf_counter_ns()
+        op(i)
+        samples.append(time.perf_counter_ns() - start)
+        calls += client.calls - before
+    return summarize(samples, calls)
+
+
+def _full_book(price, levels=400):
+    exchange = SimulatedExchange(prices={SYMBOL: float(price)}, depth=levels, level_size=50.0)
+    book = OrderBook(SYMBOL)
+    book.apply("snapshot", json.loads(exchange.books_snapshot(SYMBOL))["data"][0])
+    return book
+
+
+def bench_decisions(count=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    client = CountingClient(usdt=100000.0, pi=20000.0)
+    client.price = 2.0
+    # ttl=0: every portfolio read goes to the client, as it would once a live snapshot expires
+    bot = TradingBot(exchange=client, snapshot=PortfolioSnapshot(client, ttl=0)).warm()
+    signal = Signal.from_payload({"pair": SYMBOL, "signal": "long", "tp": 0.01, "sl": 0.005, "dca_trigger": 1.5})
+    # Ticks inside the TP/DCA band: the common case, no order
+    prices = 2.0 * (1 + rng.uniform(-0.004, 0.004, count))
+    results = {}
+
+    with quiet_and_awake():
+        bot.open_position("long", 2.0, signal)
+
+        def tick(i):
+            client.price = prices[i]
+            bot.check_tp_sl(prices[i])
+        results["check_tp_sl"] = _timed(tick, count, client)
+
+        def trailing(i):
+            client.price = prices[i]
+            bot.check_portfolio_trailing()
+        results["check_portfolio_trailing"] = _timed(trailing, count, client)
+
+        results["calculate_amount"] = _timed(lambda i: bot.calculate_amount(0.03, prices[i]), count, client)
+
+        # Depth-aware sizing against a full 400-level book, as the live `books` channel sends
+        bot.book = _full_book(prices[0])
+        results["calculate_amount_depth"] = _timed(
+            lambda i: bot.calculate_amount(0.03, prices[i], side="long"), count, client)
+        bot.book = None
+
+        # In-process signals: one streamed tick through bars, RSI, MACD and divergence
+        engine = IndicatorEngine(SignalInbox(), [SYMBOL])
+        results["indicator_tick"] = _timed(
+            lambda i: engine.on_tick(SYMBOL, prices[i], None, None, 1_700_000_000_000 + i * 10000), count, client)
+
+        # Trade ledger: one orders-channel fill push, alternating entries and closes
+        ledger = TradeLedger([SYMBOL])
+        ledger.seed(SYMBOL, (100000.0, 60000.0, 20000.0, 2.0))
+
+        def fill(i):
+            cl_ord_id = f"okxt{i:027d}"
+            entry = i % 2 == 0
+            ledger.expect(cl_ord_id, SYMBOL, "open" if entry else "close", "long" if entry else "short")
+            ledger.on_order({"instId": SYMBOL, "ordId": str(i), "clOrdId": cl_ord_id, "side": "buy" if entry else "sell",
+                             "fillSz": "100", "accFillSz": "100", "fillPx": str(prices[i]), "fillFee": "-0.1",
+                             "fillFeeCcy": "PI" if entry else "USDT", "state": "filled", "uTime": str(i)})
+        results["ledger_fill"] = _timed(fill, count, client)
+
+        def flat(i):
+            bot.reset_session()
+            client.balances.update(USDT=100000.0, PI=20000.0)
+        results["open_position"] = _timed(lambda i: bot.open_position("long", 2.0, signal), count // 4, client, flat)
+    return results
+
+
+class AppServer:
+    def __init__(self, app, port):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.url = f"http://127.0.0.1:{port}"
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def _exchange_requests():
+    from metrics import OKX_REQUEST
+    with OKX_REQUEST._lock:
+        return sum(series[2] for series in OKX_REQUEST._series.values())
+
+
+async def _load_endpoint(url, clients, requests_each):
+    samples = []
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=clients)) as http:
+        async def worker():
+            for _ in range(requests_each):
+                start = time.perf_counter_ns()
+                response = await http.get(url)
+                samples.append(time.perf_counter_ns() - start)
+                assert response.status_code < 500, f"{url} -> {response.status_code}"
+
+        before = _exchange_requests()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+        exchange_calls = _exchange_requests() - before
+
+    result = summarize(samples)
+    result["rps"] = round(len(samples) / elapsed, 1)
+    result["requests_per_op"] = round(exchange_calls / len(samples), 3)
+    return result
+
+
+async def _logs_fanout(main, url, clients, events):
+    # Every subscriber must see every event; latency is append -> receipt
+    samples, received = [], [0] * clients
+    ready = asyncio.Event()
+    connected = 0
+
+    async def subscriber(index, http):
+        nonlocal connected
+        async with http.stream("GET", url) as response:
+            connected += 1
+            if connected == clients:
+                ready.set()
+            async for line in response.aiter_lines():
+                if not line.startswith("data: ") or "[BENCH]" not in line:
+                    continue
+                sent_at = int(line.rsplit(" ", 1)[1])
+                samples.append(time.perf_counter_ns() - sent_at)
+                received[index] += 1
+                if received[index] == events:
+                    return
+
+    async with httpx.AsyncClient(timeout=30, limits=httpx.Limits(max_connections=clients + 1)) as http:
+        tasks = [asyncio.create_task(subscriber(i, http)) for i in range(clients)]
+        await asyncio.wait_for(ready.wait(), 10)
+        await asyncio.sleep(0.2)
+        for i in range(events):
+            # From a worker thread, like the bot's order path
+            await asyncio.to_thread(main.log_event, f"[BENCH] {i} {time.perf_counter_ns()}")
+        await asyncio.wait_for(asyncio.gather(*tasks), 30)
+
+    result = summarize(samples)
+    result["delivered"] = round(sum(received) / (clients * events), 3)
+    return result
+
+
+def bench_api(clients=50, requests_each=20, log_clients=50, log_events=100):
+    exchange = SimulatedExchange({"USDT": 1000.0, "PI": 500.0}, {SYMBOL: 2.0})
+    simulator = SimulatorServer(exchange, port=SIM_PORT).start()
+    with quiet_and_awake():
+        import main
+    server = AppServer(main.app, _free_port()).start()
+    try:
+        time.sleep(1)       # lifespan: first portfolio refresh and feed subscription
+        exchange.set_price(SYMBOL, 2.01)
+
+        async def run():
+            results = {}
+            for path in ("/stats", "/api/position", "/api/portfolio"):
+                results[path] = await _load_endpoint(server.url + path, clients, requests_each)
+            results["/logs"] = await _logs_fanout(main, server.url + "/logs", log_clients, log_events)
+            return results
+
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            return asyncio.run(run())
+    finally:
+        server.stop()
+        simulator.stop()
+
+
+def compare(current, baseline, tolerance=TOLERANCE):
+    # Returns human-readable regressions: p99 growth beyond tolerance, or more exchange requests per op
+    regressions = []
+    for group, benches in baseline.items():
+        for name, old in benches.items():
+            new = current.get(group, {}).get(name)
+            if new is None:
+                continue
+            limit = max(old["p99_us"] * (1 + tolerance), old["p99_us"] + NOISE_FLOOR_US)
+            if new["p99_us"] > limit:
+                regressions.append(f"{group}/{name}: p99 {new['p99_us']}us > {round(limit, 3)}us (baseline {old['p99_us']}us)")
+            if new.get("requests_per_op", 0) > old.get("requests_per_op", 0) + 1e-9:
+                regressions.append(f"{group}/{name}: {new['requests_per_op']} exchange requests/op "
+                                   f"(baseline {old['requests_per_op']})")
+            if new.get("delivered", 1) < old.get("delivered", 1):
+                regressions.append(f"{group}/{name}: delivered {new['delivered']} (baseline {old['delivered']})")
+    return regressions
+
+
+def print_results(results):
+    for group, benches in results.items():
+        print(f"[BENCH] {group}")
+        for name, stats in benches.items():
+            print(f"  {name:28} " + "  ".join(f"{key}={value}" for key, value in stats.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the decision path and the dashboard API")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--ops", type=int, default=20000)
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client per endpoint")
+    args = parser.parse_args()
+
+    results = {"decision": bench_decisions(args.ops)}
+    if not args.skip_api:
+        results["api"] = bench_api(args.clients, args.requests, args.clients)
+    print_results(results)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[BENCH] Baseline written to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"[REGRESSION] {line}")
+        if regressions:
+            sys.exit(1)
+        print("[BENCH] No regressions against the baseline.")
@@ -3,54 +3,27 @@ import json
 import base64
 import hmac
 import hashlib
+import asyncio
+import threading
 import requests
+import httpx
+from requests.adapters import HTTPAdapter
+from urllib.parse import urlencode
 from datetime import datetime
-from config import OKX_API_KEY, OKX_SECRET_KEY, OKX_PASSPHRASE, OKX_BASE_URL, SYMBOL
-import os
-import okx.Account as Account
+from ratelimit import LIMITER, THROTTLED, current_lane
+from metrics import OKX_REQUEST
+from config import (
+    OKX_API_KEY, OKX_SECRET_KEY, OKX_PASSPHRASE, OKX_BASE_URL, SYMBOL,
+    REQUEST_TIMEOUT, HTTP_POOL_SIZE, RATE_LIMIT_RETRIES
+)
 
-# Set flag to "0" for live trading or "1" for demo trading
-flag = "0"
-
-# Initialize the Account API client
-accountAPI = Account.AccountAPI(OKX_API_KEY, OKX_SECRET_KEY, OKX_PASSPHRASE, False, flag)
-
-class OKXClient:
+class OKXAuth:
     def __init__(self):
         self.api_key = OKX_API_KEY
         self.api_secret = OKX_SECRET_KEY
         self.api_passphrase = OKX_PASSPHRASE
         self.base_url = OKX_BASE_URL
 
-        self.session = requests.Session()
-        self.session.headers.update({
-            "Content-Type": "application/json"
-        })
-
-    def test_connection(self):
-        try:
-            # Fetch balance info using get_balance instead of get_account_assets
-            result = accountAPI.get_balance()
-            
-            # Print the result
-            print(result)
-            
-            # Check if API credentials are working
-            if result and result.get("code") == "0":
-                print("[INFO] API credentials are working.")
-                
-                # Parse and print asset balances
-                for asset in result['data']:
-                    print(f"Asset: {asset['coin']}, Available Balance: {asset['available']}")
-                
-                return True
-            else:
-                print("[ERROR] API credentials test failed.")
-                return False
-        except Exception as e:
-            print(f"[ERROR] Test connection failed: {e}")
-            return False
-
     def _get_timestamp(self):
         return datetime.utcnow().isoformat("T", "milliseconds") + "Z"
 
@@ -70,68 +43,391 @@ class OKXClient:
             "Content-Type": "application/json"
         }
 
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class OKXClient(OKXAuth):
+    def __init__(self, limiter=LIMITER):
+        super().__init__()
+        self.limiter = limiter
+        # Identical GETs already on the wire: later callers wait for the first one's answer
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Content-Type": "application/json"
+        })
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # listener(request body, response) after every order or cancel, e.g. to drop cached balances
+        self.order_listeners = []
+        # Optional market_feed.TickerFeed; get_price reads from it when fresh
+        self.price_feed = None
+
+    def test_connection(self):
+        # A signed balance call proves the key, passphrase and signature are accepted
+        result = self._request("GET", "/api/v5/account/balance")
+        if result and result.get("code") == "0":
+            print("[INFO] API credentials are working.")
+            for asset in result["data"][0].get("details", []):
+                print(f"Asset: {asset['ccy']}, Available Balance: {asset['availBal']}")
+            return True
+        print(f"[ERROR] API credentials test failed: {result}")
+        return False
+
     def _request(self, method, path, params=None, body=None):
+        # The query string is part of what OKX signs
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        if method != "GET":
+            return self._send(method, path, body)
+
+        with self._inflight_lock:
+            call = self._inflight.get(path)
+            leader = call is None
+            if leader:
+                call = self._inflight[path] = _InFlight()
+        if not leader:
+            call.done.wait()
+            return call.result
+        try:
+            call.result = self._send(method, path)
+            return call.result
+        finally:
+            with self._inflight_lock:
+                del self._inflight[path]
+            call.done.set()
+
+    def _send(self, method, path, body=None):
+        endpoint = path.split("?")[0]
+        lane = current_lane(method, endpoint)
         url = self.base_url + path
         body_json = json.dumps(body) if body else ""
-        headers = self._auth_headers(self._get_timestamp(), method, path, body_json)  # Fix this call
 
-        try:
-            if method == "GET":
-                response = self.session.get(url, params=params, headers=headers)
-            else:
-                response = self.session.request(method, url, headers=headers, data=body_json)
-            response.raise_for_status()
-            return response.json()
-        except Exception as e:
-            print(f"[ERROR] API request failed: {e}")
-            return None
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            self.limiter.acquire(endpoint, lane)
+            headers = self._auth_headers(self._get_timestamp(), method, path, body_json)
+            started, response = time.perf_counter(), None
+            try:
+                response = self.session.request(method, url, headers=headers, data=body_json or None, timeout=REQUEST_TIMEOUT)
+                OKX_REQUEST.observe(time.perf_counter() - started, endpoint=endpoint, method=method,
+                                    status=str(response.status_code))
+                if response.status_code != 429:
+                    response.raise_for_status()
+                    data = response.json()
+                    if data.get("code") != THROTTLED:
+                        return data
+            except Exception as e:
+                if response is None:
+                    OKX_REQUEST.observe(time.perf_counter() - started, endpoint=endpoint, method=method, status="error")
+                print(f"[ERROR] API request failed: {e}")
+                return None
+            delay = self.limiter.backoff(endpoint, attempt)
+            print(f"[RATE LIMIT] {endpoint} throttled, backing off {delay:.2f}s")
+
+        print(f"[ERROR] API request failed: {endpoint} still throttled after {RATE_LIMIT_RETRIES} retries")
+        return None
 
     # === PUBLIC API ===
-    def get_price(self):
-        response = self._request("GET", "/api/v5/market/ticker", params={"instId": SYMBOL})
+    def get_price(self, symbol=SYMBOL):
+        if self.price_feed is not None:
+            price = self.price_feed.last_price(symbol)
+            if price is not None:
+                return price
+        response = self._request("GET", "/api/v5/market/ticker", params={"instId": symbol})
         if response and response.get("data"):
             return float(response["data"][0]["last"])
         return None
 
     # === PRIVATE APIs ===
     def get_balance(self, currency):
-        method = "GET"
-        path = f"/api/v5/account/balance?ccy={currency}"
-        url = self.base_url + path
-        headers = self._auth_headers(self._get_timestamp(), method, path)  # Fix this call
+        balances = self.get_balances([currency])
+        if balances is None:
+            return 0.0
+        return balances[currency]
 
-        try:
-            res = self.session.get(url, headers=headers)
-            res.raise_for_status()
-            data = res.json()
+    def get_balances(self, currencies):
+        # One round trip for every currency: /api/v5/account/balance?ccy=PI,USDT
+        data = self._request("GET", "/api/v5/account/balance", params={"ccy": ",".join(currencies)})
+        if not data or not data.get("data"):
+            print(f"[ERROR] Balance fetch failed: {data}")
+            return None
 
-            # For debugging
-            #print(f"[DEBUG] Raw balance data for {currency}: {json.dumps(data, indent=2)}")
+        # For debugging
+        #print(f"[DEBUG] Raw balance data for {currencies}: {json.dumps(data, indent=2)}")
 
-            details = data["data"][0].get("details", [])
-            for item in details:
-                if item["ccy"] == currency:
-                    return float(item["availBal"])
-            return 0.0
-        except Exception as e:
-            print(f"[ERROR] Balance fetch failed: {e}")
-            return 0.0
+        return parse_balances(data, currencies)
 
-    def place_order(self, side, amount):
-        print(f"[DEBUG] Placing order: side={side}, amount={amount}")
-    
-        body = {
-            "instId": SYMBOL,
-            "tdMode": "cash",
-            "side": "buy" if side == "long" else "sell",
-            "ordType": "market",
-            "sz": str(amount),
-        }
-    
+    def place_order(self, side, amount, symbol=SYMBOL, ord_type="market", px=None, cl_ord_id=None):
+        print(f"[DEBUG] Placing order: {symbol} side={side}, amount={amount}, type={ord_type}, px={px}")
+
+        body = order_body(side, amount, symbol, ord_type, px, cl_ord_id)
         response = self._request("POST", "/api/v5/trade/order", body=body)
         print(f"[DEBUG] API response: {response}")
+        for listener in self.order_listeners:
+            listener(body, response)
+        return response
+
+    def place_orders(self, orders):
+        # Up to 20 orders in one batch-orders request; each dict holds place_order's arguments
+        print(f"[DEBUG] Placing {len(orders)} orders in one batch")
+        body = [order_body(**order) for order in orders]
+        response = self._request("POST", "/api/v5/trade/batch-orders", body=body)
+        print(f"[DEBUG] API response: {response}")
+        for listener in self.order_listeners:
+            listener(body, response)
+        return response
+
+    def cancel_orders(self, symbol, cl_ord_ids):
+        body = [{"instId": symbol, "clOrdId": cl_ord_id} for cl_ord_id in cl_ord_ids]
+        response = self._request("POST", "/api/v5/trade/cancel-batch-orders", body=body)
+        for listener in self.order_listeners:
+            listener(body, response)
+        return response
+
+    def get_order(self, symbol=SYMBOL, ord_id=None, cl_ord_id=None):
+        params = {"instId": symbol}
+        if ord_id:
+            params["ordId"] = ord_id
+        else:
+            params["clOrdId"] = cl_ord_id
+        return self._request("GET", "/api/v5/trade/order", params=params)
+
+    def cancel_order(self, symbol=SYMBOL, ord_id=None, cl_ord_id=None):
+        body = {"instId": symbol}
+        if ord_id:
+            body["ordId"] = ord_id
+        else:
+            body["clOrdId"] = cl_ord_id
+        response = self._request("POST", "/api/v5/trade/cancel-order", body=body)
+        for listener in self.order_listeners:
+            listener(body, response)
         return response
 
 
     def get_position_size(self, currency):
         return self.get_balance(currency)
+
+    def get_fills(self, symbol=SYMBOL, begin=None):
+        # Fills of the last 3 days for the pair, newest first; `begin` is an epoch-ms lower bound
+        params = {"instType": "SPOT", "instId": symbol}
+        if begin is not None:
+            params["begin"] = str(begin)
+        response = self._request("GET", "/api/v5/trade/fills", params=params)
+        if not response or response.get("code") != "0":
+            return None
+        return response.get("data", [])
+
+
+def order_body(side, amount, symbol, ord_type="market", px=None, cl_ord_id=None):
+    # Market buys are sized in USDT (OKX's default tgtCcy); every other order is sized in coin
+    body = {
+        "instId": symbol,
+        "tdMode": "cash",
+        "side": "buy" if side == "long" else "sell",
+        "ordType": ord_type,
+        "sz": str(amount),
+    }
+    if px is not None:
+        body["px"] = str(px)
+    if cl_ord_id:
+        body["clOrdId"] = cl_ord_id
+    return body
+
+
+def parse_balances(data, currencies):
+    balances = {ccy: 0.0 for ccy in currencies}
+    details = data["data"][0].get("details", [])
+    for item in details:
+        if item["ccy"] in balances:
+            balances[item["ccy"]] = float(item["availBal"])
+    return balances
+
+
+class AsyncOKXClient(OKXAuth):
+    """asyncio twin of OKXClient backed by one pooled HTTP/2 httpx client.
+
+    Every call carries REQUEST_TIMEOUT, so a slow OKX response can only
+    stall the coroutine waiting on it, never the event loop. Orders and
+    cancels call order_listeners as OKXClient's do. PortfolioSnapshot
+    needs a sync client; async readers share one through store() and
+    hook its invalidate() here.
+    """
+
+    def __init__(self, limiter=LIMITER):
+        super().__init__()
+        self.limiter = limiter
+        self._inflight = {}     # path -> task of an identical GET already on the wire
+
+        self.session = httpx.AsyncClient(
+            http2=True,
+            timeout=REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_SIZE,
+                max_keepalive_connections=HTTP_POOL_SIZE,
+            ),
+            headers={"Content-Type": "application/json"},
+        )
+        # listener(request body, response) after every order or cancel, as on OKXClient
+        self.order_listeners = []
+        self.price_feed = None
+
+    async def _request(self, method, path, params=None, body=None):
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        if method != "GET":
+            return await self._send(method, path, body)
+
+        task = self._inflight.get(path)
+        if task is None:
+            task = asyncio.ensure_future(self._send(method, path))
+            self._inflight[path] = task
+            task.add_done_callback(lambda _: self._inflight.pop(path, None))
+        # shield: one caller giving up must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def _send(self, method, path, body=None):
+        endpoint = path.split("?")[0]
+        lane = current_lane(method, endpoint)
+        url = self.base_url + path
+        body_json = json.dumps(body) if body else ""
+
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            await self.limiter.acquire_async(endpoint, lane)
+            headers = self._auth_headers(self._get_timestamp(), method, path, body_json)
+            started, response = time.perf_counter(), None
+            try:
+                response = await self.session.request(method, url, headers=headers, content=body_json or None)
+                OKX_REQUEST.observe(time.perf_counter() - started, endpoint=endpoint, method=method,
+                                    status=str(response.status_code))
+                if response.status_code != 429:
+                    response.raise_for_status()
+                    data = response.json()
+                    if data.get("code") != THROTTLED:
+                        return data
+            except Exception as e:
+                if response is None:
+                    OKX_REQUEST.observe(time.perf_counter() - started, endpoint=endpoint, method=method, status="error")
+                print(f"[ERROR] API request failed: {e}")
+                return None
+            delay = self.limiter.backoff(endpoint, attempt)
+            print(f"[RATE LIMIT] {endpoint} throttled, backing off {delay:.2f}s")
+
+        print(f"[ERROR] API request failed: {endpoint} still throttled after {RATE_LIMIT_RETRIES} retries")
+        return None
+
+    # === PUBLIC API ===
+    async def get_price(self, symbol=SYMBOL):
+        if self.price_feed is not None:
+            price = self.price_feed.last_price(symbol)
+            if price is not None:
+                return price
+        response = await self._request("GET", "/api/v5/market/ticker", params={"instId": symbol})
+        if response and response.get("data"):
+            return float(response["data"][0]["last"])
+        return None
+
+    async def get_candles(self, symbol=SYMBOL, bar="1m", limit=300):
+        # Closed candles as (ts ms, close), oldest first; the bar still forming is left out
+        response = await self._request("GET", "/api/v5/market/candles",
+                                       params={"instId": symbol, "bar": bar, "limit": limit})
+        if not response or not response.get("data"):
+            return []
+        return [(int(row[0]), float(row[4])) for row in reversed(response["data"])
+                if len(row) < 9 or row[8] == "1"]
+
+    # === PRIVATE APIs ===
+    async def test_connection(self):
+        # A signed balance call proves the key, passphrase and signature are accepted
+        result = await self._request("GET", "/api/v5/account/balance")
+        if result and result.get("code") == "0":
+            print("[INFO] API credentials are working.")
+            return True
+        print(f"[ERROR] API credentials test failed: {result}")
+        return False
+
+    async def get_balances(self, currencies):
+        response = await self._request("GET", "/api/v5/account/balance", params={"ccy": ",".join(currencies)})
+        if not response or not response.get("data"):
+            print(f"[ERROR] Balance fetch failed: {response}")
+            return None
+        return parse_balances(response, currencies)
+
+    async def get_balance(self, currency):
+        balances = await self.get_balances([currency])
+        if balances is None:
+            return 0.0
+        return balances[currency]
+
+    async def get_balances_and_price(self, currencies, symbol=SYMBOL):
+        # Balance and ticker are independent, so fetch them concurrently
+        return await asyncio.gather(self.get_balances(currencies), self.get_price(symbol))
+
+    async def place_order(self, side, amount, symbol=SYMBOL, ord_type="market", px=None, cl_ord_id=None):
+        print(f"[DEBUG] Placing order: {symbol} side={side}, amount={amount}, type={ord_type}, px={px}")
+
+        body = order_body(side, amount, symbol, ord_type, px, cl_ord_id)
+        response = await self._request("POST", "/api/v5/trade/order", body=body)
+        print(f"[DEBUG] API response: {response}")
+        for listener in self.order_listeners:
+            listener(body, response)
+        return response
+
+    async def place_orders(self, orders):
+        # Up to 20 orders in one batch-orders request; each dict holds place_order's arguments
+        print(f"[DEBUG] Placing {len(orders)} orders in one batch")
+        body = [order_body(**order) for order in orders]
+        response = await self._request("POST", "/api/v5/trade/batch-orders", body=body)
+        print(f"[DEBUG] API response: {response}")
+        for listener in self.order_listeners:
+            listener(body, response)
+        return response
+
+    async def cancel_orders(self, symbol, cl_ord_ids):
+        body = [{"instId": symbol, "clOrdId": cl_ord_id} for cl_ord_id in cl_ord_ids]
+        response = await self._request("POST", "/api/v5/trade/cancel-batch-orders", body=body)
+        for listener in self.order_listeners:
+            listener(body, response)
+        return response
+
+    async def get_order(self, symbol=SYMBOL, ord_id=None, cl_ord_id=None):
+        params = {"instId": symbol}
+        if ord_id:
+            params["ordId"] = ord_id
+        else:
+            params["clOrdId"] = cl_ord_id
+        return await self._request("GET", "/api/v5/trade/order", params=params)
+
+    async def cancel_order(self, symbol=SYMBOL, ord_id=None, cl_ord_id=None):
+        body = {"instId": symbol}
+        if ord_id:
+            body["ordId"] = ord_id
+        else:
+            body["clOrdId"] = cl_ord_id
+        response = await self._request("POST", "/api/v5/trade/cancel-order", body=body)
+        for listener in self.order_listeners:
+            listener(body, response)
+        return response
+
+    async def get_position_size(self, currency):
+        return await self.get_balance(currency)
+
+    async def get_fills(self, symbol=SYMBOL, begin=None):
+        # Fills of the last 3 days for the pair, newest first; `begin` is an epoch-ms lower bound
+        params = {"instType": "SPOT", "instId": symbol}
+        if begin is not None:
+            params["begin"] = str(begin)
+        response = await self._request("GET", "/api/v5/trade/fills", params=params)
+        if not response or response.get("code") != "0":
+            return None
+        return response.get("data", [])
+
+    async def aclose(self):
+        await self.session.aclose()
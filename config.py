@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 # Load .env file for secrets (you should create a .env file in project root)
@@ -8,16 +9,50 @@ load_dotenv()
 OKX_API_KEY = os.getenv("OKX_API_KEY")
 OKX_SECRET_KEY = os.getenv("OKX_SECRET_KEY")
 OKX_PASSPHRASE = os.getenv("OKX_PASSPHRASE")
-OKX_BASE_URL = "https://www.okx.com"
+# Override all three to run against simulator.py, e.g. http://127.0.0.1:8765 and ws://127.0.0.1:8765/ws/v5/public|private
+OKX_BASE_URL = os.getenv("OKX_BASE_URL", "https://www.okx.com")
+OKX_WS_PUBLIC_URL = os.getenv("OKX_WS_PUBLIC_URL", "wss://ws.okx.com:8443/ws/v5/public")
+OKX_WS_PRIVATE_URL = os.getenv("OKX_WS_PRIVATE_URL", "wss://ws.okx.com:8443/ws/v5/private")
+
+# === HTTP ===
+REQUEST_TIMEOUT = 10            # Seconds before any OKX / signal request is abandoned
+HTTP_POOL_SIZE = 10             # Max pooled connections per client
+RATE_LIMIT_RETRIES = 3          # Retries of a request OKX throttled (HTTP 429 / code 50011)
+RATE_LIMIT_BACKOFF_BASE = 0.5   # Seconds; doubles per retry, with jitter
+RATE_LIMIT_BACKOFF_MAX = 8      # Cap on a single backoff
 
 # === Signal Server ===
-SIGNAL_SERVER_URL = "https://okx-signal-server.up.railway.app/api/signal"
+# Polled with If-None-Match; set to "" to rely on POST /api/signal pushes and in-process indicators only
+SIGNAL_SERVER_URL = os.getenv("SIGNAL_SERVER_URL", "https://okx-signal-server.up.railway.app/api/signal")
+SIGNAL_WEBHOOK_TOKEN = os.getenv("SIGNAL_WEBHOOK_TOKEN")  # Required X-Signal-Token on pushes when set
+SIGNAL_LONG_POLL_WAIT = 25      # Seconds a long-poll-capable server may hold a poll (Prefer: wait)
+SIGNAL_DEDUPE_SIZE = 1000       # Recent signal ids remembered for deduplication
+
+# === In-process Indicator Signals ===
+# RSI/MACD divergence computed from the ticker stream; opt in with INDICATOR_SIGNALS=true,
+# which trades its signals next to the server's
+INDICATOR_SIGNALS = os.getenv("INDICATOR_SIGNALS", "false").lower() == "true"
+INDICATOR_BAR = os.getenv("INDICATOR_BAR", "1m")    # 1m | 3m | 5m | 15m | 30m | 1H
+INDICATOR_RSI_PERIOD = 14
+INDICATOR_MACD = (12, 26, 9)    # fast, slow, signal EMA periods
+INDICATOR_PIVOT_WING = 3        # Bars each side of a swing low/high that must close beyond it
+INDICATOR_PIVOT_GAP = 60        # Max bars between the two pivots of a divergence
+INDICATOR_RSI_LOW = 40          # A bullish divergence's second low must have RSI at or below this
+INDICATOR_RSI_HIGH = 60         # ...and a bearish one's second high at or above this
+INDICATOR_TP = 0.005            # tp / sl / DCA distance of the signals it emits
+INDICATOR_SL = 0.005
+INDICATOR_DCA_DISTANCE = 0.02   # DCA trigger 2% against the entry
 
 # === Trading Settings ===
 SYMBOL = "PI-USDT"              # Market pair (spot)
 BASE_CURRENCY = "USDT"
 QUOTE_CURRENCY = "PI"
 
+# One TradingBot per pair in this process, e.g. SYMBOLS=PI-USDT,BTC-USDT
+SYMBOLS = [s.strip().upper() for s in os.getenv("SYMBOLS", SYMBOL).split(",") if s.strip()]
+# Per-pair strategy overrides, e.g. BOT_PARAMS={"BTC-USDT": {"order_percent": 0.02}}
+BOT_PARAMS = json.loads(os.getenv("BOT_PARAMS", "{}"))
+
 ORDER_PERCENT = 0.03         # 12% of portfolio for initial entry
 DCA_PERCENT = 0.05           # 18% for DCA on SL trigger
 
@@ -30,8 +65,74 @@ TRAIL_TRIGGER = 0.002     # Trailing triggers 0.2% above TP
 TRAILING_STEP_PCT = 0.002       # Update TP if price rises/falls further
 TRAIL_BUFFER = 0.001  # 0.1%
 
+PORTFOLIO_TRAIL_ACTIVATE = 1.005    # Portfolio trailing arms after +0.5% growth
+PORTFOLIO_TRAIL_GIVEBACK = 0.999    # ...and force-sells 0.1% below the running peak
+
+# === Risk Engine ===
+# Portfolio limits checked on every tick and balance read, apart from the signal loop;
+# RISK_ENGINE=false leaves only bot_loop's trailing check
+RISK_ENGINE = os.getenv("RISK_ENGINE", "true").lower() == "true"
+RISK_MAX_DRAWDOWN = 0.02        # Force sell 2% below the tracking point, beyond the SL that triggers DCA; 0 disables
+RISK_MAX_EXPOSURE = 0.9         # No new long entries while coin is over 90% of the account; 1 disables
+RISK_DAILY_LOSS = 0.03          # Force sell every pair and stop entries for the UTC day after a 3% loss; 0 disables
+RISK_MIN_NOTIONAL = 1.0         # USDT; coin worth less is dust the limits do not try to sell
+RISK_RETRY_AFTER = 30           # Seconds before a pair whose risk exit failed is judged again
+
+# === Order Execution ===
+# market | limit | post_only | ioc; per pair with BOT_PARAMS {"PI-USDT": {"order_type": "post_only"}}
+ORDER_TYPE = os.getenv("ORDER_TYPE", "market")
+ORDER_FILL_TIMEOUT = 10         # Seconds to wait for a final order state; a resting limit is then cancelled
+ORDER_RETRIES = 2               # Resends of an unacknowledged order, always under the same clOrdId
+IOC_SLIPPAGE = 0.002            # IOC orders are priced this far through the touch (0.2%)
+ORDER_STREAM_KEEP = 500         # Recent order states kept from the private orders channel
+EXIT_SLICES = 1                 # Child orders per exit (close / force sell); 1 sends a single order
+EXIT_SLICE_STYLE = "iceberg"    # iceberg: laddered IOCs in one batch request | twap: market slices over time
+EXIT_SLICE_STEP = 0.0005        # Price step between iceberg children (0.05%)
+TWAP_INTERVAL = 2               # Seconds between TWAP children
+SLIPPAGE_BUDGET = 0.002         # Max VWAP slippage vs the touch a market order may take from the book; 0 disables
+# Over budget, entries and DCA buys are capped to what the book holds; exits are TWAP-sliced instead
+
+# === Paper Trading ===
+# Shadow bots on a virtual ledger, fed live prices and signals next to the live bots,
+# e.g. PAPER_BOTS={"PI-USDT": {"order_percent": 0.05}}; pairs must also be in SYMBOLS
+PAPER_BOTS = json.loads(os.getenv("PAPER_BOTS", "{}"))
+PAPER_BALANCES = json.loads(os.getenv("PAPER_BALANCES", '{"USDT": 1000}'))   # Starting virtual ledger
+
+# === Tick Tape ===
+# Every ticker, signal and order response appended to a binary tape per session; opt in with
+# TAPE_RECORD=true, replay with `python tape.py <dir>`
+TAPE_RECORD = os.getenv("TAPE_RECORD", "false").lower() == "true"
+TAPE_DIR = os.getenv("TAPE_DIR", "tapes")
+TAPE_FLUSH_EVERY = 256          # Ticks buffered before they reach the file; signals and orders are written at once
+
+# === Trade Ledger ===
+LEDGER_KEEP = 5000              # Trades kept for /api/trades; the running stats cover every trade
+LEDGER_RECONCILE_INTERVAL = 60  # Seconds bot_loop values pairs from fills and streamed prices before reading balances again
+
 # === Polling Interval ===
 SIGNAL_CHECK_INTERVAL = 10      # Seconds between signal checks
+WARM_UP_RETRY = 5               # Seconds before warm-up steps that failed (credentials, balances, ...) run again
+
+# === Market Data Feed ===
+FEED_STALE_AFTER = 5            # Seconds a streamed price is trusted before get_price falls back to REST
+FEED_PING_INTERVAL = 20         # Seconds of silence before pinging the socket
+FEED_GAP_MS = 5000              # Tick-to-tick jump (ms) reported as a gap
+FEED_RECONNECT_MAX = 30         # Max seconds between reconnect attempts
+
+# === Portfolio Snapshot ===
+PORTFOLIO_SNAPSHOT_TTL = 2      # Seconds a balance/price snapshot is shared between callers
+
+# === History Store ===
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "history.db")
+HISTORY_MAX_POINTS = 1000       # Points returned by a history query without an explicit resolution
+
+# === State Journal ===
+STATE_DIR = os.getenv("STATE_DIR", "state")
+JOURNAL_COMPACT_EVERY = 200     # Journal records between compacted snapshots
+
+# === Backtesting ===
+BACKTEST_FEE = 0.001            # Simulated taker fee per fill (0.1%)
 
 # === Logging ===
 LOG_LEVEL = "INFO"              # Could be "DEBUG", "INFO", "WARNING"
+LOG_BUFFER_SIZE = 500           # Recent /logs events kept for slow and reconnecting clients
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+from collections import deque
+from config import LOG_BUFFER_SIZE
+
+
+def call_on_loop(loop, callback, *args):
+    # Runs callback on `loop`: inline when already on it, else via call_soon_threadsafe
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+
+    if loop is None or loop.is_closed() or running is loop:
+        callback(*args)
+    else:
+        loop.call_soon_threadsafe(callback, *args)
+
+
+def wake(waiters):
+    for waiter in waiters:
+        if not waiter.done():
+            waiter.set_result(None)
+
+
+class StateHub:
+    """Latest value per topic, pushed to async subscribers once per change.
+
+    publish() may be called from the event loop or from worker threads (the
+    bot's synchronous order path); it is marshalled onto the loop either way.
+    Subscribers only ever see the newest value of a topic, so a slow client
+    skips intermediate states instead of queueing them.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self._values = {}       # topic -> (version, payload)
+        self._version = 0
+        self._waiters = set()
+
+    def bind(self, loop):
+        self.loop = loop
+
+    def latest(self, topic):
+        return self._values.get(topic, (0, None))[1]
+
+    def publish(self, topic, payload):
+        call_on_loop(self.loop, self._publish, topic, payload)
+
+    def _store(self, topic, payload):
+        if topic in self._values and self._values[topic][1] == payload:
+            return False
+        self._version += 1
+        self._values[topic] = (self._version, payload)
+        return True
+
+    def _publish(self, topic, payload):
+        if not self._store(topic, payload):
+            return
+        waiters, self._waiters = self._waiters, set()
+        wake(waiters)
+
+    async def subscribe(self, topics, heartbeat=15):
+        """Yields (topic, payload) for each topic's current value, then on every change.
+
+        Yields None after `heartbeat` seconds without changes so SSE handlers
+        can keep idle connections open.
+        """
+        seen = {}
+        loop = asyncio.get_running_loop()
+        while True:
+            # Register before reading so a publish while we are yielding still wakes us
+            waiter = loop.create_future()
+            self._waiters.add(waiter)
+            changed = False
+            for topic in topics:
+                version, payload = self._values.get(topic, (0, None))
+                if version > seen.get(topic, 0):
+                    seen[topic] = version
+                    changed = True
+                    yield topic, payload
+            if changed:
+                self._waiters.discard(waiter)
+                continue
+            try:
+                await asyncio.wait_for(waiter, timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+            finally:
+                self._waiters.discard(waiter)
+
+
+class LogBuffer:
+    """Bounded broadcast log: a ring of the last `size` events with increasing ids.
+
+    append() is safe from any thread. Every subscriber keeps its own cursor,
+    so each connected client sees every event; one that falls more than
+    `size` events behind just skips the ones that were overwritten.
+    """
+
+    def __init__(self, size=LOG_BUFFER_SIZE):
+        self.loop = None
+        self._lock = threading.Lock()
+        self._entries = deque(maxlen=size)    # (event_id, message)
+        self._last_id = 0
+        self._waiters = set()
+
+    def bind(self, loop):
+        self.loop = loop
+
+    def append(self, message):
+        with self._lock:
+            self._last_id += 1
+            self._entries.append((self._last_id, message))
+            event_id = self._last_id
+        call_on_loop(self.loop, self._wake)
+        return event_id
+
+    def since(self, cursor):
+        with self._lock:
+            if cursor > self._last_id:
+                cursor = 0      # id from before a restart: replay everything we have
+            return [entry for entry in self._entries if entry[0] > cursor]
+
+    def _wake(self):
+        waiters, self._waiters = self._waiters, set()
+        wake(waiters)
+
+    async def subscribe(self, last_id=0, heartbeat=15):
+        """Yields (event_id, message) for buffered events after `last_id`, then live ones.
+
+        Yields None after `heartbeat` seconds without events.
+        """
+        cursor = last_id
+        loop = asyncio.get_running_loop()
+        while True:
+            # Register before reading so an append in between still wakes us
+            waiter = loop.create_future()
+            self._waiters.add(waiter)
+            entries = self.since(cursor)
+            if entries:
+                self._waiters.discard(waiter)
+                for entry in entries:
+                    cursor = entry[0]
+                    yield entry
+                continue
+            try:
+                await asyncio.wait_for(waiter, timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+            finally:
+                self._waiters.discard(waiter)
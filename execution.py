@@ -0,0 +1,467 @@
+import json
+import time
+import uuid
+import asyncio
+import threading
+import websockets
+from dataclasses import dataclass
+from collections import OrderedDict
+from metrics import ORDER_FILL
+from config import (
+    SYMBOL, OKX_WS_PRIVATE_URL, ORDER_FILL_TIMEOUT, ORDER_RETRIES, IOC_SLIPPAGE,
+    ORDER_STREAM_KEEP, FEED_PING_INTERVAL, FEED_RECONNECT_MAX,
+    EXIT_SLICE_STEP, TWAP_INTERVAL
+)
+
+# Order types
+MARKET = "market"
+LIMIT = "limit"
+POST_ONLY = "post_only"
+IOC = "ioc"
+
+# How submit_sliced splits an exit
+ICEBERG = "iceberg"
+TWAP = "twap"
+
+# Order states: OKX's own, plus the two an order can only have on our side
+LIVE = "live"
+PARTIALLY_FILLED = "partially_filled"
+FILLED = "filled"
+CANCELED = "canceled"
+REJECTED = "rejected"       # OKX refused it (sCode / sMsg say why)
+UNKNOWN = "unknown"         # never acknowledged and not found on the exchange
+FINAL_STATES = (FILLED, CANCELED, "mmp_canceled", REJECTED)
+
+DUPLICATE_CL_ORD_ID = "51016"
+WOULD_TAKE = "51124"        # post-only order that would have crossed the book
+
+BATCH_MAX = 20              # orders per batch-orders / cancel-batch-orders request
+CHILD_IDS = "abcdefghijklnopqrstuvwxyz"     # clOrdId suffixes of sliced children ("m" marks a market follow-up)
+
+
+def new_cl_ord_id():
+    # OKX allows 32 letters and digits; the last one is left for a follow-up order's "m"
+    return "okxt" + uuid.uuid4().hex[:27]
+
+
+def _float(value, default=0.0):
+    return float(value) if value not in (None, "") else default
+
+
+@dataclass
+class Execution:
+    """What an order actually did: state, coin filled and its average price."""
+
+    cl_ord_id: str
+    side: str
+    ord_type: str
+    state: str = UNKNOWN
+    filled: float = 0.0         # coin
+    avg_px: float = None
+    fee: float = 0.0            # paid, in fee_ccy (coin for buys, cash for sells)
+    ord_id: str = ""
+    code: str = ""
+    msg: str = ""
+
+    @property
+    def ok(self):
+        return self.filled > 0
+
+    @property
+    def final(self):
+        return self.state in FINAL_STATES
+
+    @classmethod
+    def from_order(cls, order, side, ord_type):
+        return cls(
+            cl_ord_id=order.get("clOrdId", ""),
+            side=side,
+            ord_type=ord_type,
+            state=order.get("state", UNKNOWN),
+            filled=_float(order.get("accFillSz")),
+            avg_px=_float(order.get("avgPx"), None),
+            fee=-_float(order.get("fee")),
+            ord_id=order.get("ordId", ""),
+        )
+
+    @classmethod
+    def combine(cls, cl_ord_id, side, ord_type, reports):
+        # One Execution for a parent order's children
+        total = cls(cl_ord_id, side, ord_type)
+        for report in reports:
+            total = total.merge(report)
+        if reports and all(report.state == FILLED for report in reports):
+            total.state = FILLED
+        elif total.ok:
+            total.state = CANCELED      # part filled, the rest did not
+        elif any(report.state == UNKNOWN for report in reports):
+            total.state = UNKNOWN
+        return total
+
+    def merge(self, other):
+        # This order's fills plus a follow-up order's, e.g. a limit whose rest went out at market
+        filled = self.filled + other.filled
+        avg_px = self.avg_px
+        if other.filled:
+            avg_px = ((self.avg_px or 0) * self.filled + other.avg_px * other.filled) / filled
+        return Execution(self.cl_ord_id, self.side, self.ord_type, other.state, filled, avg_px,
+                         self.fee + other.fee, self.ord_id, other.code, other.msg)
+
+
+class OrderStream:
+    """Streams the OKX private `orders` channel into the latest state per clOrdId.
+
+    Order threads block in wait() until their order reaches a final state,
+    so a fill costs one push instead of repeated GET /trade/order polls.
+    `connect` works as in market_feed.TickerFeed.
+    """
+
+    def __init__(self, auth, url=OKX_WS_PRIVATE_URL, connect=None, keep=ORDER_STREAM_KEEP):
+        self.auth = auth
+        self.url = url
+        self.connect = connect or websockets.connect
+        self.keep = keep
+        self.orders = OrderedDict()     # clOrdId (or ordId) -> latest pushed order
+        self.listeners = []             # called as listener(order) on every push
+        self.connected = False
+        self.connected_at = 0.0         # monotonic time of the last subscribe ack
+        self.reconnects = 0
+        self._cond = threading.Condition()
+
+    def wait(self, cl_ord_id, timeout):
+        # The latest pushed state once it is final, else whatever arrived before `timeout`
+        with self._cond:
+            self._cond.wait_for(lambda: self.orders.get(cl_ord_id, {}).get("state") in FINAL_STATES, timeout)
+            return self.orders.get(cl_ord_id)
+
+    def update(self, order):
+        key = order.get("clOrdId") or order["ordId"]
+        with self._cond:
+            self.orders[key] = order
+            self.orders.move_to_end(key)
+            while len(self.orders) > self.keep:
+                self.orders.popitem(last=False)
+            self._cond.notify_all()
+        for listener in self.listeners:
+            listener(order)
+
+    def login_message(self):
+        timestamp = str(int(time.time()))
+        return json.dumps({"op": "login", "args": [{
+            "apiKey": self.auth.api_key,
+            "passphrase": self.auth.api_passphrase,
+            "timestamp": timestamp,
+            "sign": self.auth._sign(timestamp, "GET", "/users/self/verify"),
+        }]})
+
+    async def run(self):
+        backoff = 1
+        while True:
+            try:
+                async with self.connect(self.url) as conn:
+                    await self._session(conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[ORDERS] Order stream dropped: {e}")
+            if self.connected:
+                backoff = 1     # the session got as far as its subscribe ack
+            self.connected = False
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, FEED_RECONNECT_MAX)
+
+    async def _session(self, conn):
+        await conn.send(self.login_message())
+        awaiting_pong = False
+        while True:
+            try:
+                raw = await asyncio.wait_for(conn.recv(), timeout=FEED_PING_INTERVAL)
+            except asyncio.TimeoutError:
+                if awaiting_pong:
+                    raise ConnectionError("no pong from order stream")
+                await conn.send("ping")
+                awaiting_pong = True
+                continue
+            awaiting_pong = False
+            if raw == "pong":
+                continue
+            msg = json.loads(raw)
+            event = msg.get("event")
+            if event == "login":
+                await conn.send(json.dumps({"op": "subscribe", "args": [{"channel": "orders", "instType": "SPOT"}]}))
+            elif event == "subscribe":
+                self.connected, self.connected_at = True, time.monotonic()
+                print("[ORDERS] Subscribed to SPOT order updates.")
+            elif event == "error":
+                raise ConnectionError(f"order stream refused: {msg.get('msg')}")
+            else:
+                for order in msg.get("data", []):
+                    self.update(order)
+
+
+class ExecutionEngine:
+    """Places an order and follows it to a final state.
+
+    Every order carries a clOrdId, so an order whose response was lost is
+    looked up before it is resent under the same id and can never be placed
+    twice. Fills come from the OrderStream while it is connected, else from
+    GET /trade/order. A limit or post-only order still resting after
+    `timeout` is cancelled and the unfilled rest goes out at market; a
+    post-only order that would have taken liquidity goes out at market
+    straight away. Large exits can be split into child orders sent in one
+    batch-orders request (submit_sliced), and cancel_all pulls everything
+    still resting so a force exit can use the coin it locks.
+    """
+
+    def __init__(self, client, stream=None, timeout=ORDER_FILL_TIMEOUT, retries=ORDER_RETRIES, slippage=IOC_SLIPPAGE,
+                 slice_step=EXIT_SLICE_STEP, twap_interval=TWAP_INTERVAL, record_latency=True):
+        self.client = client
+        self.stream = stream
+        self.timeout = timeout
+        self.retries = retries
+        self.slippage = slippage
+        self.slice_step = slice_step
+        self.twap_interval = twap_interval
+        self.record_latency = record_latency    # off for paper, backtest and replay engines
+        self._lock = threading.Lock()
+        self._live = {}             # clOrdId -> symbol of orders that may still be resting
+        self._preempted = set()     # clOrdIds cancel_all pulled; they get no market follow-up
+
+    def touch(self, symbol):
+        # Best bid and ask from the ticker feed, or None while it is down
+        feed = self.client.price_feed
+        cell = feed.cells.get(symbol) if feed is not None and feed.connected else None
+        if cell is None:
+            return None
+        _, bid, ask, _, _ = cell.read()
+        if bid is None or ask is None:
+            return None
+        return bid, ask
+
+    def limit_price(self, side, ord_type, symbol):
+        # Limit / post-only join our own side of the book; IOC crosses it by at most `slippage`
+        quote = self.touch(symbol)
+        if quote is None:
+            return None
+        bid, ask = quote
+        buy = side == "long"
+        if ord_type == IOC:
+            return ask * (1 + self.slippage) if buy else bid * (1 - self.slippage)
+        return bid if buy else ask
+
+    def submit(self, side, amount, symbol=SYMBOL, ord_type=MARKET, cl_ord_id=None):
+        """Sends one order and returns its Execution once final (or once timed out).
+
+        `amount` follows market-order sizing whatever the type: USDT for a
+        buy, coin for a sell.
+        """
+        cl_ord_id = cl_ord_id or new_cl_ord_id()
+        px = None
+        if ord_type != MARKET:
+            px = self.limit_price(side, ord_type, symbol)
+            if px is None:
+                print(f"[EXEC] No {symbol} bid/ask for a {ord_type} order; sending it at market.")
+                ord_type = MARKET
+        size = amount / px if side == "long" and px is not None else amount
+
+        started = time.perf_counter()
+        report = self._place(dict(side=side, amount=size, symbol=symbol, ord_type=ord_type, px=px, cl_ord_id=cl_ord_id))
+        report = self._settle([report], symbol)[0]
+        if self.record_latency:
+            ORDER_FILL.observe(time.perf_counter() - started, ord_type=ord_type)
+        print(f"[EXEC] {cl_ord_id} {ord_type} {side}: {report.state}, {report.filled} filled at {report.avg_px}")
+
+        if self._was_preempted(cl_ord_id):
+            return report
+        if ord_type in (LIMIT, POST_ONLY) and report.state in (CANCELED, REJECTED):
+            if report.state == REJECTED and report.code != WOULD_TAKE:
+                return report
+            left = amount - report.filled * px if side == "long" else amount - report.filled
+            if left > amount * 1e-6:
+                rest = self.submit(side, left, symbol, MARKET, cl_ord_id + "m")
+                report = report.merge(rest)
+        return report
+
+    def submit_sliced(self, side, amount, symbol=SYMBOL, slices=1, style=ICEBERG, cl_ord_id=None):
+        """One market-sized exit split into `slices` child orders.
+
+        iceberg: every child goes out in one batch-orders request as an IOC
+        priced one `slice_step` deeper through the book than the last, so
+        no single order shows the full size and each caps its own slippage;
+        whatever the ladder leaves goes out at market. twap: equal market
+        children, one every `twap_interval` seconds.
+        """
+        cl_ord_id = cl_ord_id or new_cl_ord_id()
+        slices = min(int(slices), len(CHILD_IDS))
+        if slices <= 1:
+            return self.submit(side, amount, symbol, MARKET, cl_ord_id)
+        share = amount / slices
+        buy = side == "long"
+
+        if style == TWAP:
+            reports = []
+            for i in range(slices):
+                if i:
+                    time.sleep(self.twap_interval)
+                reports.append(self.submit(side, share, symbol, MARKET, cl_ord_id + CHILD_IDS[i]))
+            return Execution.combine(cl_ord_id, side, MARKET, reports)
+
+        quote = self.touch(symbol)
+        if quote is None:
+            children = [(share, MARKET, None)] * slices
+        else:
+            bid, ask = quote
+            prices = [ask * (1 + self.slice_step * i) if buy else bid * (1 - self.slice_step * i) for i in range(slices)]
+            children = [(share / px if buy else share, IOC, px) for px in prices]
+        report = self.submit_batch(side, children, symbol, cl_ord_id)
+
+        spent = report.filled * report.avg_px if buy and report.ok else report.filled
+        left = amount - spent
+        if self._was_preempted(cl_ord_id) or report.state == UNKNOWN:
+            return report
+        if left > amount * 1e-6:
+            report = report.merge(self.submit(side, left, symbol, MARKET, cl_ord_id + "m"))
+        return report
+
+    def submit_batch(self, side, children, symbol=SYMBOL, cl_ord_id=None):
+        """Places (size, ord_type, px) children with batch-orders and follows them all.
+
+        Sizes are OKX's own: coin, except USDT for a market buy. Returns one
+        Execution for the lot, under `cl_ord_id` (children get a suffix).
+        """
+        cl_ord_id = cl_ord_id or new_cl_ord_id()
+        orders = [dict(side=side, amount=size, symbol=symbol, ord_type=ord_type, px=px, cl_ord_id=cl_ord_id + CHILD_IDS[i])
+                  for i, (size, ord_type, px) in enumerate(children)]
+        started = time.perf_counter()
+        reports = []
+        for start in range(0, len(orders), BATCH_MAX):
+            reports.extend(self._place_batch(orders[start:start + BATCH_MAX]))
+        reports = self._settle(reports, symbol)
+        ord_type = children[0][1] if children else MARKET
+        if self.record_latency:
+            ORDER_FILL.observe(time.perf_counter() - started, ord_type=f"batch_{ord_type}")
+        report = Execution.combine(cl_ord_id, side, ord_type, reports)
+        print(f"[EXEC] {cl_ord_id} batch of {len(orders)} {ord_type} {side}: {report.state}, "
+              f"{report.filled} filled at {report.avg_px}")
+        return report
+
+    def cancel_all(self, symbol):
+        """Cancels every order this engine may still have resting on `symbol`; returns how many.
+
+        One cancel-batch-orders request per BATCH_MAX orders, and the
+        submits waiting on them send no market follow-up.
+        """
+        with self._lock:
+            ids = [cl_ord_id for cl_ord_id, live_symbol in self._live.items() if live_symbol == symbol]
+            self._preempted.update(ids)
+        for start in range(0, len(ids), BATCH_MAX):
+            self.client.cancel_orders(symbol, ids[start:start + BATCH_MAX])
+        if ids:
+            print(f"[EXEC] Cancelled {len(ids)} resting {symbol} order(s).")
+        return len(ids)
+
+    def _was_preempted(self, cl_ord_id):
+        # True (once) when cancel_all pulled this order or one of its children
+        with self._lock:
+            pulled = {other for other in self._preempted if other.startswith(cl_ord_id)}
+            self._preempted -= pulled
+        return bool(pulled)
+
+    def _acknowledged(self, order, item, response):
+        # The Execution for one order from its entry in an order / batch-orders response
+        cl_ord_id, side, ord_type = order["cl_ord_id"], order["side"], order["ord_type"]
+        if item.get("sCode") == "0":
+            return Execution(cl_ord_id, side, ord_type, state=LIVE, ord_id=item.get("ordId", ""))
+        if item.get("sCode") == DUPLICATE_CL_ORD_ID:
+            found = self.lookup(order["symbol"], cl_ord_id)
+            if found is not None:
+                return Execution.from_order(found, side, ord_type)
+        return Execution(cl_ord_id, side, ord_type, state=REJECTED,
+                         code=item.get("sCode") or response.get("code", ""),
+                         msg=item.get("sMsg") or response.get("msg", ""))
+
+    def _place(self, order):
+        for attempt in range(self.retries + 1):
+            response = self.client.place_order(**order)
+            if response is not None:
+                return self._acknowledged(order, (response.get("data") or [{}])[0], response)
+            # Lost on the wire: it may still have reached OKX, so look before resending
+            found = self.lookup(order["symbol"], order["cl_ord_id"])
+            if found is not None:
+                return Execution.from_order(found, order["side"], order["ord_type"])
+            print(f"[EXEC] {order['cl_ord_id']} not acknowledged; resending ({attempt + 1}/{self.retries}).")
+        return Execution(order["cl_ord_id"], order["side"], order["ord_type"], state=UNKNOWN, msg="no response from OKX")
+
+    def _place_batch(self, orders):
+        reports = []
+        for attempt in range(self.retries + 1):
+            response = self.client.place_orders(orders)
+            if response is not None:
+                items = {item.get("clOrdId"): item for item in response.get("data") or []}
+                return reports + [self._acknowledged(order, items.get(order["cl_ord_id"], {}), response) for order in orders]
+            # Lost on the wire: keep the children OKX has and resend only the rest, under the same ids
+            missing = []
+            for order in orders:
+                found = self.lookup(order["symbol"], order["cl_ord_id"])
+                if found is None:
+                    missing.append(order)
+                else:
+                    reports.append(Execution.from_order(found, order["side"], order["ord_type"]))
+            if not missing:
+                return reports
+            orders = missing
+            print(f"[EXEC] {len(orders)} batch order(s) not acknowledged; resending ({attempt + 1}/{self.retries}).")
+        return reports + [Execution(order["cl_ord_id"], order["side"], order["ord_type"], state=UNKNOWN,
+                                    msg="no response from OKX") for order in orders]
+
+    def _settle(self, reports, symbol):
+        # Follows acknowledged orders to a final state within one shared deadline, then cancels what still rests
+        deadline = time.monotonic() + self.timeout
+        open_ids = [report.cl_ord_id for report in reports if report.state in (LIVE, PARTIALLY_FILLED)]
+        with self._lock:
+            self._live.update((cl_ord_id, symbol) for cl_ord_id in open_ids)
+        try:
+            reports = [self._follow(report, symbol, max(0.0, deadline - time.monotonic()))
+                       if report.state in (LIVE, PARTIALLY_FILLED) else report for report in reports]
+            resting = [report.cl_ord_id for report in reports if report.state in (LIVE, PARTIALLY_FILLED)]
+            if resting:
+                if len(resting) == 1:
+                    self.client.cancel_order(symbol, cl_ord_id=resting[0])
+                else:
+                    self.client.cancel_orders(symbol, resting)
+                # A fill can still land between the timeout and the cancel; the final state has it
+                reports = [self._follow(report, symbol, timeout=2) if report.cl_ord_id in resting else report
+                           for report in reports]
+            return reports
+        finally:
+            with self._lock:
+                for cl_ord_id in open_ids:
+                    self._live.pop(cl_ord_id, None)
+
+    def lookup(self, symbol, cl_ord_id):
+        response = self.client.get_order(symbol, cl_ord_id=cl_ord_id)
+        if response and response.get("code") == "0" and response.get("data"):
+            return response["data"][0]
+        return None
+
+    def _follow(self, report, symbol, timeout):
+        deadline = time.monotonic() + timeout
+        if self.stream is not None and self.stream.connected:
+            order = self.stream.wait(report.cl_ord_id, max(0.0, deadline - time.monotonic()))
+            if order is not None and order.get("state") in FINAL_STATES:
+                return Execution.from_order(order, report.side, report.ord_type)
+
+        # No stream (or it missed the push): poll, backing off
+        delay = 0.1
+        while True:
+            order = self.lookup(symbol, report.cl_ord_id)
+            if order is not None:
+                report = Execution.from_order(order, report.side, report.ord_type)
+                if report.final:
+                    return report
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return report
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 1.0)
@@ -0,0 +1,147 @@
+import math
+import time
+import sqlite3
+import threading
+from config import HISTORY_DB_PATH, HISTORY_MAX_POINTS
+
+# Sample columns averaged per bucket; the counters only grow, so a bucket keeps the last one
+VALUES = ("value", "price", "pnl", "growth_percent")
+COUNTERS = ("tp_count", "dca_count", "profit_capture", "loss_limit")
+
+# Rollup tiers (seconds) kept next to the raw samples, so a long range is
+# read from a few thousand pre-aggregated rows instead of every sample
+TIERS = (60, 3600)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS samples (
+    symbol TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    {", ".join(f"{name} REAL" for name in VALUES)},
+    {", ".join(f"{name} INTEGER" for name in COUNTERS)},
+    PRIMARY KEY (symbol, ts)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollups (
+    symbol TEXT NOT NULL,
+    resolution INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    {", ".join(f"{name} REAL" for name in VALUES)},
+    {", ".join(f"{name} INTEGER" for name in COUNTERS)},
+    PRIMARY KEY (symbol, resolution, bucket)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS initial (
+    symbol TEXT PRIMARY KEY,
+    value REAL NOT NULL,
+    timestamp TEXT NOT NULL
+);
+"""
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+class HistoryStore:
+    """Append-only portfolio history per symbol in a SQLite WAL database.
+
+    Each sample is written once to `samples` and folded into the 1-minute and
+    1-hour `rollups` (value sums plus a count, last counters). Range queries
+    pick the coarsest tier that still fits the requested resolution.
+    """
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def initial(self, symbol):
+        # (value, iso timestamp) the growth figures are measured from, or None
+        with self._lock:
+            return self.db.execute(
+                "SELECT value, timestamp FROM initial WHERE symbol = ?", (symbol,)
+            ).fetchone()
+
+    def set_initial(self, symbol, value, timestamp):
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO initial (symbol, value, timestamp) VALUES (?, ?, ?)",
+                (symbol, value, timestamp)
+            )
+
+    def append(self, symbol, sample, ts=None):
+        # sample: dict with every name in VALUES and COUNTERS
+        ts = now_ms() if ts is None else ts
+        values = [sample[name] for name in VALUES]
+        counters = [sample[name] for name in COUNTERS]
+        columns = ", ".join(VALUES + COUNTERS)
+        marks = ", ".join("?" * (len(VALUES) + len(COUNTERS)))
+        with self._lock, self.db:
+            self.db.execute(
+                f"INSERT OR REPLACE INTO samples (symbol, ts, {columns}) VALUES (?, ?, {marks})",
+                [symbol, ts, *values, *counters]
+            )
+            for resolution in TIERS:
+                self.db.execute(
+                    f"INSERT INTO rollups (symbol, resolution, bucket, n, {columns}) "
+                    f"VALUES (?, ?, ?, 1, {marks}) "
+                    f"ON CONFLICT (symbol, resolution, bucket) DO UPDATE SET n = n + 1, "
+                    + ", ".join(f"{name} = {name} + excluded.{name}" for name in VALUES) + ", "
+                    + ", ".join(f"{name} = excluded.{name}" for name in COUNTERS),
+                    [symbol, resolution, ts // (resolution * 1000), *values, *counters]
+                )
+
+    def query(self, symbol, start=None, end=None, resolution=None):
+        """Samples in [start, end] (ms) averaged into `resolution`-second buckets.
+
+        Without a resolution, one is picked so at most HISTORY_MAX_POINTS
+        points come back, rounded up to a whole rollup tier. Returns (resolution, columns), where columns maps
+        "ts" and every sample name to a list.
+        """
+        end = now_ms() if end is None else end
+        if start is None:
+            with self._lock:
+                start = self.db.execute(
+                    "SELECT MIN(ts) FROM samples WHERE symbol = ?", (symbol,)
+                ).fetchone()[0] or end
+        if resolution is None:
+            resolution = max(1, math.ceil((end - start) / 1000 / HISTORY_MAX_POINTS))
+            # A whole number of tier buckets, so the rollups serve it instead of every raw sample
+            tier = max((t for t in TIERS if t <= resolution), default=None)
+            if tier is not None:
+                resolution = math.ceil(resolution / tier) * tier
+        bucket_ms = resolution * 1000
+
+        tier = max((t for t in TIERS if t <= resolution and resolution % t == 0), default=None)
+        averages = ", ".join(f"SUM({name}) / SUM(n)" for name in VALUES)
+        lasts = ", ".join(f"MAX({name})" for name in COUNTERS)
+        if tier is None:
+            sql = (f"SELECT (ts / ?) * ?, {averages.replace('SUM(n)', 'COUNT(*)')}, {lasts} "
+                   f"FROM samples WHERE symbol = ? AND ts BETWEEN ? AND ? "
+                   f"GROUP BY ts / ? ORDER BY 1")
+            args = (bucket_ms, bucket_ms, symbol, start, end, bucket_ms)
+        else:
+            # Rollup buckets are whole tiers, so a range edge rounds out to the enclosing bucket
+            tier_ms = tier * 1000
+            sql = (f"SELECT (bucket * ? / ?) * ?, {averages}, {lasts} "
+                   f"FROM rollups WHERE symbol = ? AND resolution = ? AND bucket BETWEEN ? AND ? "
+                   f"GROUP BY bucket * ? / ? ORDER BY 1")
+            args = (tier_ms, bucket_ms, bucket_ms, symbol, tier, start // tier_ms, end // tier_ms,
+                    tier_ms, bucket_ms)
+
+        with self._lock:
+            rows = self.db.execute(sql, args).fetchall()
+
+        names = ("ts",) + VALUES + COUNTERS
+        columns = {name: [row[i] for row in rows] for i, name in enumerate(names)}
+        for name in VALUES:
+            columns[name] = [round(v, 4) if v is not None else None for v in columns[name]]
+        return resolution, columns
+
+    def close(self):
+        with self._lock:
+            self.db.close()
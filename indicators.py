@@ -0,0 +1,226 @@
+from collections import deque
+from signals import Signal, normalize_signal
+from config import (
+    SYMBOL, INDICATOR_BAR, INDICATOR_RSI_PERIOD, INDICATOR_MACD, INDICATOR_PIVOT_WING,
+    INDICATOR_PIVOT_GAP, INDICATOR_RSI_LOW, INDICATOR_RSI_HIGH,
+    INDICATOR_TP, INDICATOR_SL, INDICATOR_DCA_DISTANCE
+)
+
+# OKX candle bar names -> seconds
+BAR_SECONDS = {"1m": 60, "3m": 180, "5m": 300, "15m": 900, "30m": 1800, "1H": 3600}
+WARMUP_BARS = 300               # the most OKX returns from one candles request
+
+
+class EMA:
+    """Exponential moving average, seeded with the simple average of the first `period` values."""
+
+    def __init__(self, period):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.count = 0
+        self.value = None
+
+    def update(self, x):
+        self.count += 1
+        if self.count < self.period:
+            self.value = x if self.value is None else self.value + x     # running sum until seeded
+            return None
+        if self.count == self.period:
+            self.value = (x if self.value is None else self.value + x) / self.period
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class RSI:
+    """Wilder's RSI: gains and losses smoothed with 1/period."""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev = None
+        self.count = 0
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.value = None
+
+    def update(self, x):
+        if self.prev is None:
+            self.prev = x
+            return None
+        change, self.prev = x - self.prev, x
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        self.count += 1
+        if self.count <= self.period:
+            self.avg_gain += gain / self.period
+            self.avg_loss += loss / self.period
+            if self.count < self.period:
+                return None
+        else:
+            self.avg_gain += (gain - self.avg_gain) / self.period
+            self.avg_loss += (loss - self.avg_loss) / self.period
+        self.value = 100.0 if self.avg_loss == 0 else 100 - 100 / (1 + self.avg_gain / self.avg_loss)
+        return self.value
+
+
+class MACD:
+    """MACD line (fast EMA - slow EMA), its signal EMA, and the histogram between them."""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.fast, self.slow, self.signal = EMA(fast), EMA(slow), EMA(signal)
+        self.line = None
+        self.histogram = None
+
+    def update(self, x):
+        fast, slow = self.fast.update(x), self.slow.update(x)
+        if fast is None or slow is None:
+            return None
+        self.line = fast - slow
+        signal = self.signal.update(self.line)
+        if signal is None:
+            return None
+        self.histogram = self.line - signal
+        return self.histogram
+
+
+class Divergence:
+    """Regular RSI divergence between consecutive confirmed swing points.
+
+    A bar is a swing low (high) once `wing` bars on each side closed above
+    (below) it, so pivots are confirmed `wing` bars late. A lower price low
+    on a higher RSI low is bullish, a higher price high on a lower RSI high
+    bearish, if the two pivots are at most `max_gap` bars apart. The
+    windows are fixed-size ring buffers, so an update costs the same no
+    matter how much history has been seen.
+    """
+
+    def __init__(self, wing=3, max_gap=60):
+        self.wing = wing
+        self.max_gap = max_gap
+        self.closes = deque(maxlen=2 * wing + 1)
+        self.rsis = deque(maxlen=2 * wing + 1)
+        self.bar = 0
+        self.last_low = None        # (bar, close, rsi)
+        self.last_high = None
+
+    def update(self, close, rsi):
+        # "long-divergence", "short-divergence" or None for the bar `wing` bars back
+        self.bar += 1
+        self.closes.append(close)
+        self.rsis.append(rsi)
+        if len(self.closes) < self.closes.maxlen:
+            return None
+        pivot = self.closes[self.wing]
+        pivot_rsi = self.rsis[self.wing]
+        others = [c for i, c in enumerate(self.closes) if i != self.wing]
+        point = (self.bar - self.wing, pivot, pivot_rsi)
+        if pivot < min(others):
+            previous, self.last_low = self.last_low, point
+            if self._diverges(previous, point, -1):
+                return "long-divergence"
+        elif pivot > max(others):
+            previous, self.last_high = self.last_high, point
+            if self._diverges(previous, point, 1):
+                return "short-divergence"
+        return None
+
+    def _diverges(self, previous, point, sign):
+        # sign -1 for lows: a lower price low on a higher RSI low; +1 mirrors it for highs
+        return (previous is not None and point[0] - previous[0] <= self.max_gap
+                and sign * (point[1] - previous[1]) > 0 and sign * (point[2] - previous[2]) < 0)
+
+
+class IndicatorState:
+    """Bars and indicators for one symbol; every tick and every bar close is O(1)."""
+
+    def __init__(self, symbol=SYMBOL, bar=INDICATOR_BAR):
+        self.symbol = symbol
+        self.bar_ms = BAR_SECONDS[bar] * 1000
+        self.rsi = RSI(INDICATOR_RSI_PERIOD)
+        self.macd = MACD(*INDICATOR_MACD)
+        self.divergence = Divergence(INDICATOR_PIVOT_WING, INDICATOR_PIVOT_GAP)
+        self.bucket = None          # start (ms) of the bar being built
+        self.close = None           # its last price so far; None until a tick lands in it
+        self.prev_histogram = None
+
+    def on_price(self, price, ts):
+        # Returns the bar-close signal, if the tick opened a new bar
+        bucket = ts - ts % self.bar_ms
+        if self.bucket is not None and bucket < self.bucket:
+            return None
+        kind = None
+        if self.bucket is None or bucket > self.bucket:
+            if self.close is not None:
+                kind = self.close_bar(self.close)
+            self.bucket = bucket
+        self.close = price
+        return kind
+
+    def close_bar(self, close):
+        """Feeds one closed bar through the indicators; returns the signal kind it completes, or None.
+
+        Divergences need RSI confirmation (the pivot in oversold/overbought
+        territory) and MACD momentum already turning in the signal's direction.
+        """
+        rsi = self.rsi.update(close)
+        histogram = self.macd.update(close)
+        prev_histogram, self.prev_histogram = self.prev_histogram, histogram
+        if rsi is None:
+            return None
+        kind = self.divergence.update(close, rsi)
+        if kind is None or histogram is None or prev_histogram is None:
+            return None
+        pivot_rsi = (self.divergence.last_low if kind == "long-divergence" else self.divergence.last_high)[2]
+        if kind == "long-divergence" and pivot_rsi <= INDICATOR_RSI_LOW and histogram > prev_histogram:
+            return kind
+        if kind == "short-divergence" and pivot_rsi >= INDICATOR_RSI_HIGH and histogram < prev_histogram:
+            return kind
+        return None
+
+    def signal(self, kind, price, ts):
+        # Same fields the signal server sends, so the bot cannot tell the two apart
+        distance = INDICATOR_DCA_DISTANCE if normalize_signal(kind) == "long" else -INDICATOR_DCA_DISTANCE
+        return Signal(id=f"{self.symbol}:{kind}:{ts}", pair=self.symbol, signal=normalize_signal(kind),
+                      price=price, tp=INDICATOR_TP, sl=INDICATOR_SL, dca_trigger=price * (1 - distance))
+
+
+class IndicatorEngine:
+    """In-process signal source: ticker stream -> bars -> RSI/MACD divergence -> SignalInbox.
+
+    on_tick is a TickerFeed listener and runs on the event loop; a signal
+    reaches the inbox microseconds after the tick that closed its bar.
+    """
+
+    def __init__(self, inbox, symbols=None, bar=INDICATOR_BAR):
+        self.inbox = inbox
+        self.bar = bar
+        self.states = {symbol: IndicatorState(symbol, bar) for symbol in (symbols or [SYMBOL])}
+
+    def on_tick(self, symbol, last, bid, ask, ts):
+        state = self.states.get(symbol)
+        if state is None or last is None:
+            return None
+        bucket = state.bucket
+        kind = state.on_price(last, ts)
+        if kind is None:
+            return None
+        try:
+            signal = self.inbox.ingest(state.signal(kind, last, bucket))
+        except Exception as e:
+            # Runs inside the ticker socket's session; a failed hand-off only loses this signal
+            print(f"[ERROR] {symbol} {kind} signal from indicators not delivered: {e}")
+            return None
+        if signal is not None:
+            print(f"[SIGNAL] {symbol} {kind} from indicators at {last}")
+        return signal
+
+    async def warm(self, aclient):
+        # Seeds every symbol from recent closed candles before the first tick;
+        # divergences found in the past are not traded
+        for symbol, state in self.states.items():
+            candles = await aclient.get_candles(symbol, self.bar, WARMUP_BARS)
+            for ts, close in candles:
+                state.close_bar(close)
+            if candles:
+                # The stream picks up at the bar in progress after the last closed one
+                state.bucket = candles[-1][0] + state.bar_ms
+            print(f"[SIGNAL] {symbol} indicators warmed with {len(candles)} {self.bar} bars.")
@@ -0,0 +1,90 @@
+import os
+import json
+import threading
+from config import STATE_DIR, JOURNAL_COMPACT_EVERY
+
+
+class StateJournal:
+    """Write-ahead journal of one bot's state, plus a compacted snapshot.
+
+    Every record is the bot's full state as one JSON line, so the newest
+    complete line wins and a torn last line (crash mid-write) is ignored.
+    After JOURNAL_COMPACT_EVERY records the newest state is written to the
+    snapshot file (write + fsync + rename) and the journal starts empty.
+    """
+
+    def __init__(self, name, directory=STATE_DIR, compact_every=JOURNAL_COMPACT_EVERY):
+        os.makedirs(directory, exist_ok=True)
+        self.snapshot_path = os.path.join(directory, f"{name}.snapshot.json")
+        self.journal_path = os.path.join(directory, f"{name}.journal")
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._records = 0
+        self._last = None
+        self._file = None
+
+    def load(self):
+        # Newest recorded state, or None for a bot that never ran here
+        with self._lock:
+            seq, state = 0, None
+            if os.path.exists(self.snapshot_path):
+                with open(self.snapshot_path) as f:
+                    data = json.load(f)
+                seq, state = data["seq"], data["state"]
+
+            if os.path.exists(self.journal_path):
+                with open(self.journal_path) as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            break
+                        if record["seq"] > seq:
+                            seq, state = record["seq"], record["state"]
+
+            self._seq, self._last = seq, state
+            if state is not None:
+                # Start from a clean snapshot so appends never follow a torn line
+                self._compact()
+            return state
+
+    def record(self, state, sync=False):
+        """Appends `state`; with sync=True it is fsynced before returning.
+
+        Without sync the line is still flushed to the OS, which survives a
+        process crash or restart but not a power cut.
+        """
+        with self._lock:
+            if state == self._last:
+                return
+            self._seq += 1
+            self._last = state
+            if self._file is None:
+                self._file = open(self.journal_path, "a")
+            self._file.write(json.dumps({"seq": self._seq, "state": state}) + "\n")
+            self._file.flush()
+            if sync:
+                os.fsync(self._file.fileno())
+            self._records += 1
+            if self._records >= self.compact_every:
+                self._compact()
+
+    def _compact(self):
+        tmp = self.snapshot_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"seq": self._seq, "state": self._last}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+
+        if self._file is not None:
+            self._file.close()
+        self._file = open(self.journal_path, "w")
+        self._records = 0
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
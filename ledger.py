@@ -0,0 +1,344 @@
+import time
+import threading
+from collections import OrderedDict, deque
+from portfolio import symbol_currencies
+from config import LEDGER_KEEP, ORDER_STREAM_KEEP
+
+ROLE_ID_LENGTH = 31     # new_cl_ord_id(); children and follow-ups only add suffixes
+FINAL = ("filled", "canceled", "mmp_canceled")
+
+
+def _float(value):
+    return float(value) if value not in (None, "") else 0.0
+
+
+class Inventory:
+    """Coin held for one pair at average cost, plus what its fills realized.
+
+    Buy fees (charged in coin) are part of the cost of what is left; sell
+    fees (in USDT) come off the realized PnL. Coin sold beyond what the
+    ledger knows of is taken at the fill price, realizing nothing.
+    """
+
+    def __init__(self):
+        self.qty = 0.0          # coin held
+        self.cost = 0.0         # USDT paid for it
+        self.realized = 0.0
+        self.fees = 0.0         # USDT, every fill
+
+    @property
+    def avg_price(self):
+        return self.cost / self.qty if self.qty > 0 else None
+
+    def buy(self, size, px, fee_coin):
+        self.qty += size - fee_coin
+        self.cost += size * px
+        self.fees += fee_coin * px
+
+    def sell(self, size, px, fee_usdt):
+        known = min(size, max(self.qty, 0.0))
+        avg = self.cost / self.qty if self.qty > 0 else px
+        self.realized += (px - avg) * known - fee_usdt
+        self.cost -= avg * known
+        self.qty -= known
+        if self.qty <= 0:
+            self.qty, self.cost = 0.0, 0.0
+        self.fees += fee_usdt
+
+    def unrealized(self, price):
+        return self.qty * price - self.cost if price else 0.0
+
+
+class Trade:
+    """One bot position, from its entry order to the close, DCA or force exit that ends it.
+
+    Entry legs (the open, plus a DCA) share one average entry. pnl is
+    what the exit fills realized against it, net of the fees of every
+    order the trade sent. A DCA ends the position without trading back,
+    so what is left is marked at the DCA fill price instead.
+    """
+
+    __slots__ = ("id", "symbol", "side", "opened_at", "closed_at", "legs", "entry_qty", "entry_value",
+                 "exit_qty", "exit_value", "fees", "exit", "mark")
+
+    def __init__(self, trade_id, symbol, side, opened_at):
+        self.id = trade_id
+        self.symbol = symbol
+        self.side = side
+        self.opened_at = opened_at
+        self.closed_at = None
+        self.legs = 0
+        self.entry_qty = 0.0
+        self.entry_value = 0.0
+        self.exit_qty = 0.0
+        self.exit_value = 0.0
+        self.fees = 0.0
+        self.exit = None        # close | dca | force once the trade is over
+        self.mark = None        # price the unexited rest is valued at once over
+
+    @property
+    def avg_entry(self):
+        return self.entry_value / self.entry_qty if self.entry_qty else None
+
+    def pnl(self, price=None):
+        # Realized on what was exited, plus the rest marked at `price` (or the trade's own mark)
+        if not self.entry_qty:
+            return -self.fees
+        direction = 1 if self.side == "long" else -1
+        avg = self.entry_value / self.entry_qty
+        pnl = direction * (self.exit_value - avg * self.exit_qty) - self.fees
+        mark = price if price is not None else self.mark
+        if mark is not None:
+            pnl += direction * (mark - avg) * max(self.entry_qty - self.exit_qty, 0.0)
+        return pnl
+
+    def to_dict(self, price=None):
+        pnl = self.pnl(price if self.exit is None else None)
+        return {
+            "id": self.id,
+            "symbol": self.symbol,
+            "side": self.side,
+            "status": "open" if self.exit is None else "closed",
+            "exit": self.exit,
+            "opened_at": self.opened_at,
+            "closed_at": self.closed_at,
+            "legs": self.legs,
+            "entry_qty": round(self.entry_qty, 8),
+            "avg_entry": self.avg_entry,
+            "exit_qty": round(self.exit_qty, 8),
+            "avg_exit": self.exit_value / self.exit_qty if self.exit_qty else None,
+            "fees_usdt": round(self.fees, 6),
+            "pnl_usdt": round(pnl, 6),
+            "pnl_percent": round(pnl / self.entry_value * 100, 4) if self.entry_value else 0.0,
+        }
+
+
+class TradeStats:
+    """Running figures over every finished trade of a pair.
+
+    A fill that reaches a trade after it was counted (the rest of a sliced
+    exit, say) revises its contribution; best and worst keep the extremes seen.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.wins = 0
+        self.total = 0.0
+        self.gross_win = 0.0
+        self.gross_loss = 0.0
+        self.best = None
+        self.worst = None
+        self.exits = {"close": 0, "dca": 0, "force": 0}
+
+    def add(self, pnl, exit):
+        self.count += 1
+        self.exits[exit] = self.exits.get(exit, 0) + 1
+        self._include(pnl)
+
+    def revise(self, old, new):
+        self._exclude(old)
+        self._include(new)
+
+    def _include(self, pnl):
+        self.total += pnl
+        if pnl > 0:
+            self.wins += 1
+            self.gross_win += pnl
+        else:
+            self.gross_loss -= pnl
+        self.best = pnl if self.best is None else max(self.best, pnl)
+        self.worst = pnl if self.worst is None else min(self.worst, pnl)
+
+    def _exclude(self, pnl):
+        self.total -= pnl
+        if pnl > 0:
+            self.wins -= 1
+            self.gross_win -= pnl
+        else:
+            self.gross_loss += pnl
+
+    def to_dict(self):
+        return {
+            "trades": self.count,
+            "wins": self.wins,
+            "losses": self.count - self.wins,
+            "win_rate": round(self.wins / self.count, 4) if self.count else None,
+            "pnl_usdt": round(self.total, 6),
+            "avg_pnl_usdt": round(self.total / self.count, 6) if self.count else None,
+            "profit_factor": round(self.gross_win / self.gross_loss, 4) if self.gross_loss else None,
+            "best_usdt": round(self.best, 6) if self.best is not None else None,
+            "worst_usdt": round(self.worst, 6) if self.worst is not None else None,
+            "exits": self.exits,
+        }
+
+
+class TradeLedger:
+    """Trades, PnL and balances kept from fill pushes, O(1) per fill.
+
+    on_order is an OrderStream listener. Each push carries the order's
+    latest fill (fillSz/fillPx/fillFee); one whose accFillSz did not grow
+    is a repeat and is skipped. TradingBot registers every order it sends
+    with expect(), which ties the order to the trade it opens, adds to or
+    ends before any fill arrives; any other fill only moves the balances
+    and the inventory. Every balance read goes through seed(), putting
+    cash and coin back on what the exchange holds; between reads
+    snapshot() values a pair from fills alone, without a request, as long
+    as `stream` has been up since that read.
+    """
+
+    def __init__(self, symbols, keep=LEDGER_KEEP, stream=None):
+        self.inventory = {symbol: Inventory() for symbol in symbols}
+        self.stats = {symbol: TradeStats() for symbol in symbols}
+        self.current = {}                   # symbol -> latest Trade, open or over
+        self.trades = deque(maxlen=keep)    # oldest first
+        self.cash = None                    # USDT, shared by every pair
+        self.seeded_at = {}                 # symbol -> monotonic time of its last balance read
+        self.filled_at = {}                 # symbol -> monotonic time of its last fill
+        self._roles = OrderedDict()         # role id -> [symbol, action, side, Trade or None, filled yet]
+        self._filled = OrderedDict()        # ordId -> accFillSz applied so far
+        self._next_id = 1
+        self._lock = threading.Lock()
+        # The OrderStream on_order listens to; while it is down, fills settle over REST and never arrive here
+        self.stream = stream
+
+    def expect(self, cl_ord_id, symbol, action, side):
+        # action: open | dca | close | force, as TradingBot._begin_order names it.
+        # An open makes its Trade on the first fill; anything else belongs to the pair's latest one
+        with self._lock:
+            trade = None if action == "open" else self.current.get(symbol)
+            self._roles[cl_ord_id[:ROLE_ID_LENGTH]] = [symbol, action, side, trade, False]
+            while len(self._roles) > ORDER_STREAM_KEEP:
+                self._roles.popitem(last=False)
+
+    def seed(self, symbol, snapshot, started=None):
+        # A (total, usdt, coin, price) balance read sent at monotonic `started`; the coin keeps
+        # its average cost. A read sent before the pair's last fill may predate it and is ignored
+        _, usdt, coin, price = snapshot
+        with self._lock:
+            if started is not None and started < self.filled_at.get(symbol, 0.0):
+                return False
+            inventory = self.inventory.setdefault(symbol, Inventory())
+            avg = inventory.avg_price or price
+            inventory.qty, inventory.cost = coin, coin * avg
+            self.cash = usdt
+            self.seeded_at[symbol] = time.monotonic()
+            return True
+
+    def snapshot(self, symbol, price, max_age):
+        # (total, usdt, coin, price) from fills since the last read, or None once that read
+        # is `max_age` s old or the stream dropped after it (fills may have been missed)
+        stream = self.stream
+        with self._lock:
+            inventory = self.inventory.get(symbol)
+            seeded_at = self.seeded_at.get(symbol)
+            if inventory is None or seeded_at is None or not price or time.monotonic() - seeded_at > max_age:
+                return None
+            if stream is not None and (not stream.connected or stream.connected_at > seeded_at):
+                return None
+            return self.cash + inventory.qty * price, self.cash, inventory.qty, price
+
+    def on_order(self, order):
+        size = _float(order.get("fillSz"))
+        if size <= 0:
+            return
+        with self._lock:
+            ord_id = order["ordId"]
+            filled = _float(order.get("accFillSz"))
+            if filled <= self._filled.get(ord_id, 0.0):
+                return
+            self._filled[ord_id] = filled
+            self._filled.move_to_end(ord_id)
+            while len(self._filled) > ORDER_STREAM_KEEP:
+                self._filled.popitem(last=False)
+            self._apply(order, size)
+
+    def _apply(self, order, size):
+        symbol = order["instId"]
+        px = _float(order.get("fillPx"))
+        coin, _ = symbol_currencies(symbol)
+        fee = -_float(order.get("fillFee"))
+        fee_usdt = fee * px if order.get("fillFeeCcy", order.get("feeCcy")) == coin else fee
+        buy = order["side"] == "buy"
+
+        self.filled_at[symbol] = time.monotonic()
+        inventory = self.inventory.setdefault(symbol, Inventory())
+        if buy:
+            inventory.buy(size, px, fee_usdt / px if px else 0.0)
+        else:
+            inventory.sell(size, px, fee_usdt)
+        if self.cash is not None:
+            self.cash += -size * px if buy else size * px - fee_usdt
+
+        role = self._roles.get((order.get("clOrdId") or "")[:ROLE_ID_LENGTH])
+        if role is None:
+            return
+        _, action, side, trade, seen = role
+        role[4] = True
+        ts = int(order.get("uTime") or time.time() * 1000)
+        if trade is None:
+            if action != "open":
+                return
+            trade = role[3] = self.current[symbol] = Trade(self._next_id, symbol, side, ts)
+            self._next_id += 1
+            self.trades.append(trade)
+        counted = trade.pnl() if trade.exit is not None else None
+
+        trade.fees += fee_usdt
+        if action in ("open", "dca"):
+            if not seen:
+                trade.legs += 1         # one leg per order, however many fills and follow-ups it takes
+            trade.entry_qty += size
+            trade.entry_value += size * px
+            if action == "dca":
+                trade.mark = px
+        elif side == trade.side:
+            # A force sell of coin a short trade had already sold: it ends the trade, at this price
+            trade.fees -= fee_usdt
+            trade.mark = px
+        else:
+            trade.exit_qty += size
+            trade.exit_value += size * px
+
+        stats = self.stats.setdefault(symbol, TradeStats())
+        if counted is not None:
+            stats.revise(counted, trade.pnl())
+        elif action != "open":
+            trade.exit, trade.closed_at = action, ts
+            stats.add(trade.pnl(), action)
+
+    def page(self, symbol=None, limit=50, before=None, price=None):
+        """Newest trades first, `limit` at a time; `before` is the id the previous page ended on.
+
+        An open trade is marked at `price`. Returns (trades, the `before`
+        for the next page, or None on the last one).
+        """
+        with self._lock:
+            rows = []
+            for trade in reversed(self.trades):
+                if before is not None and trade.id >= before:
+                    continue
+                if symbol is not None and trade.symbol != symbol:
+                    continue
+                rows.append(trade.to_dict(price))
+                if len(rows) > limit:
+                    break
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return rows, rows[-1]["id"] if more else None
+
+    def summary(self, symbol, price=None):
+        # Account PnL for the pair (every fill) next to the per-trade figures
+        with self._lock:
+            inventory = self.inventory.get(symbol, Inventory())
+            trade = self.current.get(symbol)
+            stats = self.stats.get(symbol, TradeStats())
+            return {
+                "realized_pnl_usdt": round(inventory.realized, 6),
+                "unrealized_pnl_usdt": round(inventory.unrealized(price), 6),
+                "fees_usdt": round(inventory.fees, 6),
+                "coin": round(inventory.qty, 8),
+                "avg_cost": inventory.avg_price,
+                "price": price,
+                "open_trade": trade.to_dict(price) if trade is not None and trade.exit is None else None,
+                **stats.to_dict(),
+            }
@@ -1,29 +1,290 @@
-import time
-import threading
-from trading import TradingBot
-from client import OKXClient
-import requests
-from config import SIGNAL_SERVER_URL, SYMBOL
+from trading import TradingBot, live_client, live_portfolio, live_orders, live_books
+from client import AsyncOKXClient
+from market_feed import TickerFeed
+from events import StateHub, LogBuffer
+from history import HistoryStore
+from journal import StateJournal
+from signals import SignalInbox, SignalPoller
+from indicators import IndicatorEngine
+from paper import PaperTrader
+from tape import TapeRecorder
+from risk import RiskEngine
+from ledger import TradeLedger
+import metrics
+from metrics import TRIGGER_TO_ORDER, BOT_LOOP, PORTFOLIO_VALUE, LIVE_PNL, BOT_EVENTS
+from ratelimit import LIMITER, request_lane, RISK
+from config import (
+    SIGNAL_SERVER_URL, SIGNAL_WEBHOOK_TOKEN, SYMBOLS, BOT_PARAMS, INDICATOR_SIGNALS, PAPER_BOTS, TAPE_RECORD,
+    RISK_ENGINE, LEDGER_RECONCILE_INTERVAL, WARM_UP_RETRY
+)
 
 import uvicorn
 import asyncio
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, HTMLResponse
+from fastapi.responses import StreamingResponse, HTMLResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from datetime import datetime, timezone
+import json
+import time
 import traceback
+import functools
+from contextlib import asynccontextmanager
 from fastapi.responses import JSONResponse
 
-bot = TradingBot()
-client = OKXClient()
-client.test_connection()
+# One bot per pair, built in lifespan; they share the sync client, the portfolio
+# snapshot, the ticker feed and the signal poller below. Importing this module
+# never talks to the exchange.
+aclient = AsyncOKXClient()
+bots = {}
+# Shadow bots on a virtual ledger (PAPER_BOTS), also built in lifespan
+paper = None
+# Session tape of every tick, signal and live order response (TAPE_RECORD), opened in lifespan
+tape = None
+
+# Streaming ticker shared by every client; get_price falls back to REST while it is stale
+feed = TickerFeed(SYMBOLS)
+aclient.price_feed = feed
+
+# What /ready reports until warm-up has read everything startup needs
+readiness = {"credentials": False, "portfolio": False, "indicators": not INDICATOR_SIGNALS}
 
 POLL_INTERVAL = 10  # seconds
-log_queue = asyncio.Queue()
+logs = LogBuffer()
+order_tasks = set()
+
+# Signals arrive by POST /api/signal and/or the conditional poller; bot_loop reads the latest
+inbox = SignalInbox()
+poller = SignalPoller(inbox, aclient.session) if SIGNAL_SERVER_URL else None
+# In-process RSI/MACD divergence signals, computed from the ticker stream itself
+indicators = IndicatorEngine(inbox, SYMBOLS) if INDICATOR_SIGNALS else None
+# Portfolio limits on every tick and balance read; it owns the trailing stop when on
+risk = RiskEngine(bots) if RISK_ENGINE else None
+# Trades, PnL and balances from the live bots' fill pushes
+ledger = TradeLedger(SYMBOLS)
+
+# Dashboard state is pushed from here to every /api/stream subscriber
+hub = StateHub()
+history = HistoryStore()
+
+
+def get_bot(symbol=None):
+    return bots.get((symbol or SYMBOLS[0]).upper())
 
-app = FastAPI()
+
+def unknown_symbol(symbol):
+    return JSONResponse(content={"error": f"Unknown symbol: {symbol}"}, status_code=404)
+
+
+def stats_payload(snapshot):
+    total, usdt, pi, price = snapshot
+    return {
+        "total": round(total, 4),
+        "usdt": round(usdt, 4),
+        "pi": round(pi, 4),
+        "price": round(price, 4)
+    }
+
+
+def record_bot_metrics(bot):
+    for event in ("tp_count", "dca_count", "profit_capture", "loss_limit"):
+        BOT_EVENTS.set(getattr(bot, event), symbol=bot.symbol, event=event)
+    position = bot.chart_position or {}
+    LIVE_PNL.set(position.get("live_pnl_percent", 0), symbol=bot.symbol)
+
+
+def publish_bot(bot):
+    record_bot_metrics(bot)
+    hub.publish(f"position:{bot.symbol}", bot.chart_position or {"message": "No active position"})
+    if getattr(bot, "live_portfolio_data", None):
+        hub.publish(f"portfolio:{bot.symbol}", bot.live_portfolio_data)
+
+
+def execute_order(bot, action):
+    # Worker thread; the bot has already put the position back, this only reports why
+    try:
+        bot.execute(action)
+    except Exception as e:
+        log_event(f"[ERROR] {bot.symbol} {action} order failed: {e}")
+
+
+def execute_and_publish(bot, action):
+    execute_order(bot, action)
+    publish_bot(bot)
+
+
+def on_tick(symbol, last, bid, ask, ts):
+    # Runs on the event loop for every streamed ticker; the decision is pure,
+    # only the resulting order is pushed to a worker thread
+    received = time.perf_counter()
+    bot = bots.get(symbol)
+    if bot is None:
+        return
+    # While the risk engine is selling the pair, the position is its to close
+    action = None if risk and symbol in risk.exiting else bot.on_price(last, received)
+    if action:
+        log_event(f"[TP/SL] {symbol} {action.upper()} triggered at {last}")
+        task = asyncio.create_task(asyncio.to_thread(execute_and_publish, bot, action))
+        order_tasks.add(task)
+        task.add_done_callback(order_tasks.discard)
+
+    publish_bot(bot)
+    snapshot = ledger.snapshot(symbol, last, LEDGER_RECONCILE_INTERVAL) or live_portfolio().reprice(symbol, last)
+    if snapshot:
+        hub.publish(f"stats:{symbol}", stats_payload(snapshot))
+
+
+def on_order_push(order):
+    # A fill changes balances: read them now, so the risk engine is not pricing stale ones until the next poll
+    symbol = order.get("instId")
+    if symbol in bots and order.get("state") in ("filled", "partially_filled"):
+        task = asyncio.create_task(refresh_portfolio(symbol, fresh=True))
+        order_tasks.add(task)
+        task.add_done_callback(order_tasks.discard)
+
+
+def on_paper_tick(symbol, last, bid, ask, ts):
+    # The same tick moves the paper market (filling resting paper orders) and its shadow bot
+    received = time.perf_counter()
+    paper.exchange.on_tick(symbol, last, bid, ask, ts)
+    bot = paper.bots.get(symbol)
+    if bot is None:
+        return
+    action = bot.on_price(last, received)
+    if action:
+        log_event(f"[PAPER] {symbol} {action.upper()} triggered at {last}")
+        task = asyncio.create_task(asyncio.to_thread(execute_order, bot, action))
+        order_tasks.add(task)
+        task.add_done_callback(order_tasks.discard)
+
+async def warm_up():
+    """Reads everything startup needs from the exchange at once, so a cold start
+    costs about one round trip: the credentials check, every pair's balances
+    and price, the journal reconciliation and the indicator candles. A step
+    that fails is logged and tried again every WARM_UP_RETRY seconds; trading
+    only starts once every one has succeeded."""
+    started = time.perf_counter()
+    steps = {"credentials": check_credentials}
+    steps.update((f"portfolio {symbol}", functools.partial(warm_portfolio, symbol)) for symbol in bots)
+    steps.update((f"reconcile {bot.symbol}", functools.partial(asyncio.to_thread, bot.reconcile)) for bot in bots.values())
+    if indicators:
+        steps["indicators"] = functools.partial(indicators.warm, aclient)
+    if paper:
+        steps["paper"] = functools.partial(asyncio.to_thread, paper.warm)
+    results = {}
+    while True:
+        names = [name for name in steps if name not in results]
+        outcomes = await asyncio.gather(*(steps[name]() for name in names), return_exceptions=True)
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, Exception):
+                log_event(f"[WARMUP] {name} failed: {outcome}")
+            else:
+                results[name] = outcome
+        readiness["credentials"] = "credentials" in results
+        if len(results) == len(steps):
+            break
+        await asyncio.sleep(WARM_UP_RETRY)
+
+    # Init tracking; growth keeps counting from the first start recorded in the history store
+    for bot in bots.values():
+        snapshot = results[f"portfolio {bot.symbol}"]
+        bot.warm(snapshot)
+        initial = history.initial(bot.symbol)
+        if initial is None:
+            initial = snapshot[0], datetime.now(timezone.utc).isoformat()
+            history.set_initial(bot.symbol, *initial)
+        bot.initial_portfolio_value, bot.initial_portfolio_timestamp = initial
+        publish_bot(bot)
+    readiness["portfolio"] = True
+
+    # Ticks only drive bots, limits and indicators once all are warm
+    if risk:
+        risk.armed = True
+        feed.listeners.append(risk.on_tick)
+        live_orders().listeners.append(on_order_push)
+    feed.listeners.append(on_tick)
+    if paper:
+        feed.listeners.append(on_paper_tick)
+    if indicators:
+        feed.listeners.append(indicators.on_tick)
+        readiness["indicators"] = True
+    log_event(f"[READY] Warm-up finished in {time.perf_counter() - started:.3f}s.")
+
+
+async def check_credentials():
+    if not await aclient.test_connection():
+        raise ConnectionError("OKX did not accept the API credentials")
+    return True
+
+
+async def warm_portfolio(symbol):
+    snapshot = await refresh_portfolio(symbol)
+    if snapshot is None:
+        raise ConnectionError("balance or price read failed")
+    return snapshot
+
+
+async def start_trading():
+    try:
+        await warm_up()
+    except Exception as e:
+        log_event(f"[ERROR] Warm-up failed; not trading: {e}")
+        traceback.print_exc()
+        return
+    await bot_loop()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global paper, tape
+    hub.bind(asyncio.get_running_loop())
+    logs.bind(asyncio.get_running_loop())
+
+    # Journals are local files; building the bots does no network I/O
+    for symbol in SYMBOLS:
+        bots[symbol] = TradingBot(symbol, params=BOT_PARAMS.get(symbol), journal=StateJournal(symbol), ledger=ledger)
+    live_client().price_feed = feed
+    # aclient reads balances into the live snapshot, so an order it sends must drop them too
+    aclient.order_listeners.append(lambda body, response: live_portfolio().invalidate())
+    live_orders().listeners.append(ledger.on_order)
+    ledger.stream = live_orders()
+    # Paper bots only see pairs the live feed streams
+    shadow = {symbol.upper(): params for symbol, params in PAPER_BOTS.items() if symbol.upper() in SYMBOLS}
+    for symbol in set(map(str.upper, PAPER_BOTS)) - set(shadow):
+        print(f"[PAPER] {symbol} is not in SYMBOLS; no shadow bot for it.")
+    if shadow:
+        paper = PaperTrader(shadow, live_client(), live_books().books)
+    # The tape hears each tick before anything acts on it
+    if TAPE_RECORD:
+        tape = TapeRecorder(symbols=SYMBOLS)
+        feed.listeners.append(tape.tick)
+        inbox.listeners.append(tape.signal)
+        live_client().order_listeners.append(tape.order)
+        live_orders().listeners.append(tape.push)
+
+    # Streams connect while warm-up runs; uvicorn serves (and /ready answers 503) meanwhile.
+    # The bot loop shares uvicorn's event loop instead of running in its own thread
+    feed_task = asyncio.create_task(feed.run())
+    orders_task = asyncio.create_task(live_orders().run())
+    books_task = asyncio.create_task(live_books().run())
+    poll_task = asyncio.create_task(poller.run()) if poller else None
+    task = asyncio.create_task(start_trading())
+    yield
+    task.cancel()
+    feed_task.cancel()
+    orders_task.cancel()
+    books_task.cancel()
+    if poll_task:
+        poll_task.cancel()
+    await aclient.aclose()
+    history.close()
+    if tape:
+        tape.close()
+    for bot in bots.values():
+        bot.journal.close()
+
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS for local testing or frontend
 app.add_middleware(
@@ -42,26 +303,117 @@ async def dashboard(request: Request):
     return templates.TemplateResponse("dashboard.html", {"request": request})
 
 
-@app.get("/stats")
-def get_stats():
-    total, usdt, pi, price = bot.get_portfolio_value()
+async def refresh_portfolio(symbol, fresh=False):
+    # None when the balances or the price could not be read
+    portfolio = live_portfolio()
+    snapshot = None if fresh else portfolio.peek(symbol)
+    if snapshot is None:
+        started = time.monotonic()
+        balances, price = await aclient.get_balances_and_price(portfolio.currencies(), symbol)
+        if balances is None or not price:
+            return None
+        snapshot = portfolio.store(balances, price, symbol)
+        ledger.seed(symbol, snapshot, started)
+        if risk:
+            risk.on_balances(symbol, snapshot)
+    hub.publish(f"stats:{symbol}", stats_payload(snapshot))
+    return snapshot
+
+
+@app.get("/ready")
+def get_ready():
+    # 200 once warm-up is done and the ticker stream is live, 503 until then
+    status = dict(readiness, feed=feed.connected)
+    return JSONResponse(content=status, status_code=200 if all(status.values()) else 503)
+
+
+@app.get("/api/paper")
+def get_paper():
+    # Shadow bots' virtual ledgers next to their parameters; no exchange orders behind them
+    if paper is None:
+        return JSONResponse(content={"message": "Paper trading is off (set PAPER_BOTS)"}, status_code=404)
+    return paper.summary()
+
+
+@app.get("/api/risk")
+def get_risk():
+    # Account exposure, daily loss baseline, breaches so far and decision latency
+    if risk is None:
+        return JSONResponse(content={"message": "Risk engine is off (RISK_ENGINE=false)"}, status_code=404)
+    return risk.snapshot()
+
+
+@app.get("/api/trades")
+def get_trades(symbol: str = None, limit: int = Query(50, ge=1, le=500), before: int = None):
+    # Newest first; pass `next_before` back as `before` for the next page. Served from the ledger, no exchange calls
+    bot = get_bot(symbol)
+    if bot is None:
+        return unknown_symbol(symbol)
+    price = feed.last_price(bot.symbol)
+    trades, next_before = ledger.page(bot.symbol, limit, before, price)
     return {
-        "total": round(total, 4),
-        "usdt": round(usdt, 4),
-        "pi": round(pi, 4),
-        "price": round(price, 4)
+        "symbol": bot.symbol,
+        "summary": ledger.summary(bot.symbol, price),
+        "trades": trades,
+        "next_before": next_before,
     }
 
+
+@app.get("/api/bots")
+def get_bots():
+    return [
+        {"symbol": bot.symbol, "active_position": bot.active_position, "params": bot.params}
+        for bot in bots.values()
+    ]
+
+
+@app.get("/stats")
+def get_stats(symbol: str = None):
+    # Last published snapshot; never calls the exchange
+    bot = get_bot(symbol)
+    if bot is None:
+        return unknown_symbol(symbol)
+    stats = hub.latest(f"stats:{bot.symbol}")
+    if stats is None:
+        return JSONResponse(content={"message": "Stats unavailable"}, status_code=503)
+    return stats
+
+@app.get("/api/stream")
+async def stream_state(symbol: str = None, topics: str = "stats,position,portfolio"):
+    bot = get_bot(symbol)
+    if bot is None:
+        return unknown_symbol(symbol)
+    names = [f"{topic.strip()}:{bot.symbol}" for topic in topics.split(",")]
+
+    async def event_generator():
+        async for item in hub.subscribe(names):
+            if item is None:
+                yield ": keep-alive\n\n"
+                continue
+            topic, payload = item
+            yield f"event: {topic.split(':')[0]}\ndata: {json.dumps(payload)}\n\n"
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
 @app.get("/logs")
-async def stream_logs():
+async def stream_logs(request: Request):
+    # EventSource sends Last-Event-ID on reconnect; resume right after it
+    last_id = request.headers.get("last-event-id", "")
+    cursor = int(last_id) if last_id.isdigit() else 0
+
     async def event_generator():
-        while True:
-            message = await log_queue.get()
-            yield f"data: {message}\n\n"
+        async for entry in logs.subscribe(cursor):
+            if entry is None:
+                yield ": keep-alive\n\n"
+                continue
+            event_id, message = entry
+            yield f"id: {event_id}\ndata: {message}\n\n"
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
 @app.get("/api/position")
-def get_position_data():
+def get_position_data(symbol: str = None):
+    bot = get_bot(symbol)
+    if bot is None:
+        return unknown_symbol(symbol)
     try:
         chart = getattr(bot, "chart_position", None)
         if chart:
@@ -81,7 +433,10 @@ async def position_tracker(request: Request):
 
 
 @app.get("/api/portfolio")
-def get_portfolio_data():
+def get_portfolio_data(symbol: str = None):
+    bot = get_bot(symbol)
+    if bot is None:
+        return unknown_symbol(symbol)
     try:
         if getattr(bot, "live_portfolio_data", None):
             return JSONResponse(content=bot.live_portfolio_data)
@@ -91,6 +446,53 @@ def get_portfolio_data():
         traceback.print_exc()
         return JSONResponse(content={"error": "Internal Server Error"}, status_code=500)
 
+@app.post("/api/signal")
+async def receive_signal(request: Request):
+    # Push endpoint for the signal server; same payload as its GET /api/signal
+    if SIGNAL_WEBHOOK_TOKEN and request.headers.get("x-signal-token") != SIGNAL_WEBHOOK_TOKEN:
+        return JSONResponse(content={"error": "Invalid signal token"}, status_code=401)
+    try:
+        payload = await request.json()
+        signal = inbox.ingest(payload)
+    except Exception as e:
+        return JSONResponse(content={"error": f"Invalid signal: {e}"}, status_code=400)
+    if signal is None:
+        return {"accepted": False, "reason": "duplicate"}
+    log_event(f"[SIGNAL] Pushed {signal.signal} signal for {signal.pair} ({signal.id})")
+    return {"accepted": True, "id": signal.id}
+
+@app.get("/api/portfolio/history")
+def get_portfolio_history(
+    symbol: str = None,
+    start: int = Query(None, alias="from"),
+    end: int = Query(None, alias="to"),
+    resolution: int = Query(None, ge=1)
+):
+    # from/to are epoch milliseconds, resolution is seconds per point
+    bot = get_bot(symbol)
+    if bot is None:
+        return unknown_symbol(symbol)
+    resolution, columns = history.query(bot.symbol, start, end, resolution)
+    return {
+        "symbol": bot.symbol,
+        "initial": round(bot.initial_portfolio_value, 4),
+        "init_timestamp": bot.initial_portfolio_timestamp,
+        "resolution": resolution,
+        **columns
+    }
+
+@app.get("/api/latency")
+def get_latency_data():
+    return JSONResponse(content=TRIGGER_TO_ORDER.snapshot())
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/ratelimit")
+def get_rate_limit_data():
+    return JSONResponse(content=LIMITER.snapshot())
+
 @app.get("/portfolio_chart", response_class=HTMLResponse)
 async def portfolio_chart(request: Request):
     return templates.TemplateResponse("portfolio_chart.html", {"request": request})
@@ -99,99 +501,128 @@ def log_event(msg: str):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     full_msg = f"[{timestamp}] {msg}"
     print(full_msg)
-    asyncio.run(log_queue.put(full_msg))
+    logs.append(full_msg)
 
 
-def bot_loop():
-    print("🚀 OKX Trader bot started.")
+async def bot_loop():
+    print(f"🚀 OKX Trader bot started for {', '.join(bots)}.")
     while True:
-        try:
-            response = requests.get(SIGNAL_SERVER_URL)
-            data = response.json()
-        except Exception as e:
-            log_event(f"[ERROR] Failed to fetch or parse signal: {e}")
-            time.sleep(POLL_INTERVAL)
-            continue
-        
-        try:
-            # Tracking portfolio
-            current_value = bot.get_portfolio_value()[0]
-            growth_percent = ((current_value - bot.initial_portfolio_value) / bot.initial_portfolio_value) * 100
-
-            bot.live_portfolio_data = {
-                "initial": round(bot.initial_portfolio_value, 4),
-                "init_timestamp": bot.initial_portfolio_timestamp,
-                "current": round(current_value, 4),
-                "growth_percent": round(growth_percent, 2),
-                "timestamp": datetime.now(timezone.utc).isoformat()
-            }
-
-            # ---Checking portfolio growth before trading session
-            bot.check_portfolio_trailing()
-            time.sleep(POLL_INTERVAL)
-            #bot.check_portfolio_shrink()
-            #time.sleep(POLL_INTERVAL)
-            
-            signal = data.get("signal")
-            pair = data.get("pair")
-            log_event(f"[DEBUG] Received signal: {signal}, pair: {pair}")
-
-            if bot.active_position:
-
-                log_event("[IDLE] Already in position. Skipping signal.")
-                price = client.get_price()
-                msg = bot.check_tp_sl(price)
-                if msg:
-                    log_event(msg)
-                time.sleep(POLL_INTERVAL)
-                continue
+        # The same Signal object goes to every bot; a new one cuts the wait short
+        signal = inbox.latest
+        with BOT_LOOP.time():
+            await asyncio.gather(*(run_bot(bot, signal) for bot in bots.values()),
+                                 *(run_paper_bot(bot, signal) for bot in (paper.bots.values() if paper else ())))
+        await inbox.wait(POLL_INTERVAL)
 
-            # Normalize signal
-            signal_map = {
-                "long-divergence": "long",
-                "short-divergence": "short"
-            }
-            signal = signal_map.get(signal, signal)
 
-            if signal not in ["long", "short"]:
-                log_event(f"[IDLE] Unknown signal received: {signal}")
-                time.sleep(POLL_INTERVAL)
-                continue
+async def run_bot(bot, signal):
+    symbol = bot.symbol
+    try:
+        # Tracking portfolio from fills and the streamed price; balances are read
+        # again every LEDGER_RECONCILE_INTERVAL, in the risk lane the trailing check uses
+        snapshot = ledger.snapshot(symbol, feed.last_price(symbol), LEDGER_RECONCILE_INTERVAL)
+        if snapshot is None:
+            with request_lane(RISK):
+                snapshot = await refresh_portfolio(symbol)
+            if snapshot is None:
+                log_event(f"[ERROR] {symbol} balance read failed; skipping this pass.")
+                return
+        else:
+            hub.publish(f"stats:{symbol}", stats_payload(snapshot))
+        current_value = snapshot[0]
+        PORTFOLIO_VALUE.set(current_value, symbol=symbol)
+        initial = bot.initial_portfolio_value
+        growth_percent = (current_value - initial) / initial * 100 if initial else 0.0
+
+        bot.live_portfolio_data = {
+            "initial": round(bot.initial_portfolio_value, 4),
+            "init_timestamp": bot.initial_portfolio_timestamp,
+            "current": round(current_value, 4),
+            "growth_percent": round(growth_percent, 2),
+            "timestamp": datetime.now(timezone.utc).isoformat()
+        }
+        await asyncio.to_thread(history.append, symbol, {
+            "value": current_value,
+            "price": snapshot[3],
+            "pnl": current_value - bot.initial_portfolio_value,
+            "growth_percent": growth_percent,
+            "tp_count": bot.tp_count,
+            "dca_count": bot.dca_count,
+            "profit_capture": bot.profit_capture,
+            "loss_limit": bot.loss_limit,
+        })
+
+        # ---Checking portfolio growth before trading session
+        # TradingBot still talks to the exchange synchronously, so its
+        # calls run in a worker thread while the loop keeps serving requests.
+        # With the risk engine on, it watches trailing and drawdown on every tick instead
+        # and the peak it tracked is journaled here, off the tick path
+        if risk is None:
+            await asyncio.to_thread(bot.check_portfolio_trailing)
+        else:
+            await asyncio.to_thread(bot.save_state)
+
+        if signal is None or signal.pair != symbol:
+            if bot.active_position and feed.last_price(symbol) is None:
+                await poll_tp_sl(bot)
+            return
+
+        log_event(f"[DEBUG] Received signal: {signal.signal}, pair: {signal.pair}")
+
+        if bot.active_position:
+            log_event(f"[IDLE] {symbol} already in position. Skipping signal.")
+            if feed.last_price(symbol) is None:
+                await poll_tp_sl(bot)
+            return
+
+        if signal.signal not in ["long", "short"]:
+            log_event(f"[IDLE] Unknown signal received: {signal.signal}")
+            return
+
+        if risk and not risk.allows_entry(symbol, signal.signal):
+            log_event(f"[RISK] {symbol} {signal.signal} entry blocked by the risk limits.")
+            return
+
+        price = await aclient.get_price(symbol)
+        if not price:
+            log_event(f"[ERROR] Failed to fetch {symbol} price. Skipping trade.")
+            return
+
+        log_event(f"[TRADE] Executing {signal.signal.upper()} for {symbol} at price: {price}")
+        msg = await asyncio.to_thread(bot.open_position, signal.signal, price, signal)
+        if msg:
+            log_event(msg)
 
-            if not pair or pair.upper() != SYMBOL.upper():
-                log_event(f"[IDLE] Signal pair mismatch: {pair} != {SYMBOL}")
-                time.sleep(POLL_INTERVAL)
-                continue
+    except Exception as e:
+        log_event(f"[ERROR] {symbol} loop logic failed: {e}")
 
-            price = client.get_price()
-            if not price:
-                log_event("[ERROR] Failed to fetch price. Skipping trade.")
-                time.sleep(POLL_INTERVAL)
-                continue
+    publish_bot(bot)
 
-            log_event(f"[TRADE] Executing {signal.upper()} for {SYMBOL.upper()} at price: {price}")
-            msg = bot.open_position(signal, price)
-            if msg:
-                log_event(msg)
-                time.sleep(POLL_INTERVAL)
 
-        except Exception as e:
-            log_event(f"[ERROR] Main loop logic failed: {e}")
+async def run_paper_bot(bot, signal):
+    # run_bot's trading decisions on the virtual ledger, without history or dashboard updates
+    try:
+        await asyncio.to_thread(bot.check_portfolio_trailing)
+        if signal is None or signal.pair != bot.symbol or bot.active_position or signal.signal not in ("long", "short"):
+            return
+        price = await aclient.get_price(bot.symbol)
+        if price:
+            log_event(f"[PAPER] Executing {signal.signal.upper()} for {bot.symbol} at price: {price}")
+            await asyncio.to_thread(bot.open_position, signal.signal, price, signal)
+    except Exception as e:
+        log_event(f"[ERROR] {bot.symbol} paper loop failed: {e}")
 
-        time.sleep(POLL_INTERVAL)
 
+async def poll_tp_sl(bot):
+    # No live ticks, so TP/SL falls back to the poll cadence
+    with request_lane(RISK):
+        price = await aclient.get_price(bot.symbol)
+    action = await asyncio.to_thread(bot.check_tp_sl, price)
+    if action:
+        log_event(f"[TP/SL] {bot.symbol} {action.upper()} triggered at {price}")
 
-def start_api():
-    uvicorn.run(app, host="0.0.0.0", port=8080)
 
 # Entry point
 if __name__ == "__main__":
-    # Start FastAPI in a separate thread
-    threading.Thread(target=start_api, daemon=True).start()
-
-    # Init tracking
-    bot.initial_portfolio_value = bot.get_portfolio_value()[0]  # only `total`
-    bot.initial_portfolio_timestamp = datetime.now(timezone.utc).isoformat()
-
-    # Start the bot loop in main thread
-    bot_loop()
+    # FastAPI and the bot loop run on the same event loop (see lifespan)
+    uvicorn.run(app, host="0.0.0.0", port=8080)
@@ -0,0 +1,192 @@
+import json
+import time
+import asyncio
+import threading
+import websockets
+from config import (
+    SYMBOL, OKX_WS_PUBLIC_URL, FEED_STALE_AFTER, FEED_PING_INTERVAL,
+    FEED_GAP_MS, FEED_RECONNECT_MAX
+)
+
+
+class PriceCell:
+    """Latest last/bid/ask for one instrument, written by the feed and read by anyone."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.last = None
+        self.bid = None
+        self.ask = None
+        self.ts = 0             # exchange timestamp (ms)
+        self.received = 0.0     # local monotonic time of the update
+
+    def update(self, last, bid, ask, ts):
+        with self._lock:
+            self.last = last
+            self.bid = bid
+            self.ask = ask
+            self.ts = ts
+            self.received = time.monotonic()
+
+    def read(self):
+        with self._lock:
+            return self.last, self.bid, self.ask, self.ts, self.received
+
+    def clear(self):
+        with self._lock:
+            self.last = None
+            self.bid = None
+            self.ask = None
+            self.received = 0.0
+
+
+class TickerFeed:
+    """Streams the OKX public `tickers` channel into one PriceCell per symbol.
+
+    `connect` is any callable returning an async context manager whose value
+    has `send(text)` and `recv()`; it defaults to websockets.connect and can
+    be swapped for LocalTickerSource.connect to run without network.
+    """
+
+    def __init__(self, symbols=None, url=OKX_WS_PUBLIC_URL, connect=None, stale_after=FEED_STALE_AFTER):
+        self.symbols = list(symbols or [SYMBOL])
+        self.url = url
+        self.connect = connect or websockets.connect
+        self.stale_after = stale_after
+        self.cells = {symbol: PriceCell() for symbol in self.symbols}
+        self.listeners = []     # called as listener(symbol, last, bid, ask, ts) on every tick
+        self.connected = False
+        self.gaps = 0
+        self.reconnects = 0
+
+    def last_price(self, symbol=SYMBOL):
+        cell = self.cells.get(symbol)
+        if cell is None:
+            return None
+        last, _, _, _, received = cell.read()
+        if not self.connected or last is None:
+            return None
+        if time.monotonic() - received > self.stale_after:
+            return None
+        return last
+
+    async def run(self):
+        backoff = 1
+        while True:
+            try:
+                async with self.connect(self.url) as conn:
+                    await self._session(conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[FEED] Ticker stream dropped: {e}")
+            if self.connected:
+                backoff = 1     # the session got as far as its subscribe ack
+            self.connected = False
+            for cell in self.cells.values():
+                cell.clear()
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, FEED_RECONNECT_MAX)
+
+    async def _session(self, conn):
+        await conn.send(json.dumps({
+            "op": "subscribe",
+            "args": [{"channel": "tickers", "instId": symbol} for symbol in self.symbols]
+        }))
+        awaiting_pong = False
+        while True:
+            try:
+                raw = await asyncio.wait_for(conn.recv(), timeout=FEED_PING_INTERVAL)
+            except asyncio.TimeoutError:
+                # OKX closes idle sockets after 30s; a missed pong means a dead link
+                if awaiting_pong:
+                    raise ConnectionError("no pong from ticker stream")
+                await conn.send("ping")
+                awaiting_pong = True
+                continue
+            awaiting_pong = False
+            if raw == "pong":
+                continue
+            self._on_message(raw)
+
+    def _on_message(self, raw):
+        msg = json.loads(raw)
+        if msg.get("event") == "subscribe":
+            self.connected = True
+            print(f"[FEED] Subscribed to {msg['arg']['instId']} tickers.")
+            return
+        if msg.get("event") == "error":
+            raise ConnectionError(f"subscribe failed: {msg.get('msg')}")
+
+        for tick in msg.get("data", []):
+            symbol = tick["instId"]
+            cell = self.cells.get(symbol)
+            if cell is None:
+                continue
+            ts = int(tick["ts"])
+            _, _, _, last_ts, _ = cell.read()
+            if ts <= last_ts:
+                continue    # duplicate or out-of-order push
+            if last_ts and ts - last_ts > FEED_GAP_MS:
+                self.gaps += 1
+                print(f"[FEED] Gap of {ts - last_ts} ms in {symbol} tickers.")
+
+            last = float(tick["last"])
+            bid = float(tick["bidPx"]) if tick.get("bidPx") else None
+            ask = float(tick["askPx"]) if tick.get("askPx") else None
+            self.connected = True
+            cell.update(last, bid, ask, ts)
+            for listener in self.listeners:
+                # One failing consumer must not drop the socket under the others
+                try:
+                    listener(symbol, last, bid, ask, ts)
+                except Exception as e:
+                    print(f"[FEED] {symbol} tick listener {listener.__qualname__} failed: {e}")
+
+
+class LocalTickerSource:
+    """In-process stand-in for the OKX public socket; pass `source.connect` to TickerFeed."""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.sent = []
+
+    def connect(self, url):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def send(self, text):
+        self.sent.append(text)
+        if text == "ping":
+            self.queue.put_nowait("pong")
+            return
+        msg = json.loads(text)
+        if msg.get("op") == "subscribe":
+            for arg in msg["args"]:
+                self.queue.put_nowait(json.dumps({"event": "subscribe", "arg": arg}))
+
+    async def recv(self):
+        raw = await self.queue.get()
+        if raw is None:
+            raise ConnectionError("local ticker source dropped")
+        return raw
+
+    def push(self, last, bid=None, ask=None, ts=None, inst_id=SYMBOL):
+        tick = {
+            "instId": inst_id,
+            "last": str(last),
+            "bidPx": str(bid) if bid is not None else "",
+            "askPx": str(ask) if ask is not None else "",
+            "ts": str(ts if ts is not None else int(time.time() * 1000)),
+        }
+        self.queue.put_nowait(json.dumps({"arg": {"channel": "tickers", "instId": inst_id}, "data": [tick]}))
+
+    def drop(self):
+        # Simulates the exchange closing the socket
+        self.queue.put_nowait(None)
@@ -0,0 +1,167 @@
+import time
+import bisect
+import threading
+
+# Seconds; tuned for the trading hot path (sub-millisecond up to a few seconds)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Every metric registers itself here; /metrics renders them all
+REGISTRY = []
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Histogram:
+    """Bucketed observations, one series per label set (observe(value, endpoint=...))."""
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self._series = {}       # label key -> [bucket counts (last slot +Inf), sum, count]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        index = bisect.bisect_left(self.buckets, value)
+        key = _key(labels) if labels else ()
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def _cumulative(self, counts):
+        cumulative, buckets = 0, {}
+        for bound, n in zip(self.buckets + ("+Inf",), counts):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        return buckets
+
+    def snapshot(self, **labels):
+        with self._lock:
+            counts, total, count = self._series.get(_key(labels), [[0] * (len(self.buckets) + 1), 0.0, 0])
+            counts = list(counts)
+        return {"name": self.name, "help": self.help, "buckets": self._cumulative(counts), "sum": total, "count": count}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in series:
+            for bound, n in self._cumulative(counts).items():
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {n}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+
+class Gauge:
+    """Current value per label set, e.g. queue depth by lane."""
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = _key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            values = [{"labels": dict(key), "value": value} for key, value in self._values.items()]
+        return {"name": self.name, "help": self.help, "values": values}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = list(self._values.items())
+        lines.extend(f"{self.name}{_format_labels(key)} {value}" for key, value in values)
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+def render():
+    # Prometheus text exposition format (0.0.4)
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+TRIGGER_TO_ORDER = Histogram(
+    "trigger_to_order_seconds",
+    "Time from a price tick crossing a TP/trailing/DCA trigger to the order being submitted",
+)
+TRIGGER_TO_EXIT = Histogram(
+    "trigger_to_exit_seconds",
+    "Time from a price tick crossing a TP/trailing/DCA trigger to the exchange answering the exit order",
+)
+SIGNAL_TO_ORDER = Histogram(
+    "signal_to_order_seconds",
+    "Time from a signal being received to its entry order being submitted",
+)
+ORDER_FILL = Histogram(
+    "order_fill_seconds",
+    "Time from an order being sent to its final state (filled, cancelled or rejected), by order type",
+)
+OKX_REQUEST = Histogram(
+    "okx_request_seconds",
+    "OKX REST round trips by endpoint, method and HTTP status (excludes rate-limit waits)",
+)
+BOT_LOOP = Histogram(
+    "bot_loop_iteration_seconds",
+    "Duration of one bot_loop pass over every bot",
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+PORTFOLIO_VALUE = Gauge("portfolio_value_usdt", "Last portfolio value (cash + coin at last price) by symbol")
+LIVE_PNL = Gauge("position_live_pnl_percent", "Open position PnL at the last tick by symbol (0 when flat)")
+BOT_EVENTS = Gauge("bot_events", "TradingBot tp_count / dca_count / profit_capture / loss_limit by symbol")
+RISK_DECISION = Histogram(
+    "risk_decision_seconds",
+    "Time the risk engine takes to evaluate one price or balance update",
+    buckets=(0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025),
+)
+RISK_TO_EXIT = Histogram(
+    "risk_to_exit_seconds",
+    "Time from the update that breached a risk limit to its force sell finishing, by reason",
+)
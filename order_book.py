@@ -0,0 +1,271 @@
+import json
+import time
+import zlib
+import asyncio
+import threading
+import numpy as np
+import websockets
+from config import (
+    SYMBOL, OKX_WS_PUBLIC_URL, FEED_STALE_AFTER, FEED_PING_INTERVAL, FEED_RECONNECT_MAX
+)
+
+CHECKSUM_LEVELS = 25
+
+
+def checksum(bids, asks):
+    """OKX `books` checksum: signed CRC32 of "bidPx:bidSz:askPx:askSz:..." over the top 25 levels.
+
+    `bids` and `asks` are best-first (price, size) pairs of the exchange's own strings.
+    """
+    parts = []
+    for i in range(CHECKSUM_LEVELS):
+        if i < len(bids):
+            parts.append(f"{bids[i][0]}:{bids[i][1]}")
+        if i < len(asks):
+            parts.append(f"{asks[i][0]}:{asks[i][1]}")
+    crc = zlib.crc32(":".join(parts).encode())
+    return crc - (1 << 32) if crc >= 1 << 31 else crc
+
+
+class BookSide:
+    """One side of an L2 book as sorted float64 arrays, best level first.
+
+    Bids are keyed by -price so both sides sort ascending. The exchange's
+    price/size strings are kept only for the checksum. Running totals for
+    depth queries are built once per change, not once per query.
+    """
+
+    def __init__(self, bids):
+        self.sign = -1.0 if bids else 1.0
+        self.clear()
+
+    def clear(self):
+        self.keys = np.empty(0)
+        self.sizes = np.empty(0)
+        self.raw = {}           # key -> (price string, size string)
+        self._walk = None
+
+    def walk(self):
+        # (prices, sizes, cumulative coin, cumulative USDT), best level first; never mutated once built
+        if self._walk is None:
+            prices, sizes = self.prices(), self.sizes.copy()
+            self._walk = (prices, sizes, np.cumsum(sizes), np.cumsum(prices * sizes))
+        return self._walk
+
+    def apply(self, levels):
+        # OKX levels are [price, size, "0", order count]; size "0" deletes the level
+        if levels:
+            self._walk = None
+        for level in levels:
+            px, sz = level[0], level[1]
+            key = self.sign * float(px)
+            size = float(sz)
+            i = int(np.searchsorted(self.keys, key))
+            exists = i < len(self.keys) and self.keys[i] == key
+            if size == 0:
+                if exists:
+                    self.keys = np.delete(self.keys, i)
+                    self.sizes = np.delete(self.sizes, i)
+                    del self.raw[key]
+            elif exists:
+                self.sizes[i] = size
+                self.raw[key] = (px, sz)
+            else:
+                self.keys = np.insert(self.keys, i, key)
+                self.sizes = np.insert(self.sizes, i, size)
+                self.raw[key] = (px, sz)
+
+    def prices(self):
+        return self.sign * self.keys
+
+    def top(self, n=CHECKSUM_LEVELS):
+        return [self.raw[key] for key in self.keys[:n]]
+
+
+class OrderBook:
+    """L2 mirror of one instrument, kept in sync with OKX `books` pushes.
+
+    A push whose prevSeqId does not follow the last seqId, or whose
+    checksum does not match, marks the book invalid until the feed
+    resubscribes and a new snapshot arrives. vwap() and capacity() are
+    vectorized walks over at most 400 levels, a few microseconds each.
+    """
+
+    def __init__(self, symbol=SYMBOL):
+        self.symbol = symbol
+        self.bids = BookSide(bids=True)
+        self.asks = BookSide(bids=False)
+        self.seq_id = None
+        self.ts = 0
+        self.received = 0.0
+        self.valid = False
+        self._lock = threading.Lock()
+
+    def apply(self, action, data):
+        # False when the push cannot be applied (sequence gap or bad checksum)
+        with self._lock:
+            if action == "snapshot":
+                self.bids.clear()
+                self.asks.clear()
+            elif not self.valid or data.get("prevSeqId") not in (None, self.seq_id):
+                self.valid = False
+                return False
+            self.bids.apply(data.get("bids", []))
+            self.asks.apply(data.get("asks", []))
+            self.seq_id = data.get("seqId")
+            self.ts = int(data.get("ts", 0))
+            if "checksum" in data and checksum(self.bids.top(), self.asks.top()) != int(data["checksum"]):
+                self.valid = False
+                return False
+            self.valid = True
+            self.received = time.monotonic()
+            return True
+
+    def invalidate(self):
+        with self._lock:
+            self.valid = False
+
+    def fresh(self, stale_after=FEED_STALE_AFTER):
+        return self.valid and time.monotonic() - self.received < stale_after
+
+    def best(self):
+        with self._lock:
+            bid = float(self.bids.prices()[0]) if len(self.bids.keys) else None
+            ask = float(self.asks.prices()[0]) if len(self.asks.keys) else None
+        return bid, ask
+
+    def _walk(self, side):
+        # Levels a `side` market order takes, best first, with running coin and USDT totals
+        with self._lock:
+            return (self.asks if side == "long" else self.bids).walk()
+
+    def vwap(self, side, size=None, quote=None):
+        """(vwap, coin filled, slippage vs the touch) of a `side` market order for `size` coin or `quote` USDT.
+
+        Fills only what the book holds; None when that side is empty.
+        """
+        prices, sizes, cum_size, cum_quote = self._walk(side)
+        if not len(prices):
+            return None
+        target, cumulative = (quote, cum_quote) if quote is not None else (size, cum_size)
+        k = int(np.searchsorted(cumulative, target))
+        if k >= len(prices):
+            filled, notional = cum_size[-1], cum_quote[-1]
+        else:
+            before_size = cum_size[k - 1] if k else 0.0
+            before_quote = cum_quote[k - 1] if k else 0.0
+            rest = target - (before_quote if quote is not None else before_size)
+            take = rest / prices[k] if quote is not None else rest
+            filled, notional = before_size + take, before_quote + take * prices[k]
+        if filled <= 0:
+            return float(prices[0]), 0.0, 0.0
+        vwap = notional / filled
+        return float(vwap), float(filled), float(abs(vwap / prices[0] - 1))
+
+    def capacity(self, side, budget):
+        """Largest (coin, USDT) a `side` market order can take with VWAP slippage within `budget`."""
+        prices, sizes, cum_size, cum_quote = self._walk(side)
+        if not len(prices):
+            return 0.0, 0.0
+        touch = prices[0]
+        slippage = np.abs(cum_quote / cum_size / touch - 1)     # non-decreasing level by level
+        k = int(np.searchsorted(slippage, budget, side="right"))
+        if k >= len(prices):
+            return float(cum_size[-1]), float(cum_quote[-1])
+        # Part of level k: (Q + p*x) / (S + x) lands exactly on the budget's VWAP limit
+        limit = touch * (1 + budget) if side == "long" else touch * (1 - budget)
+        size, quote = cum_size[k - 1], cum_quote[k - 1]
+        x = min(max((limit * size - quote) / (prices[k] - limit), 0.0), sizes[k])
+        return float(size + x), float(quote + x * prices[k])
+
+
+class BookFeed:
+    """Streams the OKX public `books` channel (400 levels) into one OrderBook per symbol.
+
+    A sequence gap or checksum mismatch resubscribes the instrument, which
+    makes OKX send a fresh snapshot; updates already in flight are dropped
+    until it arrives. `connect` works as in TickerFeed.
+    """
+
+    def __init__(self, symbols=None, url=OKX_WS_PUBLIC_URL, connect=None):
+        self.symbols = list(symbols or [SYMBOL])
+        self.url = url
+        self.connect = connect or websockets.connect
+        self.books = {symbol: OrderBook(symbol) for symbol in self.symbols}
+        self.connected = False
+        self.resyncs = 0
+        self.reconnects = 0
+        self.resyncing = set()      # symbols resubscribed and waiting for their snapshot
+
+    async def run(self):
+        backoff = 1
+        while True:
+            try:
+                async with self.connect(self.url) as conn:
+                    await self._session(conn)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[BOOK] Order book stream dropped: {e}")
+            if self.connected:
+                backoff = 1     # the session got as far as its subscribe ack
+            self.connected = False
+            self.resyncing.clear()
+            for book in self.books.values():
+                book.invalidate()
+            self.reconnects += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, FEED_RECONNECT_MAX)
+
+    async def _session(self, conn):
+        await conn.send(json.dumps({
+            "op": "subscribe",
+            "args": [{"channel": "books", "instId": symbol} for symbol in self.symbols]
+        }))
+        awaiting_pong = False
+        while True:
+            try:
+                raw = await asyncio.wait_for(conn.recv(), timeout=FEED_PING_INTERVAL)
+            except asyncio.TimeoutError:
+                if awaiting_pong:
+                    raise ConnectionError("no pong from order book stream")
+                await conn.send("ping")
+                awaiting_pong = True
+                continue
+            awaiting_pong = False
+            if raw == "pong":
+                continue
+            symbol = self._on_message(raw)
+            if symbol is not None:
+                self.resyncs += 1
+                print(f"[BOOK] {symbol} book out of sync; resubscribing.")
+                arg = [{"channel": "books", "instId": symbol}]
+                await conn.send(json.dumps({"op": "unsubscribe", "args": arg}))
+                await conn.send(json.dumps({"op": "subscribe", "args": arg}))
+
+    def _on_message(self, raw):
+        # Returns the symbol to resubscribe, if a push could not be applied
+        msg = json.loads(raw)
+        event = msg.get("event")
+        if event == "subscribe":
+            self.connected = True
+            print(f"[BOOK] Subscribed to {msg['arg']['instId']} books.")
+            return None
+        if event == "error":
+            raise ConnectionError(f"subscribe failed: {msg.get('msg')}")
+        if event:
+            return None
+
+        book = self.books.get(msg.get("arg", {}).get("instId"))
+        if book is None:
+            return None
+        action = msg.get("action", "update")
+        if action == "snapshot":
+            self.resyncing.discard(book.symbol)
+        elif book.symbol in self.resyncing:
+            return None     # sent before the resubscribe; the snapshot replaces it
+        for data in msg.get("data", []):
+            if not book.apply(action, data):
+                self.resyncing.add(book.symbol)
+                return book.symbol
+        return None
@@ -0,0 +1,163 @@
+from client import order_body, parse_balances
+from portfolio import PortfolioSnapshot
+from simulator import SimulatedExchange
+from trading import TradingBot
+from config import SYMBOL, PAPER_BALANCES
+
+
+class PaperExchange(SimulatedExchange):
+    """SimulatedExchange driven by the live market instead of a replay.
+
+    Prices arrive through on_tick (a TickerFeed listener) and fill resting
+    paper limits the way real ones would fill. Market orders walk the live
+    mirrored L2 book while it is fresh, so they pay real spread and depth;
+    without one they cross the streamed bid/ask, laddered `spread` apart.
+    Fees are the simulator's taker/maker rates.
+    """
+
+    def __init__(self, balances=None, books=None, **kwargs):
+        super().__init__(balances or PAPER_BALANCES, **kwargs)
+        self.prices = {}            # only what the live market has shown so far
+        self.live_books = books or {}
+        self.quotes = {}            # symbol -> (bid, ask) of the last tick
+
+    def on_tick(self, symbol, last, bid, ask, ts):
+        self.quotes[symbol] = (bid, ask)
+        self.set_price(symbol, last, ts)
+
+    def book(self, symbol):
+        live = self.live_books.get(symbol)
+        if live is not None and live.fresh():
+            bids, asks = live.bids.walk(), live.asks.walk()
+            if len(bids[0]) and len(asks[0]):
+                return list(zip(bids[0].tolist(), bids[1].tolist())), list(zip(asks[0].tolist(), asks[1].tolist()))
+        bid, ask = self.quotes.get(symbol, (None, None))
+        if not bid or not ask:
+            return super().book(symbol)
+        return ([(bid * (1 - self.spread) ** i, self.level_size) for i in range(self.depth)],
+                [(ask * (1 + self.spread) ** i, self.level_size) for i in range(self.depth)])
+
+
+class PaperClient:
+    """OKXClient stand-in that trades a PaperExchange ledger.
+
+    Orders, balances and fills never leave the process; prices still come
+    from `market` (the live client, stream first), so a paper bot sees
+    exactly what the live bots see.
+    """
+
+    def __init__(self, exchange, market):
+        self.exchange = exchange
+        self.market = market
+        self.order_listeners = []
+
+    @property
+    def price_feed(self):
+        # Limit prices join the live bid/ask, as they would for a live bot
+        return self.market.price_feed
+
+    def test_connection(self):
+        return True
+
+    def get_price(self, symbol=SYMBOL):
+        price = self.market.get_price(symbol)
+        if price is not None and symbol not in self.exchange.prices:
+            self.exchange.set_price(symbol, price)
+        return price
+
+    def get_balances(self, currencies):
+        return parse_balances(self.exchange.balance_response(currencies), currencies)
+
+    def get_balance(self, currency):
+        return self.get_balances([currency])[currency]
+
+    def get_position_size(self, currency):
+        return self.get_balance(currency)
+
+    def _after_order(self, body, response):
+        for listener in self.order_listeners:
+            listener(body, response)
+        return response
+
+    def place_order(self, side, amount, symbol=SYMBOL, ord_type="market", px=None, cl_ord_id=None):
+        if symbol not in self.exchange.prices:
+            self.get_price(symbol)
+        body = order_body(side, amount, symbol, ord_type, px, cl_ord_id)
+        return self._after_order(body, self.exchange.place_order(body))
+
+    def place_orders(self, orders):
+        data = []
+        for order in orders:
+            data.extend(self.place_order(**order)["data"])
+        code = "0" if all(item["sCode"] == "0" for item in data) else "2"
+        return {"code": code, "msg": "", "data": data}
+
+    def cancel_orders(self, symbol, cl_ord_ids):
+        body = [{"instId": symbol, "clOrdId": cl_ord_id} for cl_ord_id in cl_ord_ids]
+        data = [self.exchange.cancel_order(item)["data"][0] for item in body]
+        code = "0" if all(item["sCode"] == "0" for item in data) else "2"
+        return self._after_order(body, {"code": code, "msg": "", "data": data})
+
+    def get_order(self, symbol=SYMBOL, ord_id=None, cl_ord_id=None):
+        with self.exchange._lock:
+            order = self.exchange.find_order(ord_id, cl_ord_id)
+            if order is None:
+                return {"code": "51603", "msg": "Order does not exist", "data": []}
+            return {"code": "0", "msg": "", "data": [dict(order)]}
+
+    def cancel_order(self, symbol=SYMBOL, ord_id=None, cl_ord_id=None):
+        body = {"instId": symbol, "ordId": ord_id} if ord_id else {"instId": symbol, "clOrdId": cl_ord_id}
+        return self._after_order(body, self.exchange.cancel_order(body))
+
+    def get_fills(self, symbol=SYMBOL, begin=None):
+        with self.exchange._lock:
+            rows = [fill for fill in self.exchange.fills
+                    if fill["instId"] == symbol and (begin is None or int(fill["ts"]) >= begin)]
+        return list(reversed(rows))[:100]
+
+
+class PaperTrader:
+    """Shadow bots with their own parameters, trading one virtual ledger.
+
+    They take the live ticker stream and the live signals, so parameters
+    can be compared against production at full speed without a single
+    order reaching OKX.
+    """
+
+    def __init__(self, params_by_symbol, market, books=None, balances=None):
+        books = books or {}
+        self.exchange = PaperExchange(balances, books)
+        self.client = PaperClient(self.exchange, market)
+        # One snapshot for the ledger they share, so the account's value counts its cash once
+        self.portfolio = PortfolioSnapshot(self.client, symbols=[symbol.upper() for symbol in params_by_symbol])
+        self.bots = {
+            symbol.upper(): TradingBot(symbol, exchange=self.client, snapshot=self.portfolio, params=params,
+                                       book=books.get(symbol.upper()))
+            for symbol, params in params_by_symbol.items()
+        }
+
+    def warm(self):
+        for bot in self.bots.values():
+            bot.warm()
+        return self
+
+    def summary(self):
+        result = {}
+        for symbol, bot in self.bots.items():
+            total, cash, coin, price = bot.get_portfolio_value()
+            start = bot.initial_portfolio_value or total
+            result[symbol] = {
+                "params": bot.params,
+                "total": round(total, 4),
+                "usdt": round(cash, 4),
+                "coin": round(coin, 4),
+                "price": price,
+                "growth_percent": round((total - start) / start * 100, 4) if start else 0.0,
+                "fills": sum(1 for fill in self.exchange.fills if fill["instId"] == symbol),
+                "fees_usdt": round(sum(-float(fill["fee"]) * (float(fill["fillPx"]) if fill["side"] == "buy" else 1)
+                                       for fill in self.exchange.fills if fill["instId"] == symbol), 6),
+                "position": bot.chart_position or {"message": "No active position"},
+                "tp_count": bot.tp_count,
+                "dca_count": bot.dca_count,
+            }
+        return result
@@ -0,0 +1,126 @@
+import time
+import threading
+from config import SYMBOL, PORTFOLIO_SNAPSHOT_TTL
+
+
+def symbol_currencies(symbol):
+    # "PI-USDT" -> ("PI", "USDT"): the traded coin and the cash currency
+    coin, cash = symbol.upper().split("-")
+    return coin, cash
+
+
+class PortfolioSnapshot:
+    """Short-lived (total, usdt, coin, price) snapshots shared by every caller in a tick.
+
+    Balances for every registered symbol come from a single
+    /api/v5/account/balance?ccy=PI,USDT,... call, so N bots on one account
+    cost one balance request per TTL. Everything is dropped as soon as the
+    client places an order.
+    """
+
+    def __init__(self, client, ttl=PORTFOLIO_SNAPSHOT_TTL, symbols=None):
+        self.client = client
+        self.ttl = ttl
+        self.symbols = list(symbols or [SYMBOL])
+        self._lock = threading.Lock()          # guards the cached values only, never held across a request
+        self._fetch_lock = threading.Lock()    # one fetch at a time; the others wait for its result
+        self._generation = 0                   # bumped by invalidate(), so a fetch that raced an order is not cached
+        self._balances = None
+        self._balances_at = 0.0
+        self._values = {}       # symbol -> (value, fetched_at)
+        self._prices = {}       # symbol -> last price stored, kept across invalidate()
+        client.order_listeners.append(lambda body, response: self.invalidate())
+
+    def currencies(self):
+        currencies = []
+        for symbol in self.symbols:
+            for ccy in symbol_currencies(symbol):
+                if ccy not in currencies:
+                    currencies.append(ccy)
+        return currencies
+
+    def get(self, symbol=SYMBOL):
+        # Concurrent callers queue on the fetch lock and take the first one's
+        # result, so they cost one round trip; peek/store/reprice on the event
+        # loop only ever wait for a dict read.
+        value = self.peek(symbol)
+        if value is not None:
+            return value
+        with self._fetch_lock:
+            with self._lock:
+                value = self._fresh(symbol)
+                if value is not None:
+                    return value
+                if symbol not in self.symbols:
+                    self.symbols.append(symbol)
+                    self._balances = None
+                balances = self._balances
+                if balances is not None and time.monotonic() - self._balances_at >= self.ttl:
+                    balances = None
+                currencies, generation = self.currencies(), self._generation
+            if balances is None:
+                balances = self.client.get_balances(currencies)
+            price = self.client.get_price(symbol)
+            with self._lock:
+                return self._store(symbol, balances, price, generation)
+
+    def peek(self, symbol=SYMBOL):
+        with self._lock:
+            return self._fresh(symbol)
+
+    def store(self, balances, price, symbol=SYMBOL):
+        # Lets an async caller that fetched balances and price itself share the result
+        with self._lock:
+            return self._store(symbol, balances, price)
+
+    def account_value(self, snapshot, symbol=SYMBOL):
+        # The whole account from one pair's (total, usdt, coin, price): the cash once plus every
+        # registered pair's coin at its last price. Adding up pair totals would count the cash per pair
+        total, usdt, _, price = snapshot
+        with self._lock:
+            balances = self._balances
+            if balances is None:
+                return total
+            for other in self.symbols:
+                other_price = price if other == symbol else self._prices.get(other)
+                if other_price:
+                    usdt += balances.get(symbol_currencies(other)[0], 0.0) * other_price
+            return usdt
+
+    def reprice(self, symbol, price):
+        # Revalues the last known balances at a streamed price, without any request
+        with self._lock:
+            if self._balances is None:
+                return None
+            coin, cash = symbol_currencies(symbol)
+            pi, usdt = self._balances.get(coin, 0.0), self._balances.get(cash, 0.0)
+            return usdt + (pi * price), usdt, pi, price
+
+    def _fresh(self, symbol):
+        cached = self._values.get(symbol)
+        if cached is not None and time.monotonic() - cached[1] < self.ttl:
+            return cached[0]
+        return None
+
+    def _store(self, symbol, balances, price, generation=None):
+        coin, cash = symbol_currencies(symbol)
+        if balances is None:
+            pi, usdt = 0.0, 0.0
+        else:
+            pi, usdt = balances.get(coin, 0.0), balances.get(cash, 0.0)
+
+        value = (usdt + (pi * price), usdt, pi, price)
+        if price:
+            self._prices[symbol] = price
+        if balances is not None and generation in (None, self._generation):
+            now = time.monotonic()
+            if balances is not self._balances:
+                self._balances, self._balances_at = balances, now
+            self._values[symbol] = (value, now)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._balances = None
+            self._values.clear()
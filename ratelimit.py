@@ -0,0 +1,195 @@
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from metrics import Histogram, Gauge
+from config import RATE_LIMIT_BACKOFF_BASE, RATE_LIMIT_BACKOFF_MAX
+
+# Priority lanes, most urgent first
+ORDER = "order"
+RISK = "risk"
+READ = "read"
+LANES = (ORDER, RISK, READ)
+
+# OKX's published per-endpoint limits: (requests, per seconds)
+ENDPOINT_LIMITS = {
+    "/api/v5/trade/order": (60, 2),
+    "/api/v5/trade/cancel-order": (60, 2),
+    "/api/v5/trade/batch-orders": (300, 2),
+    "/api/v5/trade/cancel-batch-orders": (300, 2),
+    "/api/v5/trade/fills": (60, 2),
+    "/api/v5/account/balance": (10, 2),
+    "/api/v5/market/ticker": (20, 2),
+    "/api/v5/market/candles": (40, 2),
+}
+DEFAULT_LIMIT = (10, 2)
+THROTTLED = "50011"     # OKX "Too Many Requests", sent with or without HTTP 429
+
+RATE_LIMIT_QUEUE = Gauge("okx_rate_limit_queue_depth", "Requests waiting for a rate-limit token, by lane")
+RATE_LIMIT_WAIT = Histogram("okx_rate_limit_wait_seconds", "Time requests waited for a rate-limit token, by lane")
+
+_lane = contextvars.ContextVar("okx_request_lane", default=READ)
+
+
+@contextmanager
+def request_lane(lane):
+    # Requests made inside the block (including asyncio.to_thread calls) use `lane`
+    token = _lane.set(lane)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def current_lane(method, endpoint):
+    if method == "POST" and endpoint.startswith("/api/v5/trade/"):
+        return ORDER
+    return _lane.get()
+
+
+class TokenBucket:
+    def __init__(self, count, per):
+        self.capacity = count
+        self.rate = count / per
+        self.tokens = float(count)
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        # 0 when a token was taken, else seconds until the next one
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token buckets per OKX endpoint with a priority queue in front of each.
+
+    Tokens go to the most urgent waiter first (order > risk > read, FIFO
+    within a lane). A throttled response blocks the whole endpoint for a
+    jittered exponential backoff. Usable from threads (acquire) and from
+    the event loop (acquire_async); both share the same buckets. Only the
+    head of a queue waits on its bucket; the rest sleep until a head
+    takes its token or leaves, then the next one moves up.
+    """
+
+    def __init__(self, limits=ENDPOINT_LIMITS, default=DEFAULT_LIMIT):
+        self.limits = limits
+        self.default = default
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._queues = {}           # endpoint -> heap of (priority, seq)
+        self._conds = {}            # endpoint -> Condition on _lock, for waiting threads
+        self._sleepers = {}         # endpoint -> [(loop, future)] of waiting coroutines
+        self._blocked_until = {}
+        self._seq = itertools.count()
+
+    def _enqueue(self, endpoint, lane):
+        ticket = (LANES.index(lane), next(self._seq))
+        with self._lock:
+            if endpoint not in self._buckets:
+                self._buckets[endpoint] = TokenBucket(*self.limits.get(endpoint, self.default))
+                self._queues[endpoint] = []
+                self._conds[endpoint] = threading.Condition(self._lock)
+                self._sleepers[endpoint] = []
+            heapq.heappush(self._queues[endpoint], ticket)
+        RATE_LIMIT_QUEUE.inc(lane=lane)
+        return ticket
+
+    def _try(self, endpoint, ticket):
+        # With _lock held: 0 once `ticket` holds a token, None while it is not at
+        # the head of the queue (wait for _wake), else seconds to wait before asking again
+        now = time.monotonic()
+        blocked = self._blocked_until.get(endpoint, 0) - now
+        if blocked > 0:
+            return blocked
+        queue = self._queues[endpoint]
+        if queue[0] != ticket:
+            return None
+        wait = self._buckets[endpoint].take(now)
+        if wait == 0:
+            heapq.heappop(queue)
+            self._wake(endpoint)
+        return wait
+
+    def _wake(self, endpoint):
+        # With _lock held: the head changed, so every waiter looks again
+        self._conds[endpoint].notify_all()
+        for loop, future in self._sleepers[endpoint]:
+            loop.call_soon_threadsafe(_resolve, future)
+        self._sleepers[endpoint].clear()
+
+    def _dequeue(self, endpoint, ticket):
+        with self._lock:
+            queue = self._queues[endpoint]
+            if ticket in queue:
+                head = queue[0] == ticket
+                queue.remove(ticket)
+                heapq.heapify(queue)
+                if head:
+                    self._wake(endpoint)
+
+    def _done(self, lane, started):
+        RATE_LIMIT_QUEUE.dec(lane=lane)
+        RATE_LIMIT_WAIT.observe(time.monotonic() - started, lane=lane)
+
+    def acquire(self, endpoint, lane=READ):
+        started = time.monotonic()
+        ticket = self._enqueue(endpoint, lane)
+        try:
+            with self._lock:
+                while (wait := self._try(endpoint, ticket)) != 0:
+                    self._conds[endpoint].wait(wait)
+        finally:
+            self._dequeue(endpoint, ticket)
+            self._done(lane, started)
+
+    async def acquire_async(self, endpoint, lane=READ):
+        started = time.monotonic()
+        ticket = self._enqueue(endpoint, lane)
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                with self._lock:
+                    wait = self._try(endpoint, ticket)
+                    if wait is None:
+                        woken = loop.create_future()
+                        self._sleepers[endpoint].append((loop, woken))
+                if wait == 0:
+                    break
+                if wait is None:
+                    await woken
+                else:
+                    await asyncio.sleep(wait)
+        finally:
+            self._dequeue(endpoint, ticket)
+            self._done(lane, started)
+
+    def backoff(self, endpoint, attempt):
+        # Equal jitter: half the capped exponential delay, plus a random share of the other half
+        cap = min(RATE_LIMIT_BACKOFF_MAX, RATE_LIMIT_BACKOFF_BASE * 2 ** attempt)
+        delay = cap / 2 + random.uniform(0, cap / 2)
+        with self._lock:
+            self._blocked_until[endpoint] = max(self._blocked_until.get(endpoint, 0), time.monotonic() + delay)
+        return delay
+
+    def snapshot(self):
+        return {
+            "queue_depth": RATE_LIMIT_QUEUE.snapshot(),
+            "wait": {lane: RATE_LIMIT_WAIT.snapshot(lane=lane) for lane in LANES},
+        }
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+
+# One account, one budget: the sync and async clients share this limiter
+LIMITER = RateLimiter()
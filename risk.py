@@ -0,0 +1,163 @@
+import time
+import asyncio
+from datetime import datetime, timezone
+from metrics import RISK_DECISION, RISK_TO_EXIT
+from config import RISK_MAX_DRAWDOWN, RISK_MAX_EXPOSURE, RISK_DAILY_LOSS, RISK_MIN_NOTIONAL, RISK_RETRY_AFTER
+
+# Breach reasons
+TRAILING = "trailing"           # portfolio trailing stop gave back from its peak
+DRAWDOWN = "drawdown"           # value fell RISK_MAX_DRAWDOWN below the tracking point
+DAILY_LOSS = "daily_loss"       # account lost RISK_DAILY_LOSS since the UTC day began
+
+
+class RiskEngine:
+    """Portfolio-level limits, evaluated on every tick and every balance read.
+
+    on_tick (a TickerFeed listener) revalues the last balances seen for the
+    pair at the streamed price, so a limit is checked microseconds after
+    the price that breaches it instead of on the next bot_loop pass. A
+    breach force-sells in a worker thread straight away; cancel_all inside
+    force_sell_all pre-empts any order the bot still has resting, and
+    allows_entry() keeps bot_loop from opening while a limit holds. Runs on
+    the event loop.
+    """
+
+    def __init__(self, bots, max_drawdown=RISK_MAX_DRAWDOWN, max_exposure=RISK_MAX_EXPOSURE,
+                 daily_loss=RISK_DAILY_LOSS, min_notional=RISK_MIN_NOTIONAL, retry_after=RISK_RETRY_AFTER):
+        self.bots = bots                # symbol -> TradingBot
+        self.max_drawdown = max_drawdown
+        self.max_exposure = max_exposure
+        self.daily_loss = daily_loss
+        self.min_notional = min_notional    # coin worth less than this (USDT) is dust no exit can sell
+        self.retry_after = retry_after
+        self.cash = None                # USDT from the newest balance read (shared by every pair)
+        self.coins = {}                 # symbol -> coin held at the last balance read
+        self.prices = {}                # symbol -> last price
+        self.day = None                 # UTC date the daily loss is counted over
+        self.day_start = None           # account value at that day's first complete update
+        self.halted = False             # daily loss hit: no entries until the next UTC day
+        self.exiting = set()            # symbols with a risk exit in flight
+        self.retry_at = {}              # symbol -> monotonic time a failed exit may be tried again
+        self.armed = False              # set once the bots are warm; updates before that are only recorded
+        self.breaches = {TRAILING: 0, DRAWDOWN: 0, DAILY_LOSS: 0}
+        self._tasks = set()
+
+    def on_tick(self, symbol, last, bid, ask, ts):
+        received = time.perf_counter()
+        if last is None or symbol not in self.coins:
+            return None
+        self.prices[symbol] = last
+        return self._evaluate(symbol, received)
+
+    def on_balances(self, symbol, snapshot):
+        # A (total, usdt, coin, price) snapshot fresh from the exchange
+        received = time.perf_counter()
+        _, self.cash, self.coins[symbol], self.prices[symbol] = snapshot
+        return self._evaluate(symbol, received)
+
+    def account_value(self):
+        return self.cash + sum(coin * self.prices[symbol] for symbol, coin in self.coins.items())
+
+    def exposure(self):
+        # Share of the account held in coin
+        account = self.account_value()
+        return sum(coin * self.prices[symbol] for symbol, coin in self.coins.items()) / account if account > 0 else 0.0
+
+    def holds(self, symbol):
+        # True when the pair holds more coin than dust
+        coin = self.coins.get(symbol, 0)
+        return coin > 0 and coin * self.prices.get(symbol, 0) >= self.min_notional
+
+    def allows_entry(self, symbol, side):
+        # Consulted by bot_loop before opening; a short sells coin, so only the daily halt stops it
+        if self.halted or symbol in self.exiting:
+            return False
+        return side != "long" or not self.max_exposure or self.cash is None or self.exposure() < self.max_exposure
+
+    def _evaluate(self, symbol, received):
+        bot = self.bots.get(symbol)
+        if not self.armed or bot is None or bot.initial_portfolio_value is None or self.cash is None:
+            return None
+        # Every pair's trailing and drawdown follow the whole account, cash counted once
+        coin = self.coins[symbol]
+        reason = self._check(bot, symbol, self.account_value(), coin)
+        RISK_DECISION.observe(time.perf_counter() - received)
+        if reason == DAILY_LOSS:
+            for other in self.bots.values():
+                if self.holds(other.symbol) and not self._waiting(other.symbol):
+                    self._exit(other, reason, received)
+        elif reason:
+            self._exit(bot, reason, received)
+        return reason
+
+    def _check(self, bot, symbol, value, coin):
+        # The breach for one pair, if any; the trailing state it moves is the bot's own.
+        # The daily loss fires once, on the update that halts the day
+        if self._waiting(symbol):
+            return None
+        day = datetime.now(timezone.utc).date()
+        if day != self.day and len(self.coins) == len(self.bots):
+            self.day, self.day_start, self.halted = day, self.account_value(), False
+        if self.daily_loss and self.day_start and not self.halted:
+            if self.account_value() < self.day_start * (1 - self.daily_loss):
+                self.halted = True
+                return DAILY_LOSS
+        held = self.holds(symbol)
+        if self.halted and held and self.retry_at.pop(symbol, None):
+            return DAILY_LOSS       # the halt's exit failed earlier; try it again
+        if bot.trailing.on_value(value, coin if held else 0):
+            return TRAILING
+        if self.max_drawdown and held and value < bot.trailing.init_tracking_point * (1 - self.max_drawdown):
+            return DRAWDOWN
+        return None
+
+    def _waiting(self, symbol):
+        # An exit is in flight, or the last one failed less than retry_after ago
+        return symbol in self.exiting or time.monotonic() < self.retry_at.get(symbol, 0)
+
+    def _exit(self, bot, reason, received):
+        self.exiting.add(bot.symbol)
+        self.breaches[reason] += 1
+        print(f"[RISK] {bot.symbol} {reason} limit breached; force selling.")
+        task = asyncio.create_task(asyncio.to_thread(self._force_sell, bot, reason, received))
+        self._tasks.add(task)
+        task.add_done_callback(lambda done: self._exited(bot.symbol, done))
+
+    def _force_sell(self, bot, reason, received):
+        # Worker thread; returns the balances left afterwards
+        try:
+            bot.risk_exit(reason)
+            return bot.get_portfolio_value()
+        except Exception as e:
+            print(f"[ERROR] {bot.symbol} risk exit failed: {e}")
+            return None
+        finally:
+            RISK_TO_EXIT.observe(time.perf_counter() - received, reason=reason)
+
+    def _exited(self, symbol, task):
+        # Back on the loop: judge the pair again only on what the sale left, and
+        # not before retry_after when it left more than dust
+        self._tasks.discard(task)
+        snapshot = None if task.cancelled() else task.result()
+        if snapshot is not None:
+            _, self.cash, self.coins[symbol], self.prices[symbol] = snapshot
+        else:
+            self.coins.pop(symbol, None)
+        self.exiting.discard(symbol)
+        if snapshot is None or self.holds(symbol):
+            self.retry_at[symbol] = time.monotonic() + self.retry_after
+            print(f"[RISK] {symbol} risk exit left coin unsold; next attempt in {self.retry_after}s.")
+
+    def snapshot(self):
+        account = self.account_value() if self.cash is not None else None
+        return {
+            "account": round(account, 4) if account is not None else None,
+            "exposure": round(self.exposure(), 4) if account is not None else None,
+            "day_start": round(self.day_start, 4) if self.day_start else None,
+            "halted": self.halted,
+            "exiting": sorted(self.exiting),
+            "breaches": self.breaches,
+            "limits": {"max_drawdown": self.max_drawdown, "max_exposure": self.max_exposure,
+                       "daily_loss": self.daily_loss},
+            "decision_seconds": RISK_DECISION.snapshot(),
+        }
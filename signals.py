@@ -0,0 +1,130 @@
+import time
+import json
+import asyncio
+import hashlib
+from dataclasses import dataclass, field
+from collections import OrderedDict
+from config import SIGNAL_SERVER_URL, SIGNAL_CHECK_INTERVAL, SIGNAL_LONG_POLL_WAIT, SIGNAL_DEDUPE_SIZE
+
+SIGNAL_MAP = {
+    "long-divergence": "long",
+    "short-divergence": "short"
+}
+
+
+def normalize_signal(signal):
+    return SIGNAL_MAP.get(signal, signal)
+
+
+def _number(value):
+    return float(value) if value is not None else None
+
+
+@dataclass(frozen=True)
+class Signal:
+    """One trade signal, parsed once and passed unchanged from ingestion to order."""
+
+    id: str
+    pair: str
+    signal: str
+    price: float = None
+    tp: float = None
+    sl: float = None
+    dca_trigger: float = None
+    received_at: float = field(default_factory=time.time, compare=False)
+
+    @classmethod
+    def from_payload(cls, payload):
+        # Signal-server JSON; without an explicit id the payload's own content is the id
+        signal_id = payload.get("id")
+        if signal_id is None:
+            content = {key: value for key, value in payload.items() if key != "ts"}
+            signal_id = hashlib.sha1(json.dumps(content, sort_keys=True).encode()).hexdigest()[:16]
+        return cls(
+            id=str(signal_id),
+            pair=(payload.get("pair") or "").upper(),
+            signal=normalize_signal(payload.get("signal")),
+            price=_number(payload.get("price")),
+            tp=_number(payload.get("tp")),
+            sl=_number(payload.get("sl")),
+            dca_trigger=_number(payload.get("dca_trigger")),
+        )
+
+
+class SignalInbox:
+    """Latest signal from any source (webhook or poller), deduplicated by id.
+
+    Only a signal with an unseen id replaces `latest` and wakes wait(), so a
+    poller and a webhook delivering the same signal count it once.
+    """
+
+    def __init__(self, dedupe_size=SIGNAL_DEDUPE_SIZE):
+        self.latest = None
+        self.dedupe_size = dedupe_size
+        self.listeners = []     # called as listener(signal) on every new signal
+        self._seen = OrderedDict()
+        self._arrived = asyncio.Event()
+
+    def ingest(self, payload):
+        signal = payload if isinstance(payload, Signal) else Signal.from_payload(payload)
+        if signal.id in self._seen:
+            return None
+        self._seen[signal.id] = True
+        if len(self._seen) > self.dedupe_size:
+            self._seen.popitem(last=False)
+        self.latest = signal
+        self._arrived.set()
+        for listener in self.listeners:
+            listener(signal)
+        return signal
+
+    async def wait(self, timeout):
+        # Returns early when a new signal arrives, else after `timeout` seconds
+        try:
+            await asyncio.wait_for(self._arrived.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._arrived.clear()
+
+
+class SignalPoller:
+    """Conditional polling of the signal server.
+
+    Sends If-None-Match with the last ETag, so an unchanged signal costs a
+    bodyless 304, and `Prefer: wait=N` so a server that supports long
+    polling can hold the request open until a new signal exists.
+    """
+
+    def __init__(self, inbox, session, url=SIGNAL_SERVER_URL,
+                 interval=SIGNAL_CHECK_INTERVAL, wait=SIGNAL_LONG_POLL_WAIT):
+        self.inbox = inbox
+        self.session = session
+        self.url = url
+        self.interval = interval
+        self.wait = wait
+        self.etag = None
+
+    async def poll(self):
+        headers = {"Prefer": f"wait={self.wait}"} if self.wait else {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        response = await self.session.get(self.url, headers=headers, timeout=self.wait + 10)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        self.etag = response.headers.get("ETag")
+        return self.inbox.ingest(response.json())
+
+    async def run(self):
+        while True:
+            started = time.monotonic()
+            try:
+                signal = await self.poll()
+                if signal is not None:
+                    print(f"[SIGNAL] New {signal.signal} signal for {signal.pair} ({signal.id})")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[ERROR] Failed to fetch or parse signal: {e}")
+            # A held long poll already waited; only plain polls sleep the rest of the interval
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
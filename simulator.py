@@ -0,0 +1,629 @@
+import hmac
+import json
+import time
+import base64
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+from collections import deque
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+from events import call_on_loop
+from portfolio import symbol_currencies
+from order_book import checksum
+from indicators import BAR_SECONDS
+from config import SYMBOL
+
+TAKER_FEE = 0.001
+MAKER_FEE = 0.0008
+
+
+def _ok(data):
+    return {"code": "0", "msg": "", "data": data}
+
+
+def _rejected(s_code, s_msg, cl_ord_id=""):
+    # OKX shape for a refused order: top-level code 1, the reason in sCode/sMsg
+    return {"code": "1", "msg": "Operation failed.",
+            "data": [{"ordId": "", "clOrdId": cl_ord_id, "sCode": s_code, "sMsg": s_msg}]}
+
+
+class SimulatedExchange:
+    """In-memory OKX spot account and matching engine.
+
+    Market orders walk a synthetic book around the last price (`depth`
+    levels of `level_size` coin, `spread` apart); limit orders that do not
+    cross rest until set_price moves through them. Balances, orders and
+    fills are reported in OKX's response shapes, every order change is
+    pushed to private `orders` subscribers, and every price move to public
+    `tickers` and `books` (snapshot, then checksummed diffs) subscribers. `rng` drives every random
+    choice, so a seeded run is reproducible.
+    """
+
+    def __init__(self, balances=None, prices=None, spread=0.0002, depth=20, level_size=1e9,
+                 api_key=None, api_secret=None, passphrase=None, seed=0):
+        self.balances = dict(balances or {"USDT": 1000.0, "PI": 0.0})
+        self.frozen = {}
+        self.prices = dict(prices or {SYMBOL: 1.0})
+        self.spread = spread
+        self.depth = depth
+        self.level_size = level_size
+        self.api_key, self.api_secret, self.passphrase = api_key, api_secret, passphrase
+        self.rng = random.Random(seed)
+
+        self.orders = {}            # ordId -> order dict
+        self.by_client_id = {}      # clOrdId -> ordId
+        self.resting = set()        # ordIds of limit orders on the book
+        self.fills = []
+        self.ts = {}                # symbol -> ms of the last ticker
+        self.ticks = {}             # symbol -> recent (ts, price), served as candles
+        self._ids = 0
+        self._lock = threading.RLock()
+
+        # Fault injection and latency (seconds), all off by default
+        self.latency = (0.0, 0.0)
+        self.timeout_rate = 0.0
+        self.timeout_delay = 30.0
+        self.rate_limit_rate = 0.0
+        self.partial_fill_rate = 0.0
+        self.partial_fill_ratio = 0.5
+        self.book_checksum_fault_rate = 0.0     # chance a books diff carries a wrong checksum
+
+        self.loop = None
+        self.sockets = {}           # websocket -> (queue, subscribed (channel, instId) pairs)
+        self.books = {}             # symbol -> (seqId, bids, asks) as last pushed on `books`
+        self._seq = 0
+        self.order_sockets = {}     # websocket -> queue, for logged-in `orders` subscribers
+
+    # === Market ===
+    def _next_id(self):
+        self._ids += 1
+        return str(self._ids)
+
+    def book(self, symbol):
+        last = self.prices[symbol]
+        half = self.spread / 2
+        bids = [(last * (1 - half) * (1 - self.spread) ** i, self.level_size) for i in range(self.depth)]
+        asks = [(last * (1 + half) * (1 + self.spread) ** i, self.level_size) for i in range(self.depth)]
+        return bids, asks
+
+    def ticker(self, symbol):
+        bids, asks = self.book(symbol)
+        ts = self.ts.get(symbol) or int(time.time() * 1000)
+        return {"instId": symbol, "last": str(self.prices[symbol]), "bidPx": str(bids[0][0]),
+                "askPx": str(asks[0][0]), "ts": str(ts)}
+
+    def set_price(self, symbol, price, ts=None):
+        """Moves the market: fills resting limits the price crossed and pushes a ticker."""
+        with self._lock:
+            previous = self.ts.get(symbol, 0)
+            self.prices[symbol] = float(price)
+            self.ts[symbol] = max(previous + 1, ts if ts is not None else int(time.time() * 1000))
+            self.ticks.setdefault(symbol, deque(maxlen=100000)).append((self.ts[symbol], float(price)))
+            for ord_id in list(self.resting):
+                order = self.orders[ord_id]
+                if order["instId"] != symbol:
+                    continue
+                px = float(order["px"])
+                if (order["side"] == "buy" and price <= px) or (order["side"] == "sell" and price >= px):
+                    self._fill(order, px, float(order["sz"]) - float(order["accFillSz"]), maker=True)
+                    self._push_order(order)
+            message = json.dumps({"arg": {"channel": "tickers", "instId": symbol}, "data": [self.ticker(symbol)]})
+            books_update = self._books_update(symbol)
+        self._broadcast("tickers", symbol, message)
+        if books_update:
+            self._broadcast("books", symbol, books_update)
+
+    def candles(self, symbol, bar="1m", limit=100):
+        """OKX candle rows built from the prices set so far, newest first; the newest bar is unconfirmed."""
+        bar_ms = BAR_SECONDS[bar] * 1000
+        bars = {}
+        with self._lock:
+            ticks = list(self.ticks.get(symbol, ()))
+        for ts, price in ticks:
+            start = ts - ts % bar_ms
+            if start in bars:
+                o, h, l, _ = bars[start]
+                bars[start] = (o, max(h, price), min(l, price), price)
+            else:
+                bars[start] = (price, price, price, price)
+        starts = sorted(bars, reverse=True)[:limit]
+        return [[str(start), *(str(v) for v in bars[start]), "0", "0", "0", "0" if i == 0 else "1"]
+                for i, start in enumerate(starts)]
+
+    # === Order book channel ===
+    def _book_strings(self, symbol):
+        # Best-first {price: size} per side, in the string form the checksum is computed over
+        bids, asks = self.book(symbol)
+        return ({format(px, ".10g"): format(sz, "g") for px, sz in bids},
+                {format(px, ".10g"): format(sz, "g") for px, sz in asks})
+
+    def _books_message(self, symbol, action, prev_seq, seq, bid_levels, ask_levels, check):
+        data = {"asks": [[px, sz, "0", "1"] for px, sz in ask_levels],
+                "bids": [[px, sz, "0", "1"] for px, sz in bid_levels],
+                "ts": str(self.ts.get(symbol) or int(time.time() * 1000)),
+                "checksum": check, "prevSeqId": prev_seq, "seqId": seq}
+        return json.dumps({"arg": {"channel": "books", "instId": symbol}, "action": action, "data": [data]})
+
+    def books_snapshot(self, symbol):
+        """The `books` snapshot a new subscriber starts from: the last pushed book at its seqId."""
+        with self._lock:
+            if symbol not in self.books:
+                self._seq += 1
+                self.books[symbol] = (self._seq, *self._book_strings(symbol))
+            seq, bids, asks = self.books[symbol]
+            bid_levels, ask_levels = list(bids.items()), list(asks.items())
+            return self._books_message(symbol, "snapshot", -1, seq, bid_levels, ask_levels,
+                                       checksum(bid_levels, ask_levels))
+
+    def _books_update(self, symbol):
+        # The diff from the last pushed book; removed levels are sent with size "0"
+        if symbol not in self.books:
+            return None
+        prev_seq, old_bids, old_asks = self.books[symbol]
+        bids, asks = self._book_strings(symbol)
+        self._seq += 1
+        self.books[symbol] = (self._seq, bids, asks)
+
+        def changes(old, new):
+            return [(px, sz) for px, sz in new.items() if old.get(px) != sz] + \
+                [(px, "0") for px in old if px not in new]
+
+        check = checksum(list(bids.items()), list(asks.items()))
+        if self.rng.random() < self.book_checksum_fault_rate:
+            check += 1
+        return self._books_message(symbol, "update", prev_seq, self._seq, changes(old_bids, bids),
+                                   changes(old_asks, asks), check)
+
+    # === Account ===
+    def available(self, ccy):
+        return self.balances.get(ccy, 0.0) - self.frozen.get(ccy, 0.0)
+
+    def balance_response(self, currencies=None):
+        with self._lock:
+            currencies = currencies or sorted(self.balances)
+            details = [{"ccy": ccy, "availBal": str(self.available(ccy)), "cashBal": str(self.balances.get(ccy, 0.0)),
+                        "frozenBal": str(self.frozen.get(ccy, 0.0))} for ccy in currencies]
+            return _ok([{"details": details, "uTime": str(int(time.time() * 1000))}])
+
+    # === Orders ===
+    def place_order(self, body):
+        with self._lock:
+            symbol = body["instId"]
+            side, ord_type = body["side"], body.get("ordType", "market")
+            cl_ord_id = body.get("clOrdId", "")
+            if cl_ord_id and cl_ord_id in self.by_client_id:
+                return _rejected("51016", "Duplicated clOrdId", cl_ord_id)
+            if symbol not in self.prices:
+                return _rejected("51001", "Instrument ID does not exist", cl_ord_id)
+            coin, cash = symbol_currencies(symbol)
+            sz = float(body["sz"])
+            px = float(body["px"]) if body.get("px") else None
+            bids, asks = self.book(symbol)
+
+            # Market buys are sized in cash (tgtCcy quote_ccy), everything else in coin
+            if side == "buy":
+                need = sz if ord_type == "market" else sz * px
+                if not 0 < need <= self.available(cash):
+                    return _rejected("51008", f"Order failed. Insufficient {cash} balance", cl_ord_id)
+            elif not 0 < sz <= self.available(coin):
+                return _rejected("51008", f"Order failed. Insufficient {coin} balance", cl_ord_id)
+
+            crosses = ord_type == "market" or (side == "buy" and px >= asks[0][0]) or (side == "sell" and px <= bids[0][0])
+            if ord_type == "post_only" and crosses:
+                return _rejected("51124", "Post only order would have taken liquidity", cl_ord_id)
+
+            now = str(int(time.time() * 1000))
+            order = {"instId": symbol, "ordId": self._next_id(), "clOrdId": cl_ord_id, "side": side,
+                     "ordType": ord_type, "px": body.get("px", ""), "sz": body["sz"], "accFillSz": "0",
+                     "avgPx": "", "fillPx": "", "fillSz": "0", "fee": "0", "feeCcy": coin if side == "buy" else cash,
+                     "state": "live", "cTime": now, "uTime": now,
+                     "tgtCcy": "quote_ccy" if ord_type == "market" and side == "buy" else "base_ccy"}
+            self.orders[order["ordId"]] = order
+            if cl_ord_id:
+                self.by_client_id[cl_ord_id] = order["ordId"]
+
+            if crosses:
+                self._take(order, bids, asks, sz, px)
+            if order["state"] != "filled":
+                if ord_type in ("market", "ioc"):
+                    order["state"] = "canceled"     # the unfilled rest of a taker order is dropped
+                else:
+                    self.resting.add(order["ordId"])
+                    self._freeze(order, +1)
+            self._push_order(order)
+            return _ok([{"ordId": order["ordId"], "clOrdId": cl_ord_id, "sCode": "0", "sMsg": "Order placed"}])
+
+    def _take(self, order, bids, asks, sz, px):
+        # Walks the opposite side of the book; a partial-fill fault caps the fill
+        levels = asks if order["side"] == "buy" else bids
+        cap = self.partial_fill_ratio if self.rng.random() < self.partial_fill_rate else 1.0
+        remaining = sz * cap        # cash for a market buy, coin otherwise
+        for level_px, level_size in levels:
+            if px is not None and ((order["side"] == "buy" and level_px > px) or (order["side"] == "sell" and level_px < px)):
+                break
+            if remaining <= 0:
+                break
+            if order["tgtCcy"] == "quote_ccy":
+                take = min(level_size, remaining / level_px)
+                remaining -= take * level_px
+            else:
+                take = min(level_size, remaining)
+                remaining -= take
+            self._fill(order, level_px, take, maker=False)
+
+    def _fill(self, order, px, size, maker):
+        if size <= 0:
+            return
+        coin, cash = symbol_currencies(order["instId"])
+        rate = MAKER_FEE if maker else TAKER_FEE
+        resting = order["ordId"] in self.resting
+        if resting:
+            self._freeze(order, -1)
+        if order["side"] == "buy":
+            fee = size * rate
+            self.balances[cash] = self.balances.get(cash, 0.0) - size * px
+            self.balances[coin] = self.balances.get(coin, 0.0) + size - fee
+        else:
+            fee = size * px * rate
+            self.balances[coin] = self.balances.get(coin, 0.0) - size
+            self.balances[cash] = self.balances.get(cash, 0.0) + size * px - fee
+
+        filled = float(order["accFillSz"]) + size
+        notional = (float(order["avgPx"] or 0) * float(order["accFillSz"])) + px * size
+        order.update(accFillSz=str(filled), avgPx=str(notional / filled), fillPx=str(px), fillSz=str(size),
+                     fillFee=str(-fee), fillFeeCcy=order["feeCcy"], fee=str(float(order["fee"]) - fee),
+                     uTime=str(int(time.time() * 1000)))
+        done = (notional if order["tgtCcy"] == "quote_ccy" else filled) >= float(order["sz"]) * (1 - 1e-9)
+        order["state"] = "filled" if done else "partially_filled"
+        if resting:
+            if done:
+                self.resting.discard(order["ordId"])
+            else:
+                self._freeze(order, +1)
+        self.fills.append({"instId": order["instId"], "ordId": order["ordId"], "clOrdId": order["clOrdId"],
+                           "tradeId": self._next_id(), "side": order["side"], "fillPx": str(px), "fillSz": str(size),
+                           "fee": str(-fee), "feeCcy": order["feeCcy"], "execType": "M" if maker else "T",
+                           "ts": order["uTime"]})
+
+    def _freeze(self, order, sign):
+        # Resting limit orders lock what they still need
+        coin, cash = symbol_currencies(order["instId"])
+        open_size = float(order["sz"]) - float(order["accFillSz"])
+        if order["side"] == "buy":
+            self.frozen[cash] = self.frozen.get(cash, 0.0) + sign * open_size * float(order["px"])
+        else:
+            self.frozen[coin] = self.frozen.get(coin, 0.0) + sign * open_size
+
+    def cancel_order(self, body):
+        with self._lock:
+            order = self.find_order(body.get("ordId"), body.get("clOrdId"))
+            if order is None or order["state"] not in ("live", "partially_filled"):
+                return _rejected("51400", "Order cancellation failed as the order has been filled, canceled or does not exist",
+                                 body.get("clOrdId", ""))
+            if order["ordId"] in self.resting:
+                self.resting.discard(order["ordId"])
+                self._freeze(order, -1)
+            order["state"] = "canceled"
+            self._push_order(order)
+            return _ok([{"ordId": order["ordId"], "clOrdId": order["clOrdId"], "sCode": "0", "sMsg": ""}])
+
+    def batch(self, handler, bodies):
+        # batch-orders / cancel-batch-orders: code 0 all accepted, 2 some, 1 none
+        data = [(handler(body)["data"] or [{}])[0] for body in bodies]
+        accepted = sum(item.get("sCode") == "0" for item in data)
+        code = "0" if accepted == len(data) else "2" if accepted else "1"
+        return {"code": code, "msg": "" if code == "0" else "Operation failed.", "data": data}
+
+    def find_order(self, ord_id=None, cl_ord_id=None):
+        if not ord_id and cl_ord_id:
+            ord_id = self.by_client_id.get(cl_ord_id)
+        return self.orders.get(ord_id)
+
+    # === WebSocket fan-out ===
+    def _broadcast(self, channel, symbol, message):
+        for queue, subscriptions in list(self.sockets.values()):
+            if (channel, symbol) in subscriptions:
+                call_on_loop(self.loop, queue.put_nowait, message)
+
+    def _push_order(self, order):
+        message = json.dumps({"arg": {"channel": "orders", "instType": "SPOT"}, "data": [dict(order)]})
+        for queue in list(self.order_sockets.values()):
+            call_on_loop(self.loop, queue.put_nowait, message)
+
+    def drop_sockets(self):
+        # Fault: the exchange closes every socket, public and private
+        queues = [queue for queue, _ in self.sockets.values()] + list(self.order_sockets.values())
+        for queue in queues:
+            call_on_loop(self.loop, queue.put_nowait, None)
+
+    # === Faults ===
+    async def gate(self):
+        """Applies latency and injected faults to one REST call; returns a response to send instead, or None."""
+        low, high = self.latency
+        if high > 0:
+            await asyncio.sleep(self.rng.uniform(low, high))
+        if self.rng.random() < self.timeout_rate:
+            await asyncio.sleep(self.timeout_delay)
+        if self.rng.random() < self.rate_limit_rate:
+            return JSONResponse({"code": "50011", "msg": "Too Many Requests", "data": []}, status_code=429)
+        return None
+
+    def check_login(self, args):
+        # WebSocket login: the REST signature scheme over GET /users/self/verify
+        if self.api_secret is None:
+            return True
+        message = f"{args.get('timestamp', '')}GET/users/self/verify"
+        expected = base64.b64encode(hmac.new(self.api_secret.encode(), message.encode(), hashlib.sha256).digest()).decode()
+        return (args.get("apiKey") == self.api_key and args.get("passphrase") == self.passphrase
+                and hmac.compare_digest(args.get("sign", ""), expected))
+
+    def check_auth(self, request, body):
+        if self.api_secret is None:
+            return None
+        headers = request.headers
+        path = request.url.path + (f"?{request.url.query}" if request.url.query else "")
+        message = f"{headers.get('OK-ACCESS-TIMESTAMP', '')}{request.method}{path}{body}"
+        expected = base64.b64encode(hmac.new(self.api_secret.encode(), message.encode(), hashlib.sha256).digest()).decode()
+        if headers.get("OK-ACCESS-KEY") != self.api_key or headers.get("OK-ACCESS-PASSPHRASE") != self.passphrase:
+            return JSONResponse({"code": "50111", "msg": "Invalid OK-ACCESS-KEY", "data": []}, status_code=401)
+        if not hmac.compare_digest(headers.get("OK-ACCESS-SIGN", ""), expected):
+            return JSONResponse({"code": "50113", "msg": "Invalid Sign", "data": []}, status_code=401)
+        return None
+
+
+def create_app(exchange):
+    """FastAPI app serving the OKX REST and public WebSocket paths the bot uses."""
+    app = FastAPI()
+
+    @app.on_event("startup")
+    async def bind_loop():
+        exchange.loop = asyncio.get_running_loop()
+
+    async def guarded(request, private=True):
+        body = (await request.body()).decode()
+        fault = await exchange.gate()
+        if fault is None and private:
+            fault = exchange.check_auth(request, body)
+        return fault, json.loads(body) if body else {}
+
+    @app.get("/api/v5/market/ticker")
+    async def ticker(request: Request, instId: str):
+        fault, _ = await guarded(request, private=False)
+        if fault:
+            return fault
+        if instId not in exchange.prices:
+            return _rejected("51001", "Instrument ID does not exist")
+        return _ok([exchange.ticker(instId)])
+
+    @app.get("/api/v5/market/candles")
+    async def candles(request: Request, instId: str, bar: str = "1m", limit: int = 100):
+        fault, _ = await guarded(request, private=False)
+        if fault:
+            return fault
+        if instId not in exchange.prices:
+            return _rejected("51001", "Instrument ID does not exist")
+        return _ok(exchange.candles(instId, bar, min(limit, 300)))
+
+    @app.get("/api/v5/account/balance")
+    async def balance(request: Request, ccy: str = None):
+        fault, _ = await guarded(request)
+        return fault or exchange.balance_response(ccy.split(",") if ccy else None)
+
+    @app.post("/api/v5/trade/order")
+    async def order(request: Request):
+        fault, body = await guarded(request)
+        return fault or exchange.place_order(body)
+
+    @app.post("/api/v5/trade/cancel-order")
+    async def cancel(request: Request):
+        fault, body = await guarded(request)
+        return fault or exchange.cancel_order(body)
+
+    @app.post("/api/v5/trade/batch-orders")
+    async def batch_orders(request: Request):
+        fault, body = await guarded(request)
+        return fault or exchange.batch(exchange.place_order, body[:20])
+
+    @app.post("/api/v5/trade/cancel-batch-orders")
+    async def cancel_batch(request: Request):
+        fault, body = await guarded(request)
+        return fault or exchange.batch(exchange.cancel_order, body[:20])
+
+    @app.get("/api/v5/trade/order")
+    async def get_order(request: Request, instId: str, ordId: str = None, clOrdId: str = None):
+        fault, _ = await guarded(request)
+        if fault:
+            return fault
+        order = exchange.find_order(ordId, clOrdId)
+        if order is None:
+            return {"code": "51603", "msg": "Order does not exist", "data": []}
+        return _ok([dict(order)])
+
+    @app.get("/api/v5/trade/orders-pending")
+    async def pending(request: Request, instId: str = None):
+        fault, _ = await guarded(request)
+        if fault:
+            return fault
+        return _ok([dict(order) for order in exchange.orders.values()
+                    if order["state"] in ("live", "partially_filled") and instId in (None, order["instId"])])
+
+    @app.get("/api/v5/trade/fills")
+    async def fills(request: Request, instId: str = None, begin: int = None):
+        fault, _ = await guarded(request)
+        if fault:
+            return fault
+        rows = [fill for fill in exchange.fills
+                if instId in (None, fill["instId"]) and (begin is None or int(fill["ts"]) >= begin)]
+        return _ok(list(reversed(rows))[:100])
+
+    async def serve(websocket, queue, handle):
+        # Runs one socket: `handle(msg)` answers client messages, the loop writes `queue` out
+
+        async def reader():
+            try:
+                while True:
+                    text = await websocket.receive_text()
+                    if text == "ping":
+                        queue.put_nowait("pong")
+                        continue
+                    handle(json.loads(text))
+            finally:
+                queue.put_nowait(None)      # client went away: stop the writer too
+
+        read_task = asyncio.create_task(reader())
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                await websocket.send_text(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            read_task.cancel()
+            exchange.sockets.pop(websocket, None)
+            exchange.order_sockets.pop(websocket, None)
+            try:
+                await websocket.close()
+            except Exception:
+                pass
+
+    @app.websocket("/ws/v5/public")
+    async def public(websocket: WebSocket):
+        await websocket.accept()
+        queue, subscriptions = asyncio.Queue(), set()
+
+        def handle(msg):
+            if msg.get("op") == "subscribe":
+                for arg in msg["args"]:
+                    channel = arg.get("channel", "tickers")
+                    subscriptions.add((channel, arg["instId"]))
+                    queue.put_nowait(json.dumps({"event": "subscribe", "arg": arg}))
+                    if channel == "books":
+                        queue.put_nowait(exchange.books_snapshot(arg["instId"]))
+            elif msg.get("op") == "unsubscribe":
+                for arg in msg["args"]:
+                    subscriptions.discard((arg.get("channel", "tickers"), arg["instId"]))
+                    queue.put_nowait(json.dumps({"event": "unsubscribe", "arg": arg}))
+
+        exchange.sockets[websocket] = (queue, subscriptions)
+        await serve(websocket, queue, handle)
+
+    @app.websocket("/ws/v5/private")
+    async def private(websocket: WebSocket):
+        await websocket.accept()
+        queue, session = asyncio.Queue(), {"login": False}
+
+        def handle(msg):
+            if msg.get("op") == "login":
+                session["login"] = exchange.check_login(msg["args"][0])
+                reply = {"event": "login", "code": "0", "msg": ""} if session["login"] else \
+                    {"event": "error", "code": "60009", "msg": "Login failed."}
+                queue.put_nowait(json.dumps(reply))
+            elif msg.get("op") == "subscribe":
+                if not session["login"]:
+                    queue.put_nowait(json.dumps({"event": "error", "code": "60011", "msg": "Please log in"}))
+                    return
+                for arg in msg["args"]:
+                    if arg.get("channel") == "orders":
+                        exchange.order_sockets[websocket] = queue
+                    queue.put_nowait(json.dumps({"event": "subscribe", "arg": arg}))
+
+        await serve(websocket, queue, handle)
+
+    return app
+
+
+class SimulatorServer:
+    """Runs create_app(exchange) with uvicorn on a background thread (for tests and soak runs)."""
+
+    def __init__(self, exchange, host="127.0.0.1", port=8765):
+        self.exchange = exchange
+        self.config = uvicorn.Config(create_app(exchange), host=host, port=port, log_level="warning")
+        self.server = uvicorn.Server(self.config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+        self.base_url = f"http://{host}:{port}"
+        self.ws_url = f"ws://{host}:{port}/ws/v5/public"
+        self.private_ws_url = f"ws://{host}:{port}/ws/v5/private"
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.exchange.drop_sockets()
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def replay(exchange, symbol, ts, prices, speed=1.0):
+    # Plays a recorded series into the exchange, `speed` times faster than it was recorded
+    start_wall, start_ts = time.monotonic(), int(ts[0])
+    for t, price in zip(ts, prices):
+        delay = (int(t) - start_ts) / 1000 / speed - (time.monotonic() - start_wall)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        exchange.set_price(symbol, float(price), int(t))
+
+
+async def random_walk(exchange, symbol, volatility=0.0008, interval=1.0, speed=1.0, seed=0):
+    rng = np.random.default_rng(seed)
+    price = exchange.prices[symbol]
+    while True:
+        await asyncio.sleep(interval / speed)
+        price *= float(np.exp(rng.normal(0, volatility)))
+        exchange.set_price(symbol, price)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Local OKX stand-in. Point the bot at it with OKX_BASE_URL=http://HOST:PORT, "
+                    "OKX_WS_PUBLIC_URL=ws://HOST:PORT/ws/v5/public and OKX_WS_PRIVATE_URL=ws://HOST:PORT/ws/v5/private"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--symbol", default=SYMBOL)
+    parser.add_argument("--price", type=float, default=1.0)
+    parser.add_argument("--usdt", type=float, default=1000.0)
+    parser.add_argument("--coin", type=float, default=0.0)
+    parser.add_argument("--replay", help="CSV/.npz price series to play (see backtest.load_prices)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay/random-walk speed-up factor")
+    parser.add_argument("--volatility", type=float, default=0.0008, help="Per-tick log-return stdev for the random walk")
+    parser.add_argument("--latency", type=float, nargs=2, default=(0.0, 0.0), metavar=("MIN", "MAX"))
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--partial-fill-rate", type=float, default=0.0)
+    parser.add_argument("--check-auth", action="store_true", help="Verify signatures against OKX_* credentials")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    coin, cash = symbol_currencies(args.symbol)
+    credentials = {}
+    if args.check_auth:
+        from config import OKX_API_KEY, OKX_SECRET_KEY, OKX_PASSPHRASE
+        credentials = {"api_key": OKX_API_KEY, "api_secret": OKX_SECRET_KEY, "passphrase": OKX_PASSPHRASE}
+    exchange = SimulatedExchange({cash: args.usdt, coin: args.coin}, {args.symbol: args.price}, seed=args.seed, **credentials)
+    exchange.latency = tuple(args.latency)
+    exchange.timeout_rate = args.timeout_rate
+    exchange.rate_limit_rate = args.rate_limit_rate
+    exchange.partial_fill_rate = args.partial_fill_rate
+    app = create_app(exchange)
+
+    @app.on_event("startup")
+    async def start_market():
+        if args.replay:
+            from backtest import load_prices
+            ts, prices = load_prices(args.replay)
+            exchange.set_price(args.symbol, float(prices[0]), int(ts[0]))
+            asyncio.create_task(replay(exchange, args.symbol, ts, prices, args.speed))
+        else:
+            asyncio.create_task(random_walk(exchange, args.symbol, args.volatility, speed=args.speed, seed=args.seed))
+
+    uvicorn.run(app, host=args.host, port=args.port)
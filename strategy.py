@@ -0,0 +1,179 @@
+import threading
+from config import (
+    TP_DEFAULT, SL_DEFAULT, TRAIL_TRIGGER, TRAIL_BUFFER,
+    PORTFOLIO_TRAIL_ACTIVATE, PORTFOLIO_TRAIL_GIVEBACK
+)
+
+# Position states
+IDLE = "idle"
+OPEN = "open"
+TP_ARMED = "tp-armed"
+TRAILING = "trailing"
+CLOSED = "closed"
+DCA = "dca"
+
+# Actions returned by PositionState.on_price
+EXIT = "exit"
+DCA_AND_CLOSE = "dca"
+
+
+class PositionState:
+    """TP / trailing / DCA state machine for one position, with no I/O.
+
+    idle -> open -> tp-armed -> trailing -> closed, or open/armed -> dca.
+    on_price is called on every price update and returns the action the bot
+    must execute (EXIT or DCA_AND_CLOSE) or None. Once an action is returned
+    the state stays in closed/dca, so later ticks cannot fire it twice while
+    the order is in flight; reset() returns to idle, and resume() back to
+    the state the action was decided in when its order did not go through.
+    """
+
+    def __init__(self, trail_trigger=TRAIL_TRIGGER, trail_buffer=TRAIL_BUFFER):
+        self.trail_trigger = trail_trigger
+        self.trail_buffer = trail_buffer
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.state = IDLE
+        self.resumes = None         # state an exit left, so a failed one picks up with its locked TP
+        self.side = None
+        self.entry_price = None
+        self.trailing_tp = None
+        self.tp_target = None
+        self.tp_threshold = TP_DEFAULT
+        self.sl_threshold = SL_DEFAULT
+        self.dca_target = 0
+
+    def resume(self):
+        with self._lock:
+            if self.state in (CLOSED, DCA):
+                self.state = self.resumes or OPEN
+            self.resumes = None
+
+    @property
+    def active(self):
+        return self.state in (OPEN, TP_ARMED, TRAILING)
+
+    def open(self, side, price, tp_threshold, sl_threshold, dca_target):
+        with self._lock:
+            self.side = side
+            self.entry_price = price
+            self.tp_threshold = tp_threshold
+            self.sl_threshold = sl_threshold
+            self.dca_target = dca_target
+            if side == "long":
+                self.trailing_tp = price * (1 + tp_threshold)
+            else:
+                self.trailing_tp = price * (1 - tp_threshold)
+            self.tp_target = self.trailing_tp
+            self.resumes = None
+            self.state = OPEN
+
+    def change(self, price):
+        change = (price - self.entry_price) / self.entry_price
+        return -change if self.side == "short" else change
+
+    def snapshot(self):
+        return {
+            "state": self.state, "side": self.side, "entry_price": self.entry_price,
+            "trailing_tp": self.trailing_tp, "tp_target": self.tp_target,
+            "tp_threshold": self.tp_threshold, "sl_threshold": self.sl_threshold,
+            "dca_target": self.dca_target, "resumes": self.resumes,
+        }
+
+    def restore(self, data):
+        with self._lock:
+            for name, value in data.items():
+                setattr(self, name, value)
+
+    def on_price(self, price):
+        with self._lock:
+            if not self.active:
+                return None
+
+            long = self.side == "long"
+            change = self.change(price)
+
+            if change >= (self.tp_threshold + self.trail_trigger):
+                if long:
+                    candidate = price - self.trail_trigger * price
+                else:
+                    candidate = price + self.trail_trigger * price
+                self._raise_tp(candidate, long)
+                self._transition(TRAILING)
+
+            elif change >= self.tp_threshold:
+                if long:
+                    candidate = price * (1 - self.trail_buffer)
+                else:
+                    candidate = price * (1 + self.trail_buffer)
+                if self.state == OPEN:
+                    self.trailing_tp = candidate
+                    self._transition(TP_ARMED)
+                else:
+                    self._raise_tp(candidate, long)
+
+            elif change <= self.sl_threshold:
+                if (long and price <= self.dca_target) or (not long and price >= self.dca_target):
+                    self.resumes = self.state
+                    self._transition(DCA)
+                    return DCA_AND_CLOSE
+
+            if self.state in (TP_ARMED, TRAILING):
+                # Exit on the tick that gives back to the locked TP while still above the original target
+                if (long and self.tp_target < price <= self.trailing_tp
+                        or not long and self.trailing_tp <= price < self.tp_target):
+                    self.resumes = self.state
+                    self._transition(CLOSED)
+                    return EXIT
+            return None
+
+    def _raise_tp(self, candidate, long):
+        # The locked TP only ever moves in the position's favour
+        if long:
+            self.trailing_tp = max(self.trailing_tp, candidate)
+        else:
+            self.trailing_tp = min(self.trailing_tp, candidate)
+
+    def _transition(self, state):
+        if state != self.state:
+            print(f"[STATE] {self.side}: {self.state} -> {state} (TP: {self.trailing_tp})")
+            self.state = state
+
+
+class PortfolioTrailing:
+    """Portfolio-level trailing stop: arms after `activate` growth and fires
+    when value gives back below `giveback` of the running peak."""
+
+    def __init__(self, start_value, activate=PORTFOLIO_TRAIL_ACTIVATE, giveback=PORTFOLIO_TRAIL_GIVEBACK):
+        self.activate = activate
+        self.giveback = giveback
+        self.rebase(start_value)
+
+    def rebase(self, value):
+        self.init_tracking_point = value
+        self.tracking_trigger = value
+        self.tracking_active = False
+
+    def snapshot(self):
+        return {
+            "init_tracking_point": self.init_tracking_point,
+            "tracking_trigger": self.tracking_trigger,
+            "tracking_active": self.tracking_active,
+        }
+
+    def restore(self, data):
+        for name, value in data.items():
+            setattr(self, name, value)
+
+    def on_value(self, current_value, pi_balance):
+        if not self.tracking_active and current_value > self.init_tracking_point * self.activate:
+            self.tracking_active = True
+            print("[TRAILING] Growth threshold reached. Tracking activated.")
+
+        if self.tracking_active and current_value > self.init_tracking_point:
+            self.init_tracking_point = current_value
+            self.tracking_trigger = self.init_tracking_point * self.giveback
+
+        return self.tracking_active and current_value < self.tracking_trigger and pi_balance > 0
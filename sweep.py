@@ -0,0 +1,247 @@
+import os
+import csv
+import json
+import random
+import argparse
+import itertools
+import numpy as np
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from backtest import Backtest, load_prices, load_signals
+from trading import DEFAULT_PARAMS
+from config import SIGNAL_CHECK_INTERVAL, BACKTEST_FEE
+
+RESULT_COLUMNS = [
+    "pnl", "pnl_percent", "max_drawdown_percent", "trade_count",
+    "tp_count", "dca_count", "profit_capture", "loss_limit", "fees",
+]
+
+# Worker-side state, filled once per process by _init_worker
+_worker = {}
+
+
+def share_array(array):
+    # Copies the array into a named shared-memory block workers can map without pickling
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    view[:] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+def _init_worker(ts_spec, price_spec, signal_ts_spec, signals, options):
+    blocks = []
+    for key, spec in (("ts", ts_spec), ("prices", price_spec), ("signal_ts", signal_ts_spec)):
+        block, array = _attach(spec)
+        blocks.append(block)
+        _worker[key] = array
+    _worker["blocks"] = blocks      # keep the mappings alive for the worker's lifetime
+    _worker["signals"] = signals
+    _worker["options"] = options
+
+
+def _run_one(params):
+    backtest = Backtest(
+        _worker["ts"], _worker["prices"], _worker["signal_ts"], _worker["signals"],
+        params=params, **_worker["options"]
+    )
+    return params, backtest.run()
+
+
+def param_key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def grid_candidates(space):
+    # space: {"order_percent": [0.02, 0.03], ...}
+    names = sorted(space)
+    for values in itertools.product(*(space[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def random_candidates(space, count, seed):
+    # space: {"order_percent": [low, high], ...}
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield {name: rng.uniform(low, high) for name, (low, high) in sorted(space.items())}
+
+
+def tpe_candidates(space, history, count, rng, gamma=0.25, samples=64):
+    """Tree-structured Parzen estimator step.
+
+    Splits finished runs into the best `gamma` fraction and the rest, fits a
+    Gaussian KDE to each per parameter, and proposes the sampled points that
+    maximise good-density / bad-density.
+    """
+    names = sorted(space)
+    low = np.array([space[name][0] for name in names])
+    high = np.array([space[name][1] for name in names])
+    points = np.array([[params[name] for name in names] for params, _ in history])
+    scores = np.array([result["pnl_percent"] for _, result in history])
+    unit = (points - low) / (high - low)
+
+    order = np.argsort(-scores)
+    n_good = max(1, int(len(order) * gamma))
+    good, bad = unit[order[:n_good]], unit[order[n_good:]]
+    if not len(bad):
+        bad = unit
+    bandwidth = max(0.05, len(unit) ** (-1 / (len(names) + 4)) * 0.5)
+
+    def density(x, centers):
+        d = (x[:, None, :] - centers[None, :, :]) / bandwidth
+        return np.exp(-0.5 * d ** 2).mean(axis=1).prod(axis=1) + 1e-12
+
+    proposals = []
+    for _ in range(count):
+        picks = good[rng.integers(len(good), size=samples)]
+        x = picks + rng.normal(0, bandwidth, picks.shape)
+        x = 1 - np.abs(1 - np.abs(x))     # reflect into [0, 1] instead of piling up on the bounds
+        best = x[np.argmax(density(x, good) / density(x, bad))]
+        proposals.append(dict(zip(names, (low + best * (high - low)).tolist())))
+    return proposals
+
+
+def load_results(path):
+    # Completed runs from an earlier (possibly interrupted) sweep
+    done = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    done[param_key(row["params"])] = (row["params"], row["result"])
+    return done
+
+
+class Sweep:
+    def __init__(self, ts, prices, signal_ts, signals, results_path,
+                 workers=None, usdt=1000.0, pi=0.0, poll_interval=SIGNAL_CHECK_INTERVAL, fee=BACKTEST_FEE):
+        self.data = (ts, prices, signal_ts)
+        self.signals = signals
+        self.results_path = results_path
+        self.workers = workers or os.cpu_count()
+        self.options = {"usdt": usdt, "pi": pi, "poll_interval": poll_interval, "fee": fee}
+        self.done = load_results(results_path)
+        if self.done:
+            print(f"[SWEEP] Resuming: {len(self.done)} runs already in {results_path}")
+
+    def run(self, candidates):
+        todo, seen = [], set(self.done)
+        for params in candidates:
+            key = param_key(params)
+            if key not in seen:
+                seen.add(key)
+                todo.append(params)
+        if not todo:
+            return 0
+
+        blocks, specs = [], []
+        for array in self.data:
+            block, spec = share_array(array)
+            blocks.append(block)
+            specs.append(spec)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(*specs, self.signals, self.options),
+            ) as pool, open(self.results_path, "a") as out:
+                futures = [pool.submit(_run_one, params) for params in todo]
+                for n, future in enumerate(as_completed(futures), 1):
+                    params, result = future.result()
+                    self.done[param_key(params)] = (params, result)
+                    # One flushed line per run is what makes an interrupted sweep resumable
+                    out.write(json.dumps({"params": params, "result": result}) + "\n")
+                    out.flush()
+                    print(f"[SWEEP] {n}/{len(todo)} pnl {result['pnl_percent']}% | {params}")
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+        return len(todo)
+
+    def run_tpe(self, space, trials, batch=None, seed=0):
+        batch = batch or self.workers
+        rng = np.random.default_rng(seed + len(self.done))
+        warmup = max(batch, 2 * len(space))
+        # Same seed, so a resumed sweep regenerates and skips the warm-up runs it already has
+        self.run(random_candidates(space, warmup, seed))
+        stalled = 0
+        while len(self.done) < trials and stalled < 10:
+            history = [row for row in self.done.values() if set(space) <= set(row[0])]
+            count = min(batch, trials - len(self.done))
+            stalled = 0 if self.run(tpe_candidates(space, history, count, rng)) else stalled + 1
+
+    def ranked(self):
+        rows = sorted(self.done.values(), key=lambda row: row[1]["pnl"], reverse=True)
+        names = sorted(set().union(*(params for params, _ in rows)))
+        return [
+            dict(rank=rank,
+                 **{name: params.get(name, DEFAULT_PARAMS[name]) for name in names},
+                 **{col: result[col] for col in RESULT_COLUMNS})
+            for rank, (params, result) in enumerate(rows, 1)
+        ]
+
+
+def _cell(value):
+    return f"{value:.6g}" if isinstance(value, float) else str(value)
+
+
+def print_table(rows, limit=20):
+    if not rows:
+        print("[SWEEP] No results.")
+        return
+    rows = rows[:limit]
+    columns = list(rows[0])
+    widths = {col: max(len(col), *(len(_cell(row[col])) for row in rows)) for col in columns}
+    print("  ".join(col.rjust(widths[col]) for col in columns))
+    for row in rows:
+        print("  ".join(_cell(row[col]).rjust(widths[col]) for col in columns))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep over the backtest")
+    parser.add_argument("prices")
+    parser.add_argument("signals")
+    parser.add_argument("space", help=f"JSON file mapping parameters ({', '.join(DEFAULT_PARAMS)}) "
+                                      "to value lists (grid) or [low, high] ranges (random, tpe)")
+    parser.add_argument("--mode", choices=["grid", "random", "tpe"], default="grid")
+    parser.add_argument("--trials", type=int, default=100, help="Run count for random and tpe")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--results", default="sweep_results.jsonl", help="Append-only run log; reused to resume")
+    parser.add_argument("--table", default=None, help="Write the ranked table to this CSV file")
+    parser.add_argument("--usdt", type=float, default=1000.0)
+    parser.add_argument("--pi", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with open(args.space) as f:
+        space = json.load(f)
+    unknown = set(space) - set(DEFAULT_PARAMS)
+    if unknown:
+        parser.error(f"unknown parameters: {', '.join(sorted(unknown))}")
+
+    ts, prices = load_prices(args.prices)
+    signal_ts, signals = load_signals(args.signals)
+    sweep = Sweep(ts, prices, signal_ts, signals, args.results,
+                  workers=args.workers, usdt=args.usdt, pi=args.pi)
+
+    if args.mode == "grid":
+        sweep.run(grid_candidates(space))
+    elif args.mode == "random":
+        sweep.run(random_candidates(space, args.trials, args.seed))
+    else:
+        sweep.run_tpe(space, args.trials, seed=args.seed)
+
+    rows = sweep.ranked()
+    print_table(rows)
+    if args.table and rows:
+        with open(args.table, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
@@ -0,0 +1,322 @@
+import os
+import json
+import math
+import struct
+import time
+import argparse
+import contextlib
+import threading
+from datetime import datetime, timezone
+import numpy as np
+from market_feed import TickerFeed
+from paper import PaperTrader
+from signals import Signal
+from config import SYMBOL, SIGNAL_CHECK_INTERVAL, TAPE_DIR, TAPE_FLUSH_EVERY
+
+# Record kinds
+TICK, SIGNAL, ORDER, PUSH = 0, 1, 2, 3     # ticker, signal, order REST response, orders-channel push
+KINDS = ("tick", "signal", "order", "push")
+
+# 32 bytes per record. bid/ask are float32 offsets from price, exact to well under a tick;
+# ref is the byte offset of a signal/order payload in events.jsonl
+RECORD = np.dtype([("ts", "<i8"), ("price", "<f8"), ("bid", "<f4"), ("ask", "<f4"),
+                   ("ref", "<u4"), ("kind", "u1"), ("symbol", "u1"), ("pad", "<u2")])
+# One entry per hour that has records: the hour's start (ms) and its first record
+HOUR = np.dtype([("hour", "<i8"), ("first", "<i8")])
+HOUR_MS = 3_600_000
+_PACK = struct.Struct("<qdffIBBH").pack     # RECORD's layout, without building an array per tick
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+class TapeRecorder:
+    """Append-only session tape: every ticker, signal and order response.
+
+    Ticks go into records.bin as fixed-width records; signal and order
+    payloads are JSON lines in events.jsonl, referenced by byte offset.
+    Record timestamps never go backwards, and each new hour appends one
+    entry to hours.idx. At one tick a second a week is about 20 MB.
+    Writers may be the event loop and order threads at once.
+    """
+
+    def __init__(self, path=None, symbols=None, flush_every=TAPE_FLUSH_EVERY):
+        self.path = path or os.path.join(TAPE_DIR, datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S"))
+        os.makedirs(self.path, exist_ok=True)
+        self.symbols = list(symbols or [SYMBOL])
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._records = open(os.path.join(self.path, "records.bin"), "ab")
+        self._events = open(os.path.join(self.path, "events.jsonl"), "ab")
+        self._hours = open(os.path.join(self.path, "hours.idx"), "ab")
+        self._count = 0
+        self._pending = 0
+        self._last_ts = 0
+        self._hour = None
+        self._write_meta()
+        print(f"[TAPE] Recording to {self.path}.")
+
+    def _write_meta(self):
+        with open(os.path.join(self.path, "meta.json"), "w") as f:
+            json.dump({"symbols": self.symbols, "record_size": RECORD.itemsize}, f)
+
+    def _symbol_index(self, symbol):
+        if symbol not in self.symbols:
+            self.symbols.append(symbol)
+            self._write_meta()
+        return self.symbols.index(symbol)
+
+    def _append(self, kind, symbol, ts, price, bid=None, ask=None, payload=None):
+        with self._lock:
+            if self._records.closed:
+                return              # an order thread finishing after shutdown
+            ts = max(int(ts), self._last_ts)
+            self._last_ts = ts
+            hour = ts - ts % HOUR_MS
+            if hour != self._hour:
+                self._hour = hour
+                self._hours.write(np.array([(hour, self._count)], HOUR).tobytes())
+                self._hours.flush()
+            ref = 0
+            if payload is not None:
+                ref = self._events.tell()
+                self._events.write(json.dumps(payload).encode() + b"\n")
+                self._events.flush()
+            price = math.nan if price is None else price
+            self._records.write(_PACK(ts, price, math.nan if bid is None else bid - price,
+                                      math.nan if ask is None else ask - price, ref, kind,
+                                      self._symbol_index(symbol), 0))
+            self._count += 1
+            self._pending += 1
+            if payload is not None or self._pending >= self.flush_every:
+                self._records.flush()
+                self._pending = 0
+
+    def tick(self, symbol, last, bid, ask, ts):
+        # TickerFeed listener
+        if last is not None:
+            self._append(TICK, symbol, ts, last, bid, ask)
+
+    def signal(self, signal):
+        # SignalInbox listener; the payload is what Signal.from_payload reads back
+        payload = {"id": signal.id, "pair": signal.pair, "signal": signal.signal, "price": signal.price,
+                   "tp": signal.tp, "sl": signal.sl, "dca_trigger": signal.dca_trigger}
+        self._append(SIGNAL, signal.pair, _now_ms(), signal.price, payload=payload)
+
+    def order(self, body, response):
+        # OKXClient order listener: the request and OKX's answer to it
+        first = body[0] if isinstance(body, list) and body else body or {}
+        px = first.get("px")
+        self._append(ORDER, first.get("instId", SYMBOL), _now_ms(), float(px) if px else None,
+                     payload={"request": body, "response": response})
+
+    def push(self, order):
+        # OrderStream listener: one order state from the private orders channel
+        px = order.get("fillPx") or order.get("avgPx") or order.get("px")
+        self._append(PUSH, order.get("instId", SYMBOL), int(order.get("uTime") or _now_ms()),
+                     float(px) if px else None, payload=order)
+
+    def flush(self):
+        with self._lock:
+            self._records.flush()
+            self._pending = 0
+
+    def close(self):
+        with self._lock:
+            for f in (self._records, self._events, self._hours):
+                f.close()
+
+
+class Tape:
+    """Read side of a TapeRecorder directory, memory-mapped.
+
+    Works on a tape that is still being written (a torn last record is
+    ignored); reopen it to see newer records. seek() bisects the hour
+    index, then the timestamps of that hour: O(log n) and only a few
+    pages of the file are touched.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.symbols = json.load(f)["symbols"]
+        size = os.path.getsize(os.path.join(path, "records.bin"))
+        n = size // RECORD.itemsize
+        self.records = (np.memmap(os.path.join(path, "records.bin"), RECORD, "r", shape=(n,)) if n
+                        else np.zeros(0, RECORD))
+        hours = np.fromfile(os.path.join(path, "hours.idx"), HOUR)
+        self.hours = hours[hours["first"] < n]
+        self._events = open(os.path.join(path, "events.jsonl"), "rb")
+
+    def __len__(self):
+        return len(self.records)
+
+    def seek(self, ts):
+        # Index of the first record at or after `ts` (ms)
+        n = len(self.records)
+        h = int(np.searchsorted(self.hours["hour"], ts - ts % HOUR_MS, side="right")) - 1
+        if h < 0:
+            return 0
+        start = int(self.hours["first"][h])
+        end = int(self.hours["first"][h + 1]) if h + 1 < len(self.hours) else n
+        return start + int(np.searchsorted(self.records["ts"][start:end], ts))
+
+    def span(self):
+        # (first ts, last ts) in ms, or None for an empty tape
+        if not len(self.records):
+            return None
+        return int(self.records["ts"][0]), int(self.records["ts"][-1])
+
+    def payload(self, record):
+        self._events.seek(int(record["ref"]))
+        return json.loads(self._events.readline())
+
+    def read(self, start=None, end=None, symbol=None):
+        """Yields (kind, symbol, ts, price, bid, ask, payload) for records in [start, end) ms.
+
+        payload is None for ticks, as are bid and ask when the ticker had none.
+        """
+        lo = self.seek(start) if start is not None else 0
+        hi = self.seek(end) if end is not None else len(self.records)
+        wanted = self.symbols.index(symbol) if symbol in self.symbols else None
+        if symbol is not None and wanted is None:
+            return
+        for record in self.records[lo:hi]:
+            if wanted is not None and record["symbol"] != wanted:
+                continue
+            kind, price = int(record["kind"]), float(record["price"])
+            bid, ask = float(record["bid"]), float(record["ask"])
+            yield (kind, self.symbols[record["symbol"]], int(record["ts"]), None if math.isnan(price) else price,
+                   None if math.isnan(bid) else price + bid, None if math.isnan(ask) else price + ask,
+                   None if kind == TICK else self.payload(record))
+
+    def close(self):
+        self._events.close()
+
+
+class ReplayMarket:
+    """Stands in for the live client as a PaperTrader's market: prices come from the tape."""
+
+    def __init__(self, symbols):
+        self.price_feed = TickerFeed(symbols)
+        self.price_feed.connected = True
+
+    def tick(self, symbol, last, bid, ask, ts):
+        cell = self.price_feed.cells.get(symbol)
+        if cell is not None:
+            cell.update(last, bid, ask, ts)
+
+    def get_price(self, symbol=SYMBOL):
+        # The last recorded price however old it is; tape time is not wall time
+        cell = self.price_feed.cells.get(symbol)
+        return cell.read()[0] if cell is not None else None
+
+
+class Replay:
+    """Feeds a recorded session back through TradingBot on a paper ledger.
+
+    Ticks drive on_price/execute exactly as main.on_tick does, a recorded
+    signal wakes the bot loop as a pushed one would, and the loop also
+    runs every `poll_interval` seconds of tape time. Recorded orders are
+    what the live bot did and are not replayed; the replayed bot places
+    its own. `speed` is tape seconds per wall second; 0 runs flat out.
+    No tick arrives while an order is out, so the bots' engines do not
+    wait for resting limits or pace TWAP slices: what does not fill at
+    once goes out at market straight away.
+    """
+
+    def __init__(self, tape, params_by_symbol=None, balances=None, speed=0, poll_interval=SIGNAL_CHECK_INTERVAL):
+        self.tape = tape
+        params_by_symbol = params_by_symbol or {symbol: None for symbol in tape.symbols}
+        self.market = ReplayMarket(tape.symbols)
+        self.paper = PaperTrader(params_by_symbol, self.market, balances=balances)
+        for bot in self.paper.bots.values():
+            bot.execution.timeout = 0
+            bot.execution.twap_interval = 0
+        self.speed = speed
+        self.poll_ms = int(poll_interval * 1000)
+        self.latest = None
+        self.ticks = 0
+        self.signals = 0
+        self.actions = []           # (ts, symbol, action) of every TP/SL/DCA the replay triggered
+
+    def run(self, start=None, end=None):
+        started, first_ts, next_poll, warm = time.monotonic(), None, None, False
+        for kind, symbol, ts, price, bid, ask, payload in self.tape.read(start, end):
+            if first_ts is None:
+                first_ts = ts
+            if self.speed:
+                delay = (ts - first_ts) / 1000 / self.speed - (time.monotonic() - started)
+                if delay > 0:
+                    time.sleep(delay)
+            if kind == TICK:
+                self.market.tick(symbol, price, bid, ask, ts)
+                self.paper.exchange.on_tick(symbol, price, bid, ask, ts)
+                if not warm:
+                    # Starting values come from the first prices on the tape
+                    if any(self.market.get_price(s) is None for s in self.paper.bots):
+                        continue
+                    self.paper.warm()
+                    warm, next_poll = True, ts
+                self._tick(symbol, price, ts)
+            elif kind == SIGNAL:
+                self.latest = Signal.from_payload(payload)
+                self.signals += 1
+                if warm:
+                    self._poll()
+            if warm and ts >= next_poll:
+                self._poll()
+                next_poll = ts + self.poll_ms
+        return self.summary()
+
+    def _tick(self, symbol, price, ts):
+        self.ticks += 1
+        bot = self.paper.bots.get(symbol)
+        if bot is None:
+            return
+        action = bot.on_price(price, time.perf_counter())
+        if action:
+            self.actions.append((ts, symbol, action))
+            bot.execute(action)
+
+    def _poll(self):
+        # run_paper_bot's decisions against the latest signal
+        signal = self.latest
+        for symbol, bot in self.paper.bots.items():
+            bot.check_portfolio_trailing()
+            if signal is None or signal.pair != symbol or bot.active_position or signal.signal not in ("long", "short"):
+                continue
+            price = self.market.get_price(symbol)
+            if price:
+                bot.open_position(signal.signal, price, signal)
+
+    def summary(self):
+        return {"ticks": self.ticks, "signals": self.signals, "actions": len(self.actions), "bots": self.paper.summary()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or replay a recorded tape")
+    parser.add_argument("path", help="Tape directory written by TapeRecorder")
+    parser.add_argument("--from", dest="start", type=int, help="Start (epoch ms)")
+    parser.add_argument("--to", dest="end", type=int, help="End (epoch ms), exclusive")
+    parser.add_argument("--dump", action="store_true", help="Print the records instead of replaying them")
+    parser.add_argument("--speed", type=float, default=0, help="Tape seconds per second; 0 replays flat out")
+    parser.add_argument("--params", default="{}", help='Per-pair TradingBot params, e.g. {"PI-USDT": {"order_percent": 0.05}}')
+    parser.add_argument("--usdt", type=float, default=1000.0)
+    parser.add_argument("--verbose", action="store_true", help="Show the bot's own log lines")
+    args = parser.parse_args()
+
+    tape = Tape(args.path)
+    if args.dump:
+        for kind, symbol, ts, price, bid, ask, payload in tape.read(args.start, args.end):
+            print(ts, KINDS[kind], symbol, price, bid, ask, json.dumps(payload) if payload is not None else "")
+    else:
+        params = {symbol.upper(): value for symbol, value in json.loads(args.params).items()} or None
+        replay = Replay(tape, params, {"USDT": args.usdt}, args.speed)
+        with open(os.devnull, "w") as devnull:
+            with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull):
+                result = replay.run(args.start, args.end)
+        for ts, symbol, action in replay.actions:
+            print(f"[REPLAY] {datetime.fromtimestamp(ts / 1000, timezone.utc).isoformat()} {symbol} {action}")
+        print(json.dumps(result, indent=2))
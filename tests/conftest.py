@@ -0,0 +1,48 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from paper import PaperClient
+from simulator import SimulatedExchange
+from tape import ReplayMarket
+
+SYMBOL = "PI-USDT"
+
+
+@pytest.fixture
+def exchange():
+    return SimulatedExchange({"USDT": 1000.0, "PI": 500.0}, {SYMBOL: 2.0})
+
+
+@pytest.fixture
+def market(exchange):
+    # Streamed bid/ask for limit pricing, taken from the simulator's own book
+    market = ReplayMarket([SYMBOL])
+    ticker = exchange.ticker(SYMBOL)
+    market.tick(SYMBOL, float(ticker["last"]), float(ticker["bidPx"]), float(ticker["askPx"]), int(ticker["ts"]))
+    return market
+
+
+@pytest.fixture
+def client(exchange, market):
+    return PaperClient(exchange, market)
+
+
+@pytest.fixture
+def app(monkeypatch, tmp_path):
+    # main with no bots, no risk engine and a throwaway history store; static/ and
+    # templates/ are looked up from the working directory
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import main
+    from history import HistoryStore
+    from market_feed import TickerFeed
+    history = HistoryStore(str(tmp_path / "history.db"))
+    monkeypatch.setattr(main, "bots", {})
+    monkeypatch.setattr(main, "risk", None)
+    monkeypatch.setattr(main, "history", history)
+    monkeypatch.setattr(main, "feed", TickerFeed(main.SYMBOLS))
+    yield main
+    history.close()
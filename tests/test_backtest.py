@@ -0,0 +1,70 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from backtest import Backtest, SimulatedClient, trailing_scan
+from strategy import PortfolioTrailing
+
+
+def market(seed, n=20000, signals=12):
+    # A random walk with a recorded signal stream over it
+    rng = np.random.default_rng(seed)
+    ts = np.arange(n, dtype=np.int64) * 1000 + 1_700_000_000_000
+    prices = 0.5 * np.exp(np.cumsum(rng.normal(0.00002, 0.0015, n)))
+    signal_ts = np.sort(rng.choice(ts, signals, replace=False))
+    payloads = []
+    for t in signal_ts:
+        kind = str(rng.choice(["long-divergence", "short-divergence", "long", "short", "none"]))
+        price = float(prices[np.searchsorted(ts, t)])
+        payloads.append({"ts": int(t), "signal": kind, "pair": "PI-USDT", "price": price, "tp": 0.004, "sl": 0.003,
+                         "dca_trigger": price * (0.98 if "long" in kind else 1.02)})
+    return ts, prices, signal_ts, payloads
+
+
+def tick_by_tick(backtest):
+    # What the live loop does: every tick through check_tp_sl, every poll through bot_loop's checks
+    polls = {int(q): k for k, q in enumerate(backtest.polls)}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for j in range(len(backtest.prices)):
+            backtest._tick(j)
+            if j in polls:
+                backtest._poll(polls[j])
+    return backtest.results()
+
+
+@pytest.mark.parametrize("seed,usdt,pi", [(1, 1000, 0), (2, 500, 1000), (3, 100, 3000)])
+def test_skipping_ahead_reproduces_every_live_decision(seed, usdt, pi):
+    data = market(seed)
+    fast = Backtest(*data, usdt=usdt, pi=pi)
+    result = fast.run()
+    assert result == tick_by_tick(Backtest(*data, usdt=usdt, pi=pi))
+    assert result["trade_count"] > 0
+
+
+def test_trailing_scan_matches_on_value():
+    rng = np.random.default_rng(4)
+    values = 1000 * np.exp(np.cumsum(rng.normal(0.0005, 0.002, 500)))
+    trailing, reference = PortfolioTrailing(1000.0), PortfolioTrailing(1000.0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        fired = next((i for i, value in enumerate(values) if reference.on_value(value, 1.0)), None)
+    offset, point, trigger, active = trailing_scan(trailing, values, 1.0)
+    assert offset == fired is not None
+    reference.rebase(1000.0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for value in values[:offset]:
+            reference.on_value(value, 1.0)
+    assert (point, trigger, active) == pytest.approx(
+        (reference.init_tracking_point, reference.tracking_trigger, reference.tracking_active))
+
+
+def test_simulated_client_fills_with_okx_spot_semantics():
+    client = SimulatedClient(usdt=100, pi=0, fee=0.001)
+    client.price = 2.0
+    assert client.place_order("long", 50)["code"] == "0"            # a buy's size is USDT
+    assert client.balances == {"USDT": 50.0, "PI": pytest.approx(25 * 0.999)}
+    assert client.place_order("short", 10)["code"] == "0"           # a sell's size is coin
+    assert client.balances["USDT"] == pytest.approx(50 + 20 * 0.999)
+    assert client.place_order("short", 1000)["code"] == "51008"
+    assert len(client.fills) == 2
@@ -0,0 +1,53 @@
+import os
+from unittest import mock
+
+import pytest
+
+with mock.patch.dict(os.environ):
+    # bench points the process at a local simulator on import; keep that out of other tests
+    import bench
+
+
+@pytest.fixture(scope="module")
+def decisions():
+    return bench.bench_decisions(count=200)
+
+
+def stats(p99_us, requests_per_op=None, **extra):
+    result = {"ops": 100, "mean_us": p99_us / 2, "p50_us": p99_us / 2, "p99_us": p99_us}
+    if requests_per_op is not None:
+        result["requests_per_op"] = requests_per_op
+    result.update(extra)
+    return result
+
+
+def test_every_decision_benchmark_runs(decisions):
+    assert set(decisions) == {"check_tp_sl", "check_portfolio_trailing", "calculate_amount", "calculate_amount_depth",
+                              "indicator_tick", "ledger_fill", "open_position"}
+    for result in decisions.values():
+        assert result["ops"] > 0 and 0 < result["p50_us"] <= result["p99_us"]
+
+
+def test_the_tick_path_makes_no_exchange_requests(decisions):
+    # A tick inside the TP/DCA band is decided from the streamed price alone
+    for name in ("check_tp_sl", "indicator_tick", "ledger_fill"):
+        assert decisions[name]["requests_per_op"] == 0
+
+
+def test_summarize_reports_microseconds():
+    result = bench.summarize([1000, 2000, 3000, 4000], calls=8)
+    assert result["ops"] == 4 and result["mean_us"] == 2.5 and result["p50_us"] == 2.5
+    assert result["requests_per_op"] == 2
+
+
+def test_compare_flags_regressions_beyond_tolerance_and_noise():
+    baseline = {"decision": {"slow": stats(1000), "tiny": stats(10), "chatty": stats(100, 1.0)},
+                "api": {"/logs": stats(500, delivered=1.0)}}
+    assert bench.compare(baseline, baseline) == []
+    current = {"decision": {"slow": stats(1300), "tiny": stats(55), "chatty": stats(100, 2.0)},
+               "api": {"/logs": stats(500, delivered=0.9)}}
+    regressions = bench.compare(current, baseline, tolerance=0.25)
+    assert len(regressions) == 3
+    assert regressions[0].startswith("decision/slow: p99 1300")
+    assert "exchange requests/op" in regressions[1] and "delivered 0.9" in regressions[2]
+    assert bench.compare({"decision": {"slow": stats(1200)}}, baseline, tolerance=0.25) == []
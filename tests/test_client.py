@@ -0,0 +1,91 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+
+import httpx
+
+from client import AsyncOKXClient
+from ratelimit import RateLimiter
+
+SYMBOL = "PI-USDT"
+
+
+def client_for(handler):
+    # AsyncOKXClient answering from `handler` instead of OKX, with test credentials
+    client = AsyncOKXClient(RateLimiter(limits={}, default=(1000, 1)))
+    client.api_key, client.api_secret, client.api_passphrase = "key", "secret", "pass"
+    client.session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def ok(data):
+    return httpx.Response(200, json={"code": "0", "msg": "", "data": data})
+
+
+def test_identical_reads_share_one_request():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.path)
+        await asyncio.sleep(0.01)
+        return ok([{"instId": SYMBOL, "last": "2.5"}])
+
+    async def run():
+        client = client_for(handler)
+        return await asyncio.gather(*(client.get_price(SYMBOL) for _ in range(5)))
+
+    assert asyncio.run(run()) == [2.5] * 5
+    assert calls == ["/api/v5/market/ticker"]
+
+
+def test_orders_are_signed_and_reach_the_order_listeners():
+    requests, seen = [], []
+
+    def handler(request):
+        requests.append(request)
+        return ok([{"ordId": "1", "sCode": "0"}])
+
+    async def run():
+        client = client_for(handler)
+        client.order_listeners.append(lambda body, response: seen.append(body))
+        await client.place_order("long", 10, SYMBOL, cl_ord_id="a1")
+        await client.place_orders([{"side": "short", "amount": 1, "symbol": SYMBOL, "cl_ord_id": "a2"}])
+        await client.cancel_order(SYMBOL, cl_ord_id="a1")
+        await client.cancel_orders(SYMBOL, ["a2"])
+
+    asyncio.run(run())
+    for request in requests:
+        headers = request.headers
+        message = headers["OK-ACCESS-TIMESTAMP"] + request.method + request.url.raw_path.decode() + request.content.decode()
+        assert headers["OK-ACCESS-SIGN"] == base64.b64encode(
+            hmac.new(b"secret", message.encode(), hashlib.sha256).digest()).decode()
+        assert headers["OK-ACCESS-KEY"] == "key" and headers["OK-ACCESS-PASSPHRASE"] == "pass"
+    assert [json.loads(request.content) for request in requests] == seen
+    assert [request.url.path.rsplit("/", 1)[1] for request in requests] == \
+        ["order", "batch-orders", "cancel-order", "cancel-batch-orders"]
+    assert seen[0]["side"] == "buy" and seen[1][0]["side"] == "sell"
+
+
+def test_throttled_request_backs_off_and_retries():
+    responses = [httpx.Response(429), httpx.Response(200, json={"code": "50011", "msg": "Too Many Requests"}),
+                 None]
+
+    def handler(request):
+        return responses.pop(0) or ok([{"details": [{"ccy": "USDT", "availBal": "12.5"}]}])
+
+    balances = asyncio.run(client_for(handler).get_balances(["USDT", "PI"]))
+    assert balances == {"USDT": 12.5, "PI": 0.0}
+    assert responses == []
+
+
+def test_failed_reads_return_none():
+    def handler(request):
+        return httpx.Response(500)
+
+    async def run():
+        client = client_for(handler)
+        return await client.get_fills(SYMBOL), await client.get_price(SYMBOL), await client.get_candles(SYMBOL)
+
+    assert asyncio.run(run()) == (None, None, [])
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+
+from starlette.requests import Request
+
+from events import StateHub, LogBuffer
+
+
+async def take(stream, n, timeout=1.0):
+    return [await asyncio.wait_for(stream.__anext__(), timeout) for _ in range(n)]
+
+
+def test_subscribers_get_the_current_value_then_each_change():
+    async def run():
+        hub = StateHub()
+        hub.bind(asyncio.get_running_loop())
+        hub.publish("stats:PI-USDT", {"total": 1})
+        stream = hub.subscribe(["stats:PI-USDT", "position:PI-USDT"])
+        first = await take(stream, 1)
+        hub.publish("stats:PI-USDT", {"total": 1})          # unchanged: nobody is woken
+        hub.publish("position:PI-USDT", {"side": "long"})
+        second = await take(stream, 1)
+        return first, second
+
+    assert asyncio.run(run()) == ([("stats:PI-USDT", {"total": 1})], [("position:PI-USDT", {"side": "long"})])
+
+
+def test_a_slow_subscriber_skips_to_the_newest_value():
+    async def run():
+        hub = StateHub()
+        hub.bind(asyncio.get_running_loop())
+        stream = hub.subscribe(["stats:PI-USDT"])
+        hub.publish("stats:PI-USDT", {"total": 1})
+        await take(stream, 1)
+        for total in range(2, 6):
+            hub.publish("stats:PI-USDT", {"total": total})
+        return await take(stream, 1)
+
+    assert asyncio.run(run()) == [("stats:PI-USDT", {"total": 5})]
+
+
+def test_publish_from_a_worker_thread_reaches_the_loop():
+    async def run():
+        hub = StateHub()
+        hub.bind(asyncio.get_running_loop())
+        stream = hub.subscribe(["position:PI-USDT"])
+        pending = asyncio.ensure_future(take(stream, 1))
+        await asyncio.sleep(0)
+        threading.Thread(target=hub.publish, args=("position:PI-USDT", {"side": "short"})).start()
+        return await pending
+
+    assert asyncio.run(run()) == [("position:PI-USDT", {"side": "short"})]
+
+
+def test_idle_subscribers_get_a_heartbeat():
+    async def run():
+        stream = StateHub().subscribe(["stats:PI-USDT"], heartbeat=0.01)
+        return await take(stream, 1)
+
+    assert asyncio.run(run()) == [None]
+
+
+def test_stats_are_served_from_the_hub(app):
+    from fastapi.testclient import TestClient
+
+    class Bot:
+        symbol = app.SYMBOLS[0]
+
+    app.bots[Bot.symbol] = Bot()
+    app.hub._values.pop(f"stats:{Bot.symbol}", None)
+    http = TestClient(app.app)
+    assert http.get("/stats").status_code == 503
+    app.hub.publish(f"stats:{Bot.symbol}", app.stats_payload((2000.0, 1000.0, 500.0, 2.0)))
+    assert http.get("/stats").json() == {"total": 2000.0, "usdt": 1000.0, "pi": 500.0, "price": 2.0}
+
+
+def test_log_buffer_keeps_the_last_events():
+    logs = LogBuffer(size=3)
+    ids = [logs.append(f"line {i}") for i in range(5)]
+    assert ids == [1, 2, 3, 4, 5]
+    assert logs.since(0) == [(3, "line 2"), (4, "line 3"), (5, "line 4")]
+    assert logs.since(4) == [(5, "line 4")]
+    assert logs.since(99) == logs.since(0)      # an id from before a restart replays the buffer
+
+
+def test_every_log_subscriber_sees_every_event_after_its_cursor():
+    async def run():
+        logs = LogBuffer(size=10)
+        logs.bind(asyncio.get_running_loop())
+        logs.append("before")
+        fresh, resumed = logs.subscribe(0), logs.subscribe(1)
+        first = await take(fresh, 1)
+        pending = asyncio.ensure_future(take(resumed, 2))
+        await asyncio.sleep(0)
+        threading.Thread(target=lambda: [logs.append("a"), logs.append("b")]).start()
+        return first + await take(fresh, 2), await pending
+
+    fresh, resumed = asyncio.run(run())
+    assert fresh == [(1, "before"), (2, "a"), (3, "b")]
+    assert resumed == [(2, "a"), (3, "b")]
+
+
+def test_logs_resume_after_last_event_id(app, monkeypatch):
+    logs = LogBuffer(size=10)
+    for i in range(4):
+        logs.append(f"line {i}")
+    monkeypatch.setattr(app, "logs", logs)
+
+    async def run():
+        request = Request({"type": "http", "headers": [(b"last-event-id", b"2")]})
+        body = (await app.stream_logs(request)).body_iterator
+        return [await asyncio.wait_for(body.__anext__(), 1) for _ in range(2)]
+
+    assert asyncio.run(run()) == ["id: 3\ndata: line 2\n\n", "id: 4\ndata: line 3\n\n"]
@@ -0,0 +1,161 @@
+import time
+import threading
+
+from execution import (
+    ExecutionEngine, Execution, new_cl_ord_id, FILLED, CANCELED, REJECTED, UNKNOWN, MARKET, LIMIT, POST_ONLY, IOC, TWAP
+)
+
+SYMBOL = "PI-USDT"
+
+
+def orders_with(exchange, cl_ord_id):
+    return [order for order in exchange.orders.values() if order["clOrdId"] == cl_ord_id]
+
+
+def test_market_order_fills(client, exchange):
+    report = ExecutionEngine(client, timeout=0).submit("long", 100, SYMBOL)
+    assert report.state == FILLED
+    assert report.ok
+    assert abs(report.filled * report.avg_px - 100) < 1e-6
+    assert exchange.balances["USDT"] == 900
+
+
+def test_lost_ack_is_looked_up_instead_of_resent(client, exchange):
+    place = client.place_order
+    calls = []
+
+    def lossy(**order):
+        calls.append(order["cl_ord_id"])
+        response = place(**order)
+        return None if len(calls) == 1 else response
+
+    client.place_order = lossy
+    report = ExecutionEngine(client, timeout=0).submit("long", 100, SYMBOL)
+    assert report.state == FILLED
+    assert calls == [report.cl_ord_id]
+    assert len(orders_with(exchange, report.cl_ord_id)) == 1
+
+
+def test_unacknowledged_order_is_resent_under_the_same_id(client, exchange):
+    place = client.place_order
+    calls = []
+
+    def dropped(**order):
+        # The first attempt never reaches the exchange
+        calls.append(order["cl_ord_id"])
+        return None if len(calls) == 1 else place(**order)
+
+    client.place_order = dropped
+    report = ExecutionEngine(client, timeout=0, retries=2).submit("short", 10, SYMBOL)
+    assert report.state == FILLED
+    assert len(calls) == 2 and calls[0] == calls[1] == report.cl_ord_id
+    assert len(orders_with(exchange, report.cl_ord_id)) == 1
+
+
+def test_no_response_at_all_is_unknown(client):
+    client.place_order = lambda **order: None
+    report = ExecutionEngine(client, timeout=0, retries=1).submit("long", 100, SYMBOL)
+    assert report.state == UNKNOWN
+    assert not report.ok
+
+
+def test_duplicate_cl_ord_id_returns_the_existing_order(client, exchange):
+    engine = ExecutionEngine(client, timeout=0)
+    first = engine.submit("long", 100, SYMBOL)
+    again = engine.submit("long", 100, SYMBOL, cl_ord_id=first.cl_ord_id)
+    assert again.state == FILLED
+    assert again.filled == first.filled
+    assert len(orders_with(exchange, first.cl_ord_id)) == 1
+    assert exchange.balances["USDT"] == 900
+
+
+def test_rejected_order(client):
+    report = ExecutionEngine(client, timeout=0).submit("short", 1e9, SYMBOL)
+    assert report.state == REJECTED
+    assert report.code == "51008"
+    assert not report.ok
+
+
+def test_unfilled_post_only_goes_out_at_market(client, exchange):
+    report = ExecutionEngine(client, timeout=0).submit("short", 5, SYMBOL, POST_ONLY)
+    assert report.state == FILLED
+    assert report.filled == 5
+    assert [order["ordType"] for order in exchange.orders.values()] == ["post_only", "market"]
+    assert orders_with(exchange, report.cl_ord_id + "m")
+
+
+def test_iceberg_exit_is_one_batch_and_fills_the_rest(client, exchange):
+    report = ExecutionEngine(client, timeout=0).submit_sliced("short", 100, SYMBOL, slices=4)
+    assert report.state == FILLED
+    assert abs(report.filled - 100) < 1e-9
+    assert exchange.balances["PI"] == 400
+
+
+def test_iceberg_children_step_through_the_book(client, exchange):
+    ExecutionEngine(client, timeout=0, slice_step=0.001).submit_sliced("short", 100, SYMBOL, slices=3, cl_ord_id="ice")
+    children = [order for order in exchange.orders.values() if order["ordType"] == IOC]
+    assert [order["clOrdId"] for order in children] == ["icea", "iceb", "icec"]
+    prices = [float(order["px"]) for order in children]
+    assert prices[0] > prices[1] > prices[2]
+
+
+def test_twap_sends_equal_market_children(client, exchange):
+    report = ExecutionEngine(client, timeout=0, twap_interval=0).submit_sliced("short", 90, SYMBOL, slices=3,
+                                                                              style=TWAP, cl_ord_id="twap")
+    assert report.state == FILLED and abs(report.filled - 90) < 1e-9
+    assert [(order["clOrdId"], order["sz"]) for order in exchange.orders.values()] == \
+        [("twapa", "30.0"), ("twapb", "30.0"), ("twapc", "30.0")]
+
+
+def test_lost_batch_resends_only_the_missing_children(client, exchange):
+    place = client.place_order
+    sent = []
+
+    def lossy(orders):
+        # The first request reaches OKX with only its first child, and the response is lost
+        sent.append([order["cl_ord_id"] for order in orders])
+        if len(sent) == 1:
+            place(**orders[0])
+            return None
+        return client.__class__.place_orders(client, orders)
+
+    client.place_orders = lossy
+    report = ExecutionEngine(client, timeout=0).submit_batch("short", [(10, MARKET, None)] * 3, SYMBOL, cl_ord_id="lost")
+    assert sent == [["losta", "lostb", "lostc"], ["lostb", "lostc"]]
+    assert report.state == FILLED and abs(report.filled - 30) < 1e-9
+    assert [order["clOrdId"] for order in exchange.orders.values()] == ["losta", "lostb", "lostc"]
+
+
+def test_cancel_all_pulls_resting_orders_without_a_market_follow_up(client, exchange):
+    engine = ExecutionEngine(client, timeout=5)
+    reports = []
+    waiting = threading.Thread(target=lambda: reports.append(engine.submit("short", 10, SYMBOL, LIMIT, "rest")))
+    waiting.start()
+    while not engine._live:
+        time.sleep(0.001)
+    assert engine.cancel_all("BTC-USDT") == 0
+    assert engine.cancel_all(SYMBOL) == 1
+    waiting.join(5)
+    assert reports[0].state == CANCELED and not reports[0].ok
+    assert [order["clOrdId"] for order in exchange.orders.values()] == ["rest"]
+    assert exchange.available("PI") == 500
+
+def test_merge_averages_fills_and_sums_fees():
+    limit = Execution("a", "short", POST_ONLY, CANCELED, filled=2.0, avg_px=2.0, fee=0.01)
+    rest = Execution("am", "short", MARKET, FILLED, filled=6.0, avg_px=1.9, fee=0.02)
+    merged = limit.merge(rest)
+    assert merged.state == FILLED
+    assert merged.filled == 8.0
+    assert abs(merged.avg_px - (2.0 * 2 + 1.9 * 6) / 8) < 1e-12
+    assert abs(merged.fee - 0.03) < 1e-12
+    assert merged.cl_ord_id == "a"
+
+
+def test_combine_marks_partly_filled_children_canceled():
+    cl_ord_id = new_cl_ord_id()
+    children = [Execution(cl_ord_id + "a", "short", MARKET, FILLED, filled=1.0, avg_px=2.0),
+                Execution(cl_ord_id + "b", "short", MARKET, CANCELED, filled=0.0)]
+    assert Execution.combine(cl_ord_id, "short", MARKET, children).state == CANCELED
+    children[1] = Execution(cl_ord_id + "b", "short", MARKET, FILLED, filled=1.0, avg_px=1.0)
+    total = Execution.combine(cl_ord_id, "short", MARKET, children)
+    assert total.state == FILLED and total.filled == 2.0 and total.avg_px == 1.5
@@ -0,0 +1,67 @@
+import pytest
+
+from history import HistoryStore, VALUES
+from config import HISTORY_MAX_POINTS
+
+SYMBOL = "PI-USDT"
+START = 1_700_000_000_000 - 1_700_000_000_000 % 3_600_000
+STEP = 10_000       # a sample every 10 s
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"))
+    # Three hours of samples; tp_count goes up once an hour
+    for i in range(3 * 360):
+        store.append(SYMBOL, {"value": 1000.0 + i, "price": 2.0 + i / 1000, "pnl": float(i), "growth_percent": i / 10,
+                              "tp_count": i // 360, "dca_count": 0, "profit_capture": 0, "loss_limit": 0},
+                     ts=START + i * STEP)
+    store.append("BTC-USDT", {name: 1.0 for name in VALUES} | {"tp_count": 9, "dca_count": 0,
+                                                              "profit_capture": 0, "loss_limit": 0}, ts=START)
+    yield store
+    store.close()
+
+
+def expected(bucket_ms, start=START, end=START + 3 * 3_600_000 - 1):
+    # Plain per-bucket average of the raw values written above
+    buckets = {}
+    for i in range(3 * 360):
+        ts = START + i * STEP
+        if start <= ts <= end:
+            buckets.setdefault(ts // bucket_ms * bucket_ms, []).append(1000.0 + i)
+    return sorted(buckets), [round(sum(v) / len(v), 4) for _, v in sorted(buckets.items())]
+
+
+@pytest.mark.parametrize("resolution", [30, 60, 120, 3600])
+def test_buckets_average_the_raw_samples(store, resolution):
+    got_resolution, columns = store.query(SYMBOL, START, START + 3 * 3_600_000 - 1, resolution)
+    assert got_resolution == resolution
+    assert (columns["ts"], columns["value"]) == expected(resolution * 1000)
+
+
+def test_rollups_keep_the_last_counter(store):
+    _, columns = store.query(SYMBOL, START, START + 3 * 3_600_000 - 1, 3600)
+    assert columns["tp_count"] == [0, 1, 2]
+    _, columns = store.query("BTC-USDT", START, START + 3_600_000, 60)
+    assert columns["tp_count"] == [9]
+
+
+def test_automatic_resolution_is_a_whole_tier(store):
+    end = START + 2 * 86_400_000
+    resolution, columns = store.query(SYMBOL, START, end)
+    assert resolution == 180                        # 173 s rounded up to whole minutes
+    assert len(columns["ts"]) <= HISTORY_MAX_POINTS
+    assert (columns["ts"], columns["value"]) == expected(180_000)
+    resolution, _ = store.query(SYMBOL, START, START + 600_000)
+    assert resolution == 1                          # short ranges read the raw samples
+
+
+def test_initial_value_survives_a_reopen(tmp_path):
+    path = str(tmp_path / "history.db")
+    store = HistoryStore(path)
+    assert store.initial(SYMBOL) is None
+    store.set_initial(SYMBOL, 1234.5, "2026-01-01T00:00:00+00:00")
+    store.close()
+    reopened = HistoryStore(path)
+    assert reopened.initial(SYMBOL) == (1234.5, "2026-01-01T00:00:00+00:00")
+    reopened.close()
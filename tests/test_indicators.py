@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from indicators import EMA, RSI, MACD, Divergence, IndicatorEngine, BAR_SECONDS
+from signals import SignalInbox
+
+SYMBOL = "PI-USDT"
+BAR_MS = BAR_SECONDS["1m"] * 1000
+PRICES = [2.0, 2.03, 1.98, 2.05, 2.1, 2.07, 2.02, 2.08, 2.12, 2.06, 2.01, 1.97, 2.0, 2.04, 2.09, 2.11,
+          2.05, 1.99, 1.95, 1.98, 2.02, 2.06, 2.03, 2.0]
+
+
+def reference_rsi(prices, period):
+    # Wilder's RSI written out the long way
+    changes = [b - a for a, b in zip(prices, prices[1:])]
+    gain = sum(max(c, 0) for c in changes[:period]) / period
+    loss = sum(max(-c, 0) for c in changes[:period]) / period
+    values = [100 - 100 / (1 + gain / loss)]
+    for c in changes[period:]:
+        gain = (gain * (period - 1) + max(c, 0)) / period
+        loss = (loss * (period - 1) + max(-c, 0)) / period
+        values.append(100 - 100 / (1 + gain / loss))
+    return values
+
+
+def test_ema_is_seeded_with_the_simple_average():
+    ema = EMA(3)
+    assert [ema.update(x) for x in (1.0, 2.0)] == [None, None]
+    assert ema.update(3.0) == 2.0
+    assert ema.update(6.0) == pytest.approx(2.0 + 0.5 * (6.0 - 2.0))
+
+
+def test_rsi_matches_wilder():
+    rsi = RSI(5)
+    values = [v for v in (rsi.update(p) for p in PRICES) if v is not None]
+    assert values == pytest.approx(reference_rsi(PRICES, 5))
+
+
+def test_macd_histogram_is_line_minus_signal():
+    macd = MACD(3, 6, 2)
+    fast, slow = EMA(3), EMA(6)
+    lines = []
+    for price in PRICES:
+        histogram = macd.update(price)
+        f, s = fast.update(price), slow.update(price)
+        if f is not None and s is not None:
+            lines.append(f - s)
+        if histogram is not None:
+            assert histogram == pytest.approx(macd.line - macd.signal.value)
+            assert macd.line == pytest.approx(lines[-1])
+    assert macd.histogram is not None
+
+
+def test_divergence_needs_a_lower_low_on_a_higher_rsi():
+    divergence = Divergence(wing=1, max_gap=10)
+    # Swing lows at bars 2 (1.0, RSI 30) and 5 (0.9, RSI 35)
+    bars = [(1.2, 50), (1.0, 30), (1.1, 45), (1.15, 50), (0.9, 35), (1.0, 45)]
+    assert [divergence.update(close, rsi) for close, rsi in bars] == [None, None, None, None, None, "long-divergence"]
+
+    no_divergence = Divergence(wing=1, max_gap=10)
+    bars = [(1.2, 50), (1.0, 30), (1.1, 45), (1.15, 50), (0.9, 25), (1.0, 45)]
+    assert [no_divergence.update(close, rsi) for close, rsi in bars][-1] is None
+
+
+def test_signal_is_emitted_once_when_its_bar_closes():
+    inbox = SignalInbox()
+    engine = IndicatorEngine(inbox, [SYMBOL])
+    state = engine.states[SYMBOL]
+    closed = []
+    state.close_bar = lambda close: closed.append(close) or "long-divergence"
+
+    assert engine.on_tick(SYMBOL, 2.0, None, None, 0) is None
+    assert engine.on_tick(SYMBOL, 2.1, None, None, BAR_MS // 2) is None      # same bar
+    signal = engine.on_tick(SYMBOL, 2.2, None, None, BAR_MS)                 # opens the next bar
+    assert closed == [2.1]
+    assert (signal.pair, signal.signal, signal.price) == (SYMBOL, "long", 2.2)
+    assert inbox.latest is signal
+    assert engine.on_tick(SYMBOL, 2.0, None, None, BAR_MS // 2) is None      # an older bar is ignored
+    assert closed == [2.1]
+
+
+def test_warm_starts_from_the_bar_after_the_last_closed_candle():
+    class Candles:
+        async def get_candles(self, symbol, bar, limit):
+            return [(i * BAR_MS, price) for i, price in enumerate(PRICES)]
+
+    engine = IndicatorEngine(SignalInbox(), [SYMBOL])
+    asyncio.run(engine.warm(Candles()))
+    state = engine.states[SYMBOL]
+    assert state.bucket == len(PRICES) * BAR_MS
+    assert state.rsi.value == pytest.approx(reference_rsi(PRICES, state.rsi.period)[-1])
+    assert state.close is None
+
+
+def test_a_failed_hand_off_does_not_reach_the_feed():
+    class Broken:
+        def ingest(self, signal):
+            raise OSError("disk full")
+
+    engine = IndicatorEngine(Broken(), [SYMBOL])
+    engine.states[SYMBOL].close_bar = lambda close: "short-divergence"
+    engine.on_tick(SYMBOL, 2.0, None, None, 0)
+    assert engine.on_tick(SYMBOL, 2.1, None, None, BAR_MS) is None
@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+from journal import StateJournal
+from strategy import OPEN, TRAILING, CLOSED, IDLE
+from trading import TradingBot
+
+SYMBOL = "PI-USDT"
+
+
+def test_newest_complete_record_wins(tmp_path):
+    journal = StateJournal("bot", str(tmp_path), compact_every=100)
+    for i in range(5):
+        journal.record({"n": i})
+    journal.close()
+    with open(journal.journal_path, "a") as f:
+        f.write('{"seq": 6, "state": {"n": ')         # torn by a crash mid-write
+    assert StateJournal("bot", str(tmp_path)).load() == {"n": 4}
+
+
+def test_compaction_keeps_the_state(tmp_path):
+    journal = StateJournal("bot", str(tmp_path), compact_every=3)
+    for i in range(7):
+        journal.record({"n": i})
+    journal.record({"n": 6})                            # unchanged: not written again
+    journal.close()
+    with open(journal.journal_path) as f:
+        assert len(f.readlines()) == 1
+    assert os.path.exists(journal.snapshot_path)
+    reloaded = StateJournal("bot", str(tmp_path))
+    assert reloaded.load() == {"n": 6}
+    reloaded.record({"n": 7})
+    reloaded.close()
+    assert StateJournal("bot", str(tmp_path)).load() == {"n": 7}
+
+
+@pytest.fixture
+def restart(client, tmp_path):
+    # A new bot process on the same account and journal directory
+    def start():
+        return TradingBot(SYMBOL, exchange=client, journal=StateJournal(SYMBOL, str(tmp_path)))
+    return start
+
+
+def crash_after_sending(bot, action, side, amount):
+    # The order reaches the exchange, then the process dies before recording the outcome
+    cl_ord_id = bot._begin_order(action, side, tp_threshold=0.01, sl_threshold=-0.02, dca_target=1.9)
+    bot._submit(side, amount, cl_ord_id)
+    bot.journal.close()
+
+
+def test_an_open_that_filled_before_the_crash_becomes_the_position(restart, exchange):
+    bot = restart().warm()
+    crash_after_sending(bot, "open", "long", 100)
+
+    bot = restart()
+    assert bot.pending is not None
+    bot.reconcile()
+    assert bot.position.state == OPEN and bot.active_position == "long"
+    assert bot.entry_price == pytest.approx(float(exchange.fills[-1]["fillPx"]))
+    assert (bot.position.tp_threshold, bot.position.dca_target) == (0.01, 1.9)
+    assert bot.pending is None
+    assert restart().pending is None                   # the outcome was journaled
+
+
+def test_an_exit_that_filled_before_the_crash_leaves_the_bot_flat(restart):
+    bot = restart().warm()
+    bot.open_position("long", 2.0)
+    crash_after_sending(bot, "close", "short", 10)
+
+    bot = restart()
+    assert bot.active_position == "long"
+    bot.reconcile()
+    assert bot.position.state == IDLE
+
+
+def test_an_order_that_never_reached_the_exchange_is_dropped(restart, client):
+    bot = restart().warm()
+    client.place_order = lambda **order: None
+    bot.execution.retries = 0
+    crash_after_sending(bot, "open", "long", 100)
+
+    bot = restart()
+    bot.reconcile()
+    assert bot.position.state == IDLE and bot.pending is None
+
+
+def test_an_exit_decided_but_not_sent_is_decided_again_from_its_state(restart, exchange):
+    bot = restart().warm()
+    bot.open_position("long", 2.0)
+    bot.position.open("long", 2.0, 0.01, -0.02, 1.9)
+    for price in (2.021, 2.04):
+        bot.on_price(price)
+    assert bot.position.state == TRAILING
+    locked = bot.position.trailing_tp
+    assert bot.on_price(2.021) and bot.position.state == CLOSED
+    bot.journal.close()
+
+    bot = restart()
+    bot.reconcile()
+    assert bot.position.state == TRAILING and bot.position.trailing_tp == locked
+
+
+def test_a_long_with_no_coin_left_is_dropped(restart, exchange):
+    bot = restart().warm()
+    bot.open_position("long", 2.0)
+    bot.journal.close()
+    exchange.balances["PI"] = 0.0
+    bot = restart()
+    bot.portfolio.invalidate()
+    bot.reconcile()
+    assert bot.position.state == IDLE
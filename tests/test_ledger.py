@@ -0,0 +1,81 @@
+import pytest
+
+from execution import ExecutionEngine, new_cl_ord_id
+from ledger import TradeLedger
+
+SYMBOL = "PI-USDT"
+
+
+class Stream:
+    # Just the connection state TradeLedger.snapshot looks at
+    connected = True
+    connected_at = 0.0
+
+
+@pytest.fixture
+def ledger(exchange):
+    ledger = TradeLedger([SYMBOL])
+    exchange._push_order = lambda order: ledger.on_order(dict(order))
+    ledger.seed(SYMBOL, (2000.0, 1000.0, 500.0, 2.0))
+    return ledger
+
+
+def send(client, ledger, action, side, amount):
+    cl_ord_id = new_cl_ord_id()
+    ledger.expect(cl_ord_id, SYMBOL, action, side)
+    return ExecutionEngine(client, timeout=0).submit(side, amount, SYMBOL, cl_ord_id=cl_ord_id)
+
+
+def test_round_trip_pnl_matches_the_account(client, exchange, ledger):
+    buy = send(client, ledger, "open", "long", 100)
+    exchange.set_price(SYMBOL, 2.1)
+    send(client, ledger, "close", "short", buy.filled)
+
+    trades, next_before = ledger.page(SYMBOL)
+    assert next_before is None
+    (trade,) = trades
+    assert trade["side"] == "long" and trade["status"] == "closed" and trade["exit"] == "close"
+    # What the account gained: the cash, less the coin the buy fee took (valued at the buy)
+    gained = (exchange.balances["USDT"] - 1000) + (exchange.balances["PI"] - 500) * buy.avg_px
+    assert trade["pnl_usdt"] == pytest.approx(gained, abs=1e-5)
+    assert trade["pnl_usdt"] > 0
+    assert ledger.summary(SYMBOL)["wins"] == 1
+
+
+def test_dca_leg_averages_the_entry(client, exchange, ledger):
+    first = send(client, ledger, "open", "long", 100)
+    exchange.set_price(SYMBOL, 1.8)
+    second = send(client, ledger, "dca", "long", 100)
+
+    (trade,) = ledger.page(SYMBOL)[0]
+    assert trade["legs"] == 2 and trade["exit"] == "dca"
+    expected = (first.filled * first.avg_px + second.filled * second.avg_px) / (first.filled + second.filled)
+    assert trade["avg_entry"] == pytest.approx(expected)
+
+
+def test_snapshot_tracks_balances_between_reads(client, exchange, ledger):
+    send(client, ledger, "open", "long", 100)
+    send(client, ledger, "close", "short", 20)
+    total, usdt, coin, price = ledger.snapshot(SYMBOL, 2.0, 60)
+    assert usdt == pytest.approx(exchange.balances["USDT"])
+    assert coin == pytest.approx(exchange.balances["PI"])
+    assert total == pytest.approx(usdt + coin * 2.0)
+
+
+def test_repeated_push_is_applied_once(exchange, ledger):
+    pushes = []
+    exchange._push_order = lambda order: pushes.append(dict(order))
+    exchange.place_order({"instId": SYMBOL, "side": "sell", "ordType": "market", "sz": "10", "clOrdId": "x1"})
+    for push in pushes * 3:
+        ledger.on_order(push)
+    assert ledger.snapshot(SYMBOL, 2.0, 60)[2] == pytest.approx(490.0)
+
+
+def test_no_snapshot_while_the_order_stream_is_down(client, ledger):
+    ledger.stream = stream = Stream()
+    assert ledger.snapshot(SYMBOL, 2.0, 60) is not None
+    stream.connected = False
+    assert ledger.snapshot(SYMBOL, 2.0, 60) is None
+    # Back up after the last balance read: fills in between may have been missed
+    stream.connected, stream.connected_at = True, float("inf")
+    assert ledger.snapshot(SYMBOL, 2.0, 60) is None
@@ -0,0 +1,118 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from paper import PaperClient
+from portfolio import PortfolioSnapshot
+from simulator import SimulatedExchange
+from tape import ReplayMarket
+from trading import TradingBot
+
+PAIRS = ["PI-USDT", "BTC-USDT"]
+
+
+@pytest.fixture
+def bots(app, monkeypatch):
+    # One bot per pair on one account, as lifespan builds them
+    exchange = SimulatedExchange({"USDT": 1000.0, "PI": 500.0, "BTC": 1.0}, {"PI-USDT": 2.0, "BTC-USDT": 100.0})
+    market = ReplayMarket(PAIRS)
+    for symbol in PAIRS:
+        market.tick(symbol, exchange.prices[symbol], None, None, 1)
+    client = PaperClient(exchange, market)
+    snapshot = PortfolioSnapshot(client, symbols=PAIRS)
+    bots = {symbol: TradingBot(symbol, exchange=client, snapshot=snapshot,
+                               params={"order_percent": 0.1} if symbol == "BTC-USDT" else None).warm()
+            for symbol in PAIRS}
+    monkeypatch.setattr(app, "bots", bots)
+    return bots
+
+
+def test_each_pair_has_its_own_bot(app, bots):
+    http = TestClient(app.app)
+    assert [(row["symbol"], row["params"]["order_percent"]) for row in http.get("/api/bots").json()] == \
+        [("PI-USDT", bots["PI-USDT"].params["order_percent"]), ("BTC-USDT", 0.1)]
+    assert http.get("/api/position", params={"symbol": "xrp-usdt"}).status_code == 404
+
+
+def test_ticks_and_requests_reach_the_pairs_own_bot(app, bots):
+    btc, pi = bots["BTC-USDT"], bots["PI-USDT"]
+    btc.open_position("long", 100.0)
+    assert pi.active_position is None and btc.active_position == "long"
+
+    app.on_tick("BTC-USDT", 100.5, None, None, 2)
+    app.on_tick("PI-USDT", 2.5, None, None, 2)
+    assert btc.chart_position["current_price"] == 100.5
+    assert app.hub.latest("position:BTC-USDT")["current_price"] == 100.5
+    position = TestClient(app.app).get("/api/position", params={"symbol": "btc-usdt"}).json()
+    assert position["side"] == "long" and position["current_price"] == 100.5
+    assert TestClient(app.app).get("/api/position", params={"symbol": "PI-USDT"}).json() == \
+        {"message": "No active position"}
+
+
+def test_importing_builds_no_live_client():
+    # A fresh interpreter that refuses every connection: importing must not need one
+    import os
+    import subprocess
+    import sys
+    code = (
+        "import socket\n"
+        "def refuse(*args): raise AssertionError('network used at import')\n"
+        "socket.socket.connect = refuse\n"
+        "socket.create_connection = refuse\n"
+        "import main, trading\n"
+        "assert main.bots == {}\n"
+        "assert trading.live_client.cache_info().currsize == 0\n"
+        "assert trading.live_portfolio.cache_info().currsize == 0\n"
+        "assert trading.live_orders.cache_info().currsize == 0\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, OKX_API_KEY="k", OKX_SECRET_KEY="s", OKX_PASSPHRASE="p", SIGNAL_SERVER_URL="")
+    done = subprocess.run([sys.executable, "-c", code], cwd=root, env=env, capture_output=True, text=True, timeout=60)
+    assert done.returncode == 0, done.stderr
+
+
+def test_warm_up_retries_only_the_failed_steps(app, monkeypatch, client):
+    import asyncio
+    bot = TradingBot("PI-USDT", exchange=client)
+    monkeypatch.setattr(app, "bots", {"PI-USDT": bot})
+    monkeypatch.setattr(app, "readiness", {"credentials": False, "portfolio": False, "indicators": True})
+    monkeypatch.setattr(app, "indicators", None)
+    monkeypatch.setattr(app, "paper", None)
+    monkeypatch.setattr(app, "WARM_UP_RETRY", 0)
+    calls = {"credentials": 0, "portfolio": 0, "reconcile": 0}
+
+    async def check_credentials():
+        calls["credentials"] += 1
+        if calls["credentials"] < 3:
+            raise ConnectionError("OKX did not accept the API credentials")
+        return True
+
+    async def warm_portfolio(symbol):
+        calls["portfolio"] += 1
+        return bot.get_portfolio_value()
+
+    reconcile = bot.reconcile
+
+    def counted_reconcile():
+        calls["reconcile"] += 1
+        reconcile()
+
+    monkeypatch.setattr(app, "check_credentials", check_credentials)
+    monkeypatch.setattr(app, "warm_portfolio", warm_portfolio)
+    monkeypatch.setattr(bot, "reconcile", counted_reconcile)
+    asyncio.run(app.warm_up())
+
+    assert calls == {"credentials": 3, "portfolio": 1, "reconcile": 1}
+    assert app.readiness == {"credentials": True, "portfolio": True, "indicators": True}
+    assert bot.initial_portfolio_value == 2000.0
+    assert app.on_tick in app.feed.listeners
+
+
+def test_ready_answers_503_until_warm(app, monkeypatch):
+    monkeypatch.setattr(app, "readiness", {"credentials": True, "portfolio": False, "indicators": True})
+    http = TestClient(app.app)
+    response = http.get("/ready")
+    assert response.status_code == 503 and response.json()["portfolio"] is False
+    app.readiness["portfolio"] = True
+    assert http.get("/ready").status_code == 503        # the ticker stream is not live yet
+    monkeypatch.setattr(app.feed, "connected", True)
+    assert http.get("/ready").status_code == 200
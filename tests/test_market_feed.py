@@ -0,0 +1,62 @@
+import asyncio
+
+from market_feed import TickerFeed, LocalTickerSource
+
+SYMBOL = "PI-USDT"
+
+
+async def stream(feed, source, pushes):
+    # Runs the feed over the local source until every push has been handled
+    task = asyncio.create_task(feed.run())
+    for push in pushes:
+        source.push(*push)
+    while not source.queue.empty():
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.01)
+    task.cancel()
+
+
+def test_ticks_reach_the_cell_and_listeners_in_order():
+    source = LocalTickerSource()
+    feed = TickerFeed([SYMBOL], connect=source.connect)
+    seen = []
+    feed.listeners.append(lambda symbol, last, bid, ask, ts: seen.append((last, ts)))
+    asyncio.run(stream(feed, source, [(2.0, 1.99, 2.01, 1000), (2.1, None, None, 2000),
+                                      (1.5, None, None, 1500), (2.1, None, None, 2000)]))
+    # Out-of-order and repeated pushes are dropped
+    assert seen == [(2.0, 1000), (2.1, 2000)]
+    assert feed.last_price(SYMBOL) == 2.1
+    assert feed.cells[SYMBOL].read()[:4] == (2.1, None, None, 2000)
+
+
+def test_a_failing_listener_does_not_drop_the_stream():
+    source = LocalTickerSource()
+    feed = TickerFeed([SYMBOL], connect=source.connect)
+    seen = []
+
+    def broken(symbol, last, bid, ask, ts):
+        raise ValueError("boom")
+
+    feed.listeners.extend([broken, lambda symbol, last, bid, ask, ts: seen.append(last)])
+    asyncio.run(stream(feed, source, [(2.0, None, None, 1000), (2.1, None, None, 2000)]))
+    assert seen == [2.0, 2.1]
+    assert feed.reconnects == 0
+    assert feed.connected
+
+
+def test_a_dropped_socket_clears_the_price():
+    source = LocalTickerSource()
+    feed = TickerFeed([SYMBOL], connect=source.connect)
+
+    async def run():
+        task = asyncio.create_task(feed.run())
+        source.push(2.0, ts=1000)
+        await asyncio.sleep(0.02)
+        assert feed.last_price(SYMBOL) == 2.0
+        source.drop()
+        await asyncio.sleep(0.02)
+        task.cancel()
+
+    asyncio.run(run())
+    assert feed.reconnects == 1
+    assert feed.last_price(SYMBOL) is None
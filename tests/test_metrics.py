@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+import metrics
+from metrics import Histogram, Gauge
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    # Metrics made by a test stay out of the process-wide /metrics output
+    registry = []
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    return registry
+
+
+def test_histogram_buckets_are_cumulative_per_label_set(registry):
+    latency = Histogram("latency_seconds", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        latency.observe(value, endpoint="/a")
+    latency.observe(0.2, endpoint="/b")
+    snapshot = latency.snapshot(endpoint="/a")
+    assert snapshot["buckets"] == {"0.1": 2, "1": 3, "+Inf": 4}
+    assert (snapshot["sum"], snapshot["count"]) == (pytest.approx(3.65), 4)
+    assert latency.snapshot(endpoint="/b")["count"] == 1
+    assert latency.snapshot(endpoint="/c")["buckets"]["+Inf"] == 0
+
+
+def test_timer_observes_the_block(registry):
+    latency = Histogram("block_seconds", "Block", buckets=(0.001, 1))
+    with latency.time(kind="sleep"):
+        time.sleep(0.005)
+    snapshot = latency.snapshot(kind="sleep")
+    assert snapshot["buckets"]["0.001"] == 0 and snapshot["buckets"]["1"] == 1
+
+
+def test_gauge_keeps_the_current_value(registry):
+    depth = Gauge("queue_depth", "Depth")
+    depth.inc(lane="read")
+    depth.inc(2, lane="read")
+    depth.dec(lane="read")
+    depth.set(7, lane="order")
+    assert sorted(depth.snapshot()["values"], key=lambda v: v["labels"]["lane"]) == [
+        {"labels": {"lane": "order"}, "value": 7}, {"labels": {"lane": "read"}, "value": 2}]
+
+
+def test_exposition_format(registry):
+    latency = Histogram("latency_seconds", "Latency", buckets=(0.5,))
+    latency.observe(0.25, endpoint='/a"b')
+    Gauge("value_usdt", "Value").set(12.5, symbol="PI-USDT")
+    assert metrics.render().splitlines() == [
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{endpoint="/a\\"b",le="0.5"} 1',
+        'latency_seconds_bucket{endpoint="/a\\"b",le="+Inf"} 1',
+        'latency_seconds_sum{endpoint="/a\\"b"} 0.25',
+        'latency_seconds_count{endpoint="/a\\"b"} 1',
+        "# HELP value_usdt Value",
+        "# TYPE value_usdt gauge",
+        'value_usdt{symbol="PI-USDT"} 12.5',
+    ]
+
+
+def test_metrics_endpoint_serves_every_metric(app):
+    from fastapi.testclient import TestClient
+    app.TRIGGER_TO_ORDER.observe(0.002, kind="tp")
+    response = TestClient(app.app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'trigger_to_order_seconds_count{kind="tp"}' in response.text
+    assert "# TYPE okx_rate_limit_queue_depth gauge" in response.text
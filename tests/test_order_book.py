@@ -0,0 +1,55 @@
+import pytest
+
+from order_book import BookFeed
+
+SYMBOL = "PI-USDT"
+
+
+@pytest.fixture
+def pushed(exchange):
+    # The `books` messages the simulator would send to a subscriber
+    messages = []
+    exchange._broadcast = lambda channel, symbol, message: channel == "books" and messages.append(message)
+    return messages
+
+
+@pytest.fixture
+def feed(exchange, pushed):
+    feed = BookFeed([SYMBOL], connect=lambda url: None)
+    assert feed._on_message(exchange.books_snapshot(SYMBOL)) is None
+    return feed
+
+
+def test_updates_track_the_exchange_book(exchange, pushed, feed):
+    for price in (2.01, 1.98, 2.05, 2.0):
+        exchange.set_price(SYMBOL, price)
+    assert len(pushed) == 4
+    for message in pushed:
+        assert feed._on_message(message) is None
+    book = feed.books[SYMBOL]
+    bids, asks = exchange.book(SYMBOL)
+    assert book.valid
+    assert book.best() == (bids[0][0], asks[0][0])
+
+
+def test_bad_checksum_resyncs_once(exchange, pushed, feed):
+    exchange.book_checksum_fault_rate = 1.0
+    for price in (2.01, 2.02, 2.03):
+        exchange.set_price(SYMBOL, price)
+    # Only the first bad diff resubscribes; the rest were sent before the new snapshot
+    assert [feed._on_message(message) for message in pushed] == [SYMBOL, None, None]
+    assert not feed.books[SYMBOL].valid
+
+    exchange.book_checksum_fault_rate = 0.0
+    assert feed._on_message(exchange.books_snapshot(SYMBOL)) is None
+    assert feed.books[SYMBOL].valid and not feed.resyncing
+    exchange.set_price(SYMBOL, 2.04)
+    assert feed._on_message(pushed[-1]) is None
+    assert feed.books[SYMBOL].valid
+
+
+def test_sequence_gap_resyncs(exchange, pushed, feed):
+    exchange.set_price(SYMBOL, 2.01)
+    exchange.set_price(SYMBOL, 2.02)
+    assert feed._on_message(pushed[1]) == SYMBOL      # the first diff was lost
+    assert not feed.books[SYMBOL].valid
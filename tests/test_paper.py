@@ -0,0 +1,61 @@
+import pytest
+
+from execution import FILLED, LIMIT
+from metrics import TRIGGER_TO_EXIT, SIGNAL_TO_ORDER
+from paper import PaperTrader
+from signals import Signal
+from tape import ReplayMarket
+
+PAIRS = ["PI-USDT", "BTC-USDT"]
+
+
+@pytest.fixture
+def market():
+    market = ReplayMarket(PAIRS)
+    market.tick("PI-USDT", 2.0, 1.99, 2.01, 1000)
+    market.tick("BTC-USDT", 100.0, 99.9, 100.1, 1000)
+    return market
+
+
+@pytest.fixture
+def paper(market):
+    paper = PaperTrader({"PI-USDT": None, "BTC-USDT": {"order_percent": 0.1}}, market,
+                        balances={"USDT": 1000.0, "PI": 100.0, "BTC": 1.0})
+    for symbol in PAIRS:
+        last, bid, ask, ts, _ = market.price_feed.cells[symbol].read()
+        paper.exchange.on_tick(symbol, last, bid, ask, ts)
+    return paper.warm()
+
+
+def test_bots_share_one_ledger_and_count_its_cash_once(paper):
+    pi, btc = paper.bots["PI-USDT"], paper.bots["BTC-USDT"]
+    assert pi.client is btc.client
+    assert pi.account_value() == btc.account_value() == pytest.approx(1000 + 100 * 2.0 + 1.0 * 100.0)
+    assert pi.params["order_percent"] != btc.params["order_percent"]
+
+
+def test_market_orders_cross_the_streamed_quotes(paper):
+    report = paper.bots["PI-USDT"].execution.submit("long", 100, "PI-USDT")
+    assert report.state == FILLED
+    assert report.avg_px >= 2.01
+    report = paper.bots["PI-USDT"].execution.submit("short", 10, "PI-USDT")
+    assert report.avg_px <= 1.99
+
+
+def test_a_live_tick_fills_a_resting_paper_limit(paper):
+    bot = paper.bots["PI-USDT"]
+    response = bot.client.place_order("long", 10, "PI-USDT", LIMIT, px=1.9, cl_ord_id="rest1")
+    assert response["code"] == "0"
+    assert paper.exchange.find_order(None, "rest1")["state"] == "live"
+    paper.exchange.on_tick("PI-USDT", 1.89, 1.88, 1.9, 2000)
+    order = paper.exchange.find_order(None, "rest1")
+    assert order["state"] == "filled" and float(order["avgPx"]) == 1.9
+
+
+def test_paper_trades_stay_out_of_the_latency_histograms(paper, market):
+    before = (TRIGGER_TO_EXIT.snapshot(), SIGNAL_TO_ORDER.snapshot())
+    bot = paper.bots["PI-USDT"]
+    bot.open_position("long", 2.0, Signal(id="p1", pair="PI-USDT", signal="long", price=2.0))
+    assert bot.active_position == "long"
+    assert paper.summary()["PI-USDT"]["fills"] == 1
+    assert (TRIGGER_TO_EXIT.snapshot(), SIGNAL_TO_ORDER.snapshot()) == before
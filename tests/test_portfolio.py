@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+from portfolio import PortfolioSnapshot, symbol_currencies
+
+PAIRS = ["PI-USDT", "BTC-USDT"]
+
+
+class Counting:
+    """Client stub with settable balances and prices that counts its requests."""
+
+    def __init__(self, delay=0.0):
+        self.balances = {"USDT": 1000.0, "PI": 500.0, "BTC": 1.0}
+        self.prices = {"PI-USDT": 2.0, "BTC-USDT": 100.0}
+        self.order_listeners = []
+        self.calls = {"balances": 0, "price": 0}
+        self.delay = delay
+        self.fetched = threading.Event()
+
+    def get_balances(self, currencies):
+        self.calls["balances"] += 1
+        balances = {ccy: self.balances.get(ccy, 0.0) for ccy in currencies}
+        self.fetched.set()
+        time.sleep(self.delay)
+        return balances
+
+    def get_price(self, symbol):
+        self.calls["price"] += 1
+        return self.prices[symbol]
+
+    def place_order(self, **order):
+        for listener in self.order_listeners:
+            listener(order, {"code": "0"})
+
+
+def test_symbol_currencies():
+    assert symbol_currencies("pi-usdt") == ("PI", "USDT")
+
+
+def test_one_balance_request_serves_every_pair_within_the_ttl():
+    client = Counting()
+    snapshot = PortfolioSnapshot(client, ttl=60, symbols=PAIRS)
+    assert snapshot.get("PI-USDT") == (2000.0, 1000.0, 500.0, 2.0)
+    assert snapshot.get("BTC-USDT") == (1100.0, 1000.0, 1.0, 100.0)
+    for _ in range(10):
+        snapshot.get("PI-USDT")
+    assert client.calls == {"balances": 1, "price": 2}
+
+
+def test_an_order_drops_the_cache():
+    client = Counting()
+    snapshot = PortfolioSnapshot(client, ttl=60, symbols=PAIRS)
+    snapshot.get("PI-USDT")
+    client.balances["PI"] = 0.0
+    client.place_order(side="short")
+    assert snapshot.peek("PI-USDT") is None
+    assert snapshot.get("PI-USDT")[2] == 0.0
+    assert client.calls["balances"] == 2
+
+
+def test_values_expire_after_the_ttl():
+    client = Counting()
+    snapshot = PortfolioSnapshot(client, ttl=0.02, symbols=PAIRS)
+    snapshot.get("PI-USDT")
+    time.sleep(0.03)
+    client.prices["PI-USDT"] = 3.0
+    assert snapshot.get("PI-USDT")[0] == 1000.0 + 500.0 * 3.0
+    assert client.calls["balances"] == 2
+
+
+def test_concurrent_callers_share_one_fetch():
+    client = Counting(delay=0.05)
+    snapshot = PortfolioSnapshot(client, ttl=60, symbols=PAIRS)
+    values = []
+    threads = [threading.Thread(target=lambda: values.append(snapshot.get("PI-USDT"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert values == [(2000.0, 1000.0, 500.0, 2.0)] * 8
+    assert client.calls == {"balances": 1, "price": 1}
+
+
+def test_a_fetch_that_raced_an_order_is_not_cached():
+    client = Counting(delay=0.05)
+    snapshot = PortfolioSnapshot(client, ttl=60, symbols=PAIRS)
+    thread = threading.Thread(target=snapshot.get, args=("PI-USDT",))
+    thread.start()
+    client.fetched.wait()
+    client.place_order(side="long")     # lands while the balances are on the wire
+    thread.join()
+    assert snapshot.peek("PI-USDT") is None
+
+
+
+def test_account_value_counts_the_cash_once():
+    client = Counting()
+    snapshot = PortfolioSnapshot(client, ttl=60, symbols=PAIRS)
+    pi, btc = snapshot.get("PI-USDT"), snapshot.get("BTC-USDT")
+    assert snapshot.account_value(pi, "PI-USDT") == pytest.approx(1000 + 500 * 2.0 + 1.0 * 100.0)
+    assert snapshot.account_value(btc, "BTC-USDT") == snapshot.account_value(pi, "PI-USDT")
+    assert snapshot.reprice("PI-USDT", 2.5) == (2250.0, 1000.0, 500.0, 2.5)
@@ -0,0 +1,110 @@
+import time
+import asyncio
+import threading
+
+import ratelimit
+from ratelimit import RateLimiter, ORDER, RISK, READ, request_lane, current_lane
+
+ENDPOINT = "/api/v5/trade/order"
+
+
+def drained(count=1, per=0.1):
+    # A limiter whose one endpoint has just spent its whole bucket
+    limiter = RateLimiter(limits={ENDPOINT: (count, per)})
+    for _ in range(count):
+        limiter.acquire(ENDPOINT)
+    return limiter
+
+
+def served(limiter, lanes):
+    # Queues one coroutine per lane, in the given order, and returns the order tokens went out in
+    async def run():
+        order = []
+
+        async def request(name, lane):
+            await limiter.acquire_async(ENDPOINT, lane)
+            order.append(name)
+        await asyncio.gather(*(request(name, lane) for name, lane in lanes))
+        return order
+    return asyncio.run(run())
+
+
+def test_scarce_tokens_go_to_the_most_urgent_lane():
+    lanes = [("read", READ), ("risk", RISK), ("order", ORDER)]
+    assert served(drained(), lanes) == ["order", "risk", "read"]
+
+
+def test_a_lane_is_served_first_in_first_out():
+    lanes = [("read-1", READ), ("order-1", ORDER), ("read-2", READ), ("order-2", ORDER)]
+    assert served(drained(), lanes) == ["order-1", "order-2", "read-1", "read-2"]
+
+
+def test_threads_and_coroutines_share_one_queue():
+    limiter = drained(per=0.2)
+    order = []
+    reader = threading.Thread(target=lambda: (limiter.acquire(ENDPOINT, READ), order.append("thread read")))
+    reader.start()
+    while not limiter._queues[ENDPOINT]:
+        time.sleep(0.001)
+
+    async def place():
+        await limiter.acquire_async(ENDPOINT, ORDER)
+        order.append("async order")
+    asyncio.run(place())
+    reader.join(2)
+    assert order == ["async order", "thread read"]
+    assert not limiter._queues[ENDPOINT]
+
+
+def test_tokens_refill_at_the_endpoint_rate():
+    limiter = RateLimiter(limits={ENDPOINT: (2, 0.2)})
+    started = time.monotonic()
+    for _ in range(4):
+        limiter.acquire(ENDPOINT)
+    assert 0.15 <= time.monotonic() - started < 1
+
+
+def test_backoff_blocks_the_whole_endpoint(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_BACKOFF_BASE", 0.1)
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_BACKOFF_MAX", 0.2)
+    limiter = RateLimiter(limits={ENDPOINT: (100, 1)})
+    delay = limiter.backoff(ENDPOINT, attempt=0)
+    assert 0.05 <= delay <= 0.1
+    started = time.monotonic()
+    limiter.acquire(ENDPOINT, ORDER)
+    assert time.monotonic() - started >= delay - 0.01
+    limiter.acquire("/api/v5/account/balance")        # other endpoints are not blocked
+    assert time.monotonic() - started < delay + 0.05
+
+
+def test_backoff_grows_and_is_capped(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_BACKOFF_BASE", 1.0)
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_BACKOFF_MAX", 8.0)
+    limiter = RateLimiter()
+    for attempt, (low, high) in enumerate([(0.5, 1), (1, 2), (2, 4), (4, 8), (4, 8), (4, 8)]):
+        assert low <= limiter.backoff("/x", attempt) <= high
+
+
+def test_a_cancelled_waiter_leaves_the_queue():
+    limiter = drained(per=0.2)
+
+    async def run():
+        waiter = asyncio.create_task(limiter.acquire_async(ENDPOINT, READ))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.wait_for(limiter.acquire_async(ENDPOINT, READ), 1)
+    asyncio.run(run())
+    assert not limiter._queues[ENDPOINT]
+
+
+def test_lane_follows_the_request_context():
+    assert current_lane("GET", "/api/v5/account/balance") == READ
+    with request_lane(RISK):
+        assert current_lane("GET", "/api/v5/account/balance") == RISK
+        assert current_lane("POST", "/api/v5/trade/order") == ORDER
+
+        async def in_thread():
+            return await asyncio.to_thread(current_lane, "GET", "/api/v5/trade/fills")
+        assert asyncio.run(in_thread()) == RISK
+    assert current_lane("GET", "/api/v5/trade/fills") == READ
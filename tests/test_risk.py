@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from risk import RiskEngine, DRAWDOWN, DAILY_LOSS
+from strategy import OPEN
+from trading import TradingBot
+
+SYMBOL = "PI-USDT"
+
+
+def rejected(**order):
+    return {"code": "1", "msg": "Operation failed.",
+            "data": [{"ordId": "", "clOrdId": order.get("cl_ord_id") or "", "sCode": "51008",
+                      "sMsg": "Order failed. Insufficient balance"}]}
+
+
+@pytest.fixture
+def bot(client):
+    return TradingBot(SYMBOL, exchange=client).warm()
+
+
+def engine(bot, **limits):
+    risk = RiskEngine({SYMBOL: bot}, **limits)
+    risk.armed = True
+    risk.on_balances(SYMBOL, bot.get_portfolio_value())
+    return risk
+
+
+async def tick(risk, exchange, price):
+    # One streamed price, then whatever exit it started runs to the end
+    exchange.set_price(SYMBOL, price)
+    reason = risk.on_tick(SYMBOL, price, price, price, 0)
+    while risk._tasks:
+        await asyncio.sleep(0.01)
+    return reason
+
+
+def test_drawdown_force_sells_the_pair(bot, exchange):
+    async def run():
+        risk = engine(bot, max_drawdown=0.02, daily_loss=0)
+        assert await tick(risk, exchange, 1.95) is None     # account 1975, 1.25% down
+        assert await tick(risk, exchange, 1.9) == DRAWDOWN   # account 1950, 2.5% down
+        return risk
+
+    risk = asyncio.run(run())
+    assert exchange.balances["PI"] == 0
+    assert bot.loss_limit == 1
+    assert risk.breaches[DRAWDOWN] == 1
+    assert SYMBOL not in risk.exiting
+
+
+def test_rejected_force_sell_keeps_the_position(bot, client, exchange):
+    bot.open_position("long", 2.0)
+    coin, start = exchange.balances["PI"], bot.trailing.init_tracking_point
+    client.place_order = rejected
+
+    async def run():
+        risk = engine(bot, max_drawdown=0.02, daily_loss=0, retry_after=60)
+        return risk, [await tick(risk, exchange, price) for price in (1.9, 1.89, 1.88)]
+
+    risk, reasons = asyncio.run(run())
+    assert reasons == [DRAWDOWN, None, None]     # backing off, not firing every tick
+    assert exchange.balances["PI"] == coin
+    assert bot.position.state == OPEN and bot.active_position == "long"
+    assert bot.loss_limit == 0
+    assert bot.trailing.init_tracking_point == start
+    assert bot.pending is None
+
+
+def test_drawdown_exit_is_retried_after_the_backoff(bot, client, exchange):
+    place = client.place_order
+    client.place_order = rejected
+
+    async def run():
+        risk = engine(bot, max_drawdown=0.02, daily_loss=0, retry_after=0.05)
+        first = await tick(risk, exchange, 1.9)
+        client.place_order = place
+        waiting = await tick(risk, exchange, 1.9)
+        await asyncio.sleep(0.06)
+        return risk, [first, waiting, await tick(risk, exchange, 1.9)]
+
+    risk, reasons = asyncio.run(run())
+    assert reasons == [DRAWDOWN, None, DRAWDOWN]
+    assert exchange.balances["PI"] == 0
+    assert bot.loss_limit == 1
+
+
+def test_daily_loss_fires_once_and_halts_entries(bot, client, exchange):
+    client.place_order = rejected       # the sale leaves the coin where it is
+
+    async def run():
+        risk = engine(bot, max_drawdown=0, daily_loss=0.03, retry_after=60)
+        return risk, [await tick(risk, exchange, price) for price in (1.85, 1.84, 1.83, 1.82, 1.81)]
+
+    risk, reasons = asyncio.run(run())
+    assert reasons == [DAILY_LOSS, None, None, None, None]
+    assert risk.breaches[DAILY_LOSS] == 1
+    assert risk.halted
+    assert not risk.allows_entry(SYMBOL, "long") and not risk.allows_entry(SYMBOL, "short")
+
+
+def test_dust_is_not_sold(bot, exchange):
+    exchange.balances["PI"] = 0.1                       # 0.2 USDT of coin
+    bot.portfolio.invalidate()
+
+    async def run():
+        risk = engine(bot, max_drawdown=0.0001, daily_loss=0)
+        return await tick(risk, exchange, 1.0)
+
+    assert asyncio.run(run()) is None
+    assert exchange.balances["PI"] == 0.1
+
+
+def test_exposure_limit_blocks_new_longs_only(bot):
+    risk = engine(bot, max_exposure=0.4)                # half the account is in coin
+    assert not risk.allows_entry(SYMBOL, "long")
+    assert risk.allows_entry(SYMBOL, "short")
+    assert engine(bot, max_exposure=0.9).allows_entry(SYMBOL, "long")
@@ -0,0 +1,103 @@
+import asyncio
+
+from signals import Signal, SignalInbox, SignalPoller
+
+PAYLOAD = {"pair": "pi-usdt", "signal": "long-divergence", "price": "2.0", "tp": 0.01, "ts": 1}
+
+
+def test_a_signal_is_parsed_once():
+    signal = Signal.from_payload(dict(PAYLOAD, id=7))
+    assert (signal.id, signal.pair, signal.signal, signal.price) == ("7", "PI-USDT", "long", 2.0)
+    assert signal.sl is None
+
+
+def test_the_same_signal_is_counted_once():
+    inbox = SignalInbox()
+    seen = []
+    inbox.listeners.append(seen.append)
+    first = inbox.ingest(PAYLOAD)
+    # No id: the content is the id, and the delivery timestamp is not content
+    assert inbox.ingest(dict(PAYLOAD, ts=2)) is None
+    assert inbox.ingest(first) is None
+    other = inbox.ingest(dict(PAYLOAD, signal="short-divergence"))
+    assert seen == [first, other] and inbox.latest is other
+
+
+def test_dedupe_forgets_the_oldest_ids():
+    inbox = SignalInbox(dedupe_size=2)
+    for signal_id in ("a", "b", "c"):
+        inbox.ingest(dict(PAYLOAD, id=signal_id))
+    assert inbox.ingest(dict(PAYLOAD, id="c")) is None
+    assert inbox.ingest(dict(PAYLOAD, id="a")) is not None
+
+
+def test_wait_returns_as_soon_as_a_signal_arrives():
+    async def run():
+        inbox = SignalInbox()
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.01, inbox.ingest, PAYLOAD)
+        started = loop.time()
+        await inbox.wait(5)
+        return loop.time() - started
+    assert asyncio.run(run()) < 1
+
+
+class Response:
+    def __init__(self, status_code, body=None, etag=None):
+        self.status_code = status_code
+        self.headers = {"ETag": etag} if etag else {}
+        self.body = body
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+class Session:
+    # The signal server: answers from `responses` and records each request's headers
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    async def get(self, url, headers, timeout):
+        self.sent.append(dict(headers))
+        return self.responses.pop(0)
+
+
+def test_poller_revalidates_with_the_last_etag():
+    session = Session(Response(200, PAYLOAD, etag='"v1"'), Response(304), Response(200, dict(PAYLOAD, id=2), etag='"v2"'))
+    poller = SignalPoller(SignalInbox(), session, url="http://signals", wait=25)
+
+    async def run():
+        return [await poller.poll() for _ in range(3)]
+    first, unchanged, second = asyncio.run(run())
+    assert first.signal == "long" and unchanged is None and second.id == "2"
+    assert session.sent == [{"Prefer": "wait=25"},
+                            {"Prefer": "wait=25", "If-None-Match": '"v1"'},
+                            {"Prefer": "wait=25", "If-None-Match": '"v1"'}]
+    assert poller.etag == '"v2"'
+
+
+def test_plain_polls_send_no_prefer_header():
+    session = Session(Response(200, PAYLOAD))
+    poller = SignalPoller(SignalInbox(), session, url="http://signals", wait=0)
+    asyncio.run(poller.poll())
+    assert session.sent == [{}] and poller.etag is None
+
+
+def test_webhook_dedupes_against_the_poller(app, monkeypatch):
+    from fastapi.testclient import TestClient
+    monkeypatch.setattr(app, "inbox", SignalInbox())
+    monkeypatch.setattr(app, "SIGNAL_WEBHOOK_TOKEN", "secret")
+    app.inbox.ingest(dict(PAYLOAD, id="x"))
+    http = TestClient(app.app)
+
+    assert http.post("/api/signal", json=dict(PAYLOAD, id="y")).status_code == 401
+    assert http.post("/api/signal", json=dict(PAYLOAD, id="x"), headers={"X-Signal-Token": "secret"}).json() == \
+        {"accepted": False, "reason": "duplicate"}
+    pushed = http.post("/api/signal", json=dict(PAYLOAD, id="y"), headers={"X-Signal-Token": "secret"})
+    assert pushed.json() == {"accepted": True, "id": "y"} and app.inbox.latest.id == "y"
+    assert http.post("/api/signal", content=b"not json", headers={"X-Signal-Token": "secret"}).status_code == 400
@@ -0,0 +1,129 @@
+import pytest
+
+from simulator import SimulatedExchange, create_app, TAKER_FEE, MAKER_FEE
+
+SYMBOL = "PI-USDT"
+
+
+@pytest.fixture
+def exchange():
+    # A thin book, so market orders walk more than one level
+    return SimulatedExchange({"USDT": 1000.0, "PI": 500.0}, {SYMBOL: 2.0}, spread=0.001, depth=5, level_size=100)
+
+
+def order(exchange, side, sz, ord_type="market", px=None, cl_ord_id=""):
+    body = {"instId": SYMBOL, "side": side, "ordType": ord_type, "sz": str(sz), "clOrdId": cl_ord_id}
+    if px is not None:
+        body["px"] = str(px)
+    response = exchange.place_order(body)
+    return response, exchange.find_order(response["data"][0]["ordId"] or None)
+
+
+def test_market_sell_walks_the_book(exchange):
+    bids, _ = exchange.book(SYMBOL)
+    response, placed = order(exchange, "sell", 150)
+    assert response["code"] == "0" and placed["state"] == "filled"
+    assert [float(fill["fillPx"]) for fill in exchange.fills] == [bids[0][0], bids[1][0]]
+    vwap = (bids[0][0] * 100 + bids[1][0] * 50) / 150
+    assert float(placed["avgPx"]) == pytest.approx(vwap)
+    assert exchange.balances["PI"] == pytest.approx(350)
+    assert exchange.balances["USDT"] == pytest.approx(1000 + 150 * vwap * (1 - TAKER_FEE))
+
+
+def test_market_buy_is_sized_in_cash(exchange):
+    _, placed = order(exchange, "buy", 100)
+    assert placed["state"] == "filled" and placed["tgtCcy"] == "quote_ccy"
+    assert exchange.balances["USDT"] == pytest.approx(900)
+    assert exchange.balances["PI"] == pytest.approx(500 + float(placed["accFillSz"]) * (1 - TAKER_FEE))
+
+
+def test_limit_rests_frozen_until_the_price_crosses_it(exchange):
+    _, placed = order(exchange, "buy", 50, "limit", px=1.9)
+    assert placed["state"] == "live" and exchange.available("USDT") == pytest.approx(1000 - 95)
+    exchange.set_price(SYMBOL, 1.95)
+    assert placed["state"] == "live"
+    exchange.set_price(SYMBOL, 1.89)
+    assert placed["state"] == "filled" and float(placed["avgPx"]) == 1.9
+    assert exchange.fills[-1]["execType"] == "M"
+    assert exchange.available("USDT") == pytest.approx(905)
+    assert exchange.balances["PI"] == pytest.approx(500 + 50 * (1 - MAKER_FEE))
+
+
+def test_post_only_that_would_take_is_rejected(exchange):
+    response, _ = order(exchange, "sell", 10, "post_only", px=1.9, cl_ord_id="po1")
+    assert response["data"][0]["sCode"] == "51124" and not exchange.fills
+    response, placed = order(exchange, "sell", 10, "post_only", px=2.1, cl_ord_id="po2")
+    assert response["code"] == "0" and placed["state"] == "live"
+
+
+def test_cancel_releases_the_frozen_balance(exchange):
+    _, placed = order(exchange, "sell", 40, "limit", px=2.5)
+    assert exchange.available("PI") == pytest.approx(460)
+    assert exchange.cancel_order({"instId": SYMBOL, "ordId": placed["ordId"]})["code"] == "0"
+    assert placed["state"] == "canceled" and exchange.available("PI") == pytest.approx(500)
+    again = exchange.cancel_order({"instId": SYMBOL, "ordId": placed["ordId"]})
+    assert again["data"][0]["sCode"] == "51400"
+
+
+def test_rejects(exchange):
+    order(exchange, "sell", 1, cl_ord_id="dup")
+    assert order(exchange, "sell", 1, cl_ord_id="dup")[0]["data"][0]["sCode"] == "51016"
+    assert order(exchange, "sell", 501)[0]["data"][0]["sCode"] == "51008"
+    assert order(exchange, "buy", 2000)[0]["data"][0]["sCode"] == "51008"
+
+
+def test_partial_fill_fault_leaves_a_taker_order_canceled(exchange):
+    exchange.partial_fill_rate, exchange.partial_fill_ratio = 1.0, 0.4
+    _, placed = order(exchange, "sell", 100)
+    assert placed["state"] == "canceled" and float(placed["accFillSz"]) == pytest.approx(40)
+
+
+def test_batch_reports_partial_acceptance(exchange):
+    bodies = [{"instId": SYMBOL, "side": "sell", "sz": "1", "clOrdId": "a"},
+              {"instId": SYMBOL, "side": "sell", "sz": "1", "clOrdId": "a"}]
+    response = exchange.batch(exchange.place_order, bodies)
+    assert response["code"] == "2" and [item["sCode"] for item in response["data"]] == ["0", "51016"]
+
+
+def test_seeded_runs_are_reproducible():
+    def run():
+        exchange = SimulatedExchange({"USDT": 1000.0, "PI": 500.0}, {SYMBOL: 2.0}, seed=3)
+        exchange.partial_fill_rate = 0.5
+        return [order(exchange, "sell", 10)[1]["state"] for _ in range(8)]
+    assert run() == run()
+
+
+def test_rest_and_websockets(exchange):
+    from fastapi.testclient import TestClient
+    with TestClient(create_app(exchange)) as http:
+        assert http.get("/api/v5/market/ticker", params={"instId": SYMBOL}).json()["data"][0]["last"] == "2.0"
+        placed = http.post("/api/v5/trade/order", json={"instId": SYMBOL, "side": "sell", "ordType": "market",
+                                                        "sz": "5", "clOrdId": "rest1"}).json()
+        assert placed["code"] == "0"
+        fetched = http.get("/api/v5/trade/order", params={"instId": SYMBOL, "clOrdId": "rest1"}).json()
+        assert fetched["data"][0]["state"] == "filled"
+        fills = http.get("/api/v5/trade/fills", params={"instId": SYMBOL, "begin": fetched["data"][0]["uTime"]}).json()
+        assert [fill["clOrdId"] for fill in fills["data"]] == ["rest1"]
+
+        with http.websocket_connect("/ws/v5/public") as ws:
+            ws.send_json({"op": "subscribe", "args": [{"channel": "tickers", "instId": SYMBOL}]})
+            assert ws.receive_json()["event"] == "subscribe"
+            exchange.set_price(SYMBOL, 2.2)
+            assert ws.receive_json()["data"][0]["last"] == "2.2"
+
+        with http.websocket_connect("/ws/v5/private") as ws:
+            ws.send_json({"op": "login", "args": [{}]})
+            assert ws.receive_json()["code"] == "0"
+            ws.send_json({"op": "subscribe", "args": [{"channel": "orders", "instType": "SPOT"}]})
+            assert ws.receive_json()["event"] == "subscribe"
+            exchange.place_order({"instId": SYMBOL, "side": "sell", "sz": "1", "clOrdId": "ws1"})
+            assert ws.receive_json()["data"][0]["clOrdId"] == "ws1"
+
+
+def test_private_rest_checks_the_signature():
+    from fastapi.testclient import TestClient
+    exchange = SimulatedExchange(api_key="k", api_secret="s", passphrase="p")
+    with TestClient(create_app(exchange)) as http:
+        assert http.get("/api/v5/market/ticker", params={"instId": SYMBOL}).status_code == 200
+        response = http.get("/api/v5/account/balance", headers={"OK-ACCESS-KEY": "k", "OK-ACCESS-PASSPHRASE": "p"})
+        assert response.status_code == 401 and response.json()["code"] == "50113"
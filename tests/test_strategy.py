@@ -0,0 +1,84 @@
+import pytest
+
+from strategy import PositionState, IDLE, OPEN, TP_ARMED, TRAILING, CLOSED, DCA, EXIT, DCA_AND_CLOSE
+from trading import TradingBot
+
+SYMBOL = "PI-USDT"
+
+
+def position(side, price=100.0):
+    state = PositionState(trail_trigger=0.005, trail_buffer=0.002)
+    state.open(side, price, tp_threshold=0.01, sl_threshold=-0.02, dca_target=97.0 if side == "long" else 103.0)
+    return state
+
+
+def walk(state, prices):
+    return [(state.on_price(price), state.state) for price in prices]
+
+
+def test_long_arms_trails_and_exits_once():
+    state = position("long")
+    assert walk(state, [100.5, 101.0]) == [(None, OPEN), (None, TP_ARMED)]
+    assert state.trailing_tp == pytest.approx(101.0 * 0.998)
+    assert walk(state, [101.6, 101.5]) == [(None, TRAILING), (None, TRAILING)]
+    assert state.trailing_tp == pytest.approx(101.6 * 0.995)      # never lowered by the dip
+    assert walk(state, [101.05, 101.05, 101.2]) == [(EXIT, CLOSED), (None, CLOSED), (None, CLOSED)]
+
+
+def test_short_mirrors_the_long():
+    state = position("short")
+    assert walk(state, [99.0, 98.4]) == [(None, TP_ARMED), (None, TRAILING)]
+    assert state.trailing_tp == pytest.approx(98.4 * 1.005)
+    assert walk(state, [98.95]) == [(EXIT, CLOSED)]
+
+
+def test_dca_fires_past_the_sl_and_the_dca_target():
+    state = position("long")
+    assert walk(state, [97.9, 96.9, 96.0]) == [(None, OPEN), (DCA_AND_CLOSE, DCA), (None, DCA)]
+
+
+def test_idle_position_ignores_prices():
+    state = PositionState()
+    assert state.on_price(1.0) is None and state.state == IDLE
+
+
+@pytest.fixture
+def bot(client):
+    bot = TradingBot(SYMBOL, exchange=client).warm()
+    bot.open_position("long", 2.0)
+    bot.position.open("long", 2.0, 0.01, -0.02, 1.9)    # thresholds the test can reach
+    return bot
+
+
+def ticks(bot, exchange, prices):
+    actions = []
+    for price in prices:
+        exchange.set_price(SYMBOL, price)
+        actions.append(bot.check_tp_sl(price))
+    return actions
+
+
+def test_a_tick_through_the_locked_tp_closes_the_position(bot, exchange):
+    coin = exchange.balances["PI"]
+    assert ticks(bot, exchange, [2.021, 2.04, 2.021]) == [None, None, EXIT]
+    assert bot.position.state == IDLE and bot.tp_count == 1
+    assert exchange.balances["PI"] < coin
+    assert bot.pending is None
+
+
+def test_an_exit_that_raises_puts_the_position_back(bot, exchange):
+    ticks(bot, exchange, [2.021, 2.04])
+    assert bot.position.state == TRAILING
+
+    def broken(side):
+        raise ConnectionError("socket closed")
+
+    bot.close_position = broken
+    with pytest.raises(ConnectionError):
+        ticks(bot, exchange, [2.021])
+    assert bot.position.state == TRAILING
+
+
+def test_no_price_is_no_decision(bot):
+    assert bot.check_tp_sl(None) is None
+    assert bot.position.state == OPEN
@@ -0,0 +1,57 @@
+import json
+
+import numpy as np
+
+from backtest import Backtest
+from sweep import Sweep, grid_candidates, random_candidates, tpe_candidates
+
+SPACE = {"order_percent": [0.02, 0.05], "tp_default": [0.003, 0.008]}
+
+
+def market(n=3000):
+    rng = np.random.default_rng(7)
+    ts = np.arange(n, dtype=np.int64) * 1000 + 1_700_000_000_000
+    prices = 0.5 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    signal_ts = ts[[100, 1200, 2400]]
+    signals = [{"ts": int(t), "signal": kind, "pair": "PI-USDT", "price": float(prices[i]), "tp": 0.004,
+                "sl": 0.003, "dca_trigger": float(prices[i]) * 0.98}
+               for t, i, kind in zip(signal_ts, (100, 1200, 2400), ("long", "short", "long"))]
+    return ts, prices, signal_ts, signals
+
+
+def test_grid_covers_every_combination():
+    assert list(grid_candidates({"b": [1, 2], "a": [3]})) == [{"a": 3, "b": 1}, {"a": 3, "b": 2}]
+
+
+def test_parallel_runs_match_a_single_backtest_and_resume(tmp_path):
+    data = market()
+    path = str(tmp_path / "results.jsonl")
+    candidates = list(grid_candidates(SPACE))
+    sweep = Sweep(*data, path, workers=2, usdt=1000.0, pi=500.0)
+    assert sweep.run(candidates) == len(candidates)
+
+    for params in candidates[:2]:
+        expected = Backtest(*data, usdt=1000.0, pi=500.0, params=params).run()
+        assert sweep.done[json.dumps(params, sort_keys=True)][1] == expected
+    ranked = sweep.ranked()
+    assert [row["rank"] for row in ranked] == [1, 2, 3, 4]
+    assert [row["pnl"] for row in ranked] == sorted((row["pnl"] for row in ranked), reverse=True)
+
+    # A second sweep over the same file only runs what is missing
+    resumed = Sweep(*data, path, workers=2, usdt=1000.0, pi=500.0)
+    assert len(resumed.done) == len(candidates)
+    assert resumed.run(candidates + [{"order_percent": 0.03, "tp_default": 0.005}]) == 1
+    with open(path) as f:
+        assert len(f.readlines()) == len(candidates) + 1
+
+
+def test_tpe_proposals_stay_in_bounds():
+    history = [(params, {"pnl_percent": params["order_percent"] * 100})
+               for params in random_candidates(SPACE, 16, seed=1)]
+    proposals = tpe_candidates(SPACE, history, 8, np.random.default_rng(0))
+    assert len(proposals) == 8
+    for params in proposals:
+        for name, (low, high) in SPACE.items():
+            assert low <= params[name] <= high
+    # The best runs had the largest order_percent, so that is where TPE looks
+    assert np.mean([params["order_percent"] for params in proposals]) > np.mean(SPACE["order_percent"])
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from signals import Signal
+from tape import TapeRecorder, Tape, Replay, TICK, SIGNAL, ORDER, HOUR_MS, RECORD
+
+SYMBOL = "PI-USDT"
+START = 1_700_000_000_000 - 1_700_000_000_000 % HOUR_MS
+
+
+@pytest.fixture
+def recorded(tmp_path):
+    # Three hours of ticks a minute apart, with one signal and one order response in the middle
+    recorder = TapeRecorder(str(tmp_path / "tape"), [SYMBOL], flush_every=1000)
+    for i in range(180):
+        price = 2.0 + 0.001 * i
+        recorder.tick(SYMBOL, price, price - 0.001, price + 0.001, START + i * 60_000)
+        if i == 90:
+            recorder._append(SIGNAL, SYMBOL, START + i * 60_000, 2.09, payload={"id": "s1", "signal": "long"})
+            recorder._append(ORDER, SYMBOL, START + i * 60_000, None, payload={"response": {"code": "0"}})
+    recorder.close()
+    return str(tmp_path / "tape")
+
+
+def test_records_read_back(recorded):
+    tape = Tape(recorded)
+    assert len(tape) == 182
+    assert tape.span() == (START, START + 179 * 60_000)
+    rows = list(tape.read())
+    kind, symbol, ts, price, bid, ask, payload = rows[0]
+    assert (kind, symbol, ts, price, payload) == (TICK, SYMBOL, START, 2.0, None)
+    assert bid == pytest.approx(1.999, abs=1e-7) and ask == pytest.approx(2.001, abs=1e-7)
+    assert [row[6] for row in rows if row[0] != TICK] == [{"id": "s1", "signal": "long"}, {"response": {"code": "0"}}]
+    assert [row[0] for row in rows[91:93]] == [SIGNAL, ORDER]
+    assert rows[92][3] is None              # an order response without a px has no price
+
+
+def test_seek_lands_on_the_first_record_at_or_after(recorded):
+    tape = Tape(recorded)
+    assert len(tape.hours) == 3
+    assert tape.seek(START - 1) == 0
+    assert tape.seek(START + 60 * 60_000) == 60            # the second hour's first record
+    assert tape.seek(START + 90 * 60_000 + 1) == 93        # past the tick, signal and order at minute 90
+    assert tape.seek(START + 10 * HOUR_MS) == len(tape)
+    window = list(tape.read(START + 100 * 60_000, START + 110 * 60_000))
+    assert [row[2] for row in window] == [START + i * 60_000 for i in range(100, 110)]
+    assert list(tape.read(symbol="BTC-USDT")) == []
+
+
+def test_timestamps_never_go_backwards(tmp_path):
+    recorder = TapeRecorder(str(tmp_path / "tape"), [SYMBOL])
+    for ts in (1000, 3000, 2000, 4000):
+        recorder.tick(SYMBOL, 2.0, None, None, ts)
+    recorder.close()
+    assert [row[2] for row in Tape(str(tmp_path / "tape")).read()] == [1000, 3000, 3000, 4000]
+
+
+def test_torn_last_record_is_ignored(recorded):
+    with open(os.path.join(recorded, "records.bin"), "ab") as f:
+        f.write(b"\x01" * (RECORD.itemsize // 2))
+    assert len(Tape(recorded)) == 182
+
+
+def test_replay_is_deterministic(tmp_path):
+    recorder = TapeRecorder(str(tmp_path / "tape"), [SYMBOL])
+    prices = [2.0] * 5 + [2.0 + 0.01 * i for i in range(1, 60)] + [2.6 - 0.02 * i for i in range(40)]
+    for i, price in enumerate(prices):
+        recorder.tick(SYMBOL, price, price * 0.999, price * 1.001, START + i * 1000)
+        if i == 3:
+            recorder.signal(Signal(id="s1", pair=SYMBOL, signal="long", price=2.0))
+    recorder.close()
+
+    results = []
+    for _ in range(2):
+        replay = Replay(Tape(str(tmp_path / "tape")), balances={"USDT": 1000})
+        results.append((replay.run(), replay.actions))
+    assert results[0] == results[1]
+    summary, actions = results[0]
+    assert summary["ticks"] == len(prices) and summary["signals"] == 1
+    assert summary["bots"][SYMBOL]["fills"] > 0
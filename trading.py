@@ -1,90 +1,362 @@
+import math
 import time
+import functools
+import threading
 from client import OKXClient
+from execution import ExecutionEngine, OrderStream, new_cl_ord_id, UNKNOWN, FILLED, REJECTED, MARKET, TWAP
+from order_book import BookFeed
+from portfolio import PortfolioSnapshot, symbol_currencies
+from strategy import PositionState, PortfolioTrailing, EXIT, DCA_AND_CLOSE, CLOSED, DCA
+from metrics import TRIGGER_TO_ORDER, TRIGGER_TO_EXIT, SIGNAL_TO_ORDER
+from signals import normalize_signal
+from ratelimit import request_lane, RISK
 from datetime import datetime, timezone
 
 from config import (
-    SIGNAL_SERVER_URL, SYMBOL, BASE_CURRENCY, QUOTE_CURRENCY,
-    ORDER_PERCENT, DCA_PERCENT, TRAIL_TRIGGER, TRAIL_BUFFER,
-    LONG_THRESHOLD, SHORT_THRESHOLD
+    SYMBOL, SYMBOLS,
+    ORDER_PERCENT, DCA_PERCENT,
+    LONG_THRESHOLD, SHORT_THRESHOLD,
+    TRAIL_TRIGGER, TRAIL_BUFFER,
+    PORTFOLIO_TRAIL_ACTIVATE, PORTFOLIO_TRAIL_GIVEBACK,
+    ORDER_TYPE, EXIT_SLICES, EXIT_SLICE_STYLE, SLIPPAGE_BUDGET
 )
 
 from config import TP_DEFAULT, SL_DEFAULT
 
-client = OKXClient()
+# Strategy knobs a TradingBot can override per instance (backtests, sweeps)
+DEFAULT_PARAMS = {
+    "order_percent": ORDER_PERCENT,
+    "dca_percent": DCA_PERCENT,
+    "long_threshold": LONG_THRESHOLD,
+    "short_threshold": SHORT_THRESHOLD,
+    "tp_default": TP_DEFAULT,
+    "trail_trigger": TRAIL_TRIGGER,
+    "trail_buffer": TRAIL_BUFFER,
+    "portfolio_trail_activate": PORTFOLIO_TRAIL_ACTIVATE,
+    "portfolio_trail_giveback": PORTFOLIO_TRAIL_GIVEBACK,
+    "order_type": ORDER_TYPE,
+    "exit_slices": EXIT_SLICES,
+    "exit_style": EXIT_SLICE_STYLE,
+    "slippage_budget": SLIPPAGE_BUDGET,
+}
+
+# Live exchange plumbing is built on first use, never at import, and shared
+# by every live bot; backtests and benchmarks inject their own exchange.
+@functools.cache
+def live_client():
+    return OKXClient()
+
+
+@functools.cache
+def live_portfolio():
+    return PortfolioSnapshot(live_client(), symbols=SYMBOLS)
+
+
+@functools.cache
+def live_orders():
+    # Fills for every live bot's orders arrive on this stream (main.py runs it)
+    return OrderStream(live_client())
+
+
+@functools.cache
+def live_execution():
+    return ExecutionEngine(live_client(), live_orders())
+
+
+@functools.cache
+def live_books():
+    # L2 books for depth-aware sizing (main.py runs the feed)
+    return BookFeed(SYMBOLS)
+
+
+def serialized(method):
+    # One order path at a time per bot: tick exits, risk exits and entries all move the same position
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.order_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 
 class TradingBot:
-    def __init__(self):
-        self.active_position = None
-        self.entry_price = None
-        self.trailing_tp = None
+    def __init__(self, symbol=SYMBOL, exchange=None, snapshot=None, params=None, journal=None, book=None, ledger=None):
+        self.symbol = symbol.upper()
+        self.coin = symbol_currencies(self.symbol)[0]
+
+        # Defaults to the shared live client; backtests inject a simulated one.
+        # Nothing here talks to the exchange: warm() does, once the caller is ready.
+        self.client = exchange or live_client()
+        if snapshot is None:
+            snapshot = live_portfolio() if exchange is None else PortfolioSnapshot(exchange, symbols=[self.symbol])
+        self.portfolio = snapshot
+        self.execution = live_execution() if exchange is None else ExecutionEngine(exchange, record_latency=False)
+        # Latency histograms describe the live bots only; paper and backtest bots leave them alone
+        self.record_latency = exchange is None
+        # No book (backtests, injected exchanges) means orders are never capped or sliced for depth
+        self.book = book if book is not None or exchange is not None else live_books().books.get(self.symbol)
+        self.params = dict(DEFAULT_PARAMS, **(params or {}))
+        # Optional ledger.TradeLedger; every order is registered with it so its fills land on the right trade
+        self.ledger = ledger
+
+        self.position = PositionState(self.params["trail_trigger"], self.params["trail_buffer"])
+        self.triggered_at = None
+        self.trigger_price = None   # price of the tick that fired the pending exit
         self.chart_position = None
         self.open_timestamp = None
-        self.tp_target = None
         self.tp_count = 0
         self.dca_count = 0
         self.profit_capture = 0
         self.loss_limit = 0
-
-        self.initial_portfolio_value = self.get_portfolio_value()[0]  # permanent for display
-        self.init_tracking_point = self.initial_portfolio_value       # updated on each force sell
-        self.tracking_trigger = self.init_tracking_point
-        self.tracking_active = False
+        self.pending = None     # order in flight: {"action", "side", "at", ...}
+        self.order_lock = threading.RLock()
+        self.timed_signal = None    # id of the last signal whose signal-to-order latency was recorded
+
+        # A journaled bot restores from disk; a fresh one reads its start value in warm()
+        self.journal = journal
+        saved = journal.load() if journal is not None else None
+        self.initial_portfolio_value = saved["initial_portfolio_value"] if saved else None  # permanent for display
+        self.trailing = PortfolioTrailing(
+            self.initial_portfolio_value,
+            self.params["portfolio_trail_activate"],
+            self.params["portfolio_trail_giveback"],
+        )
         self.shrinking_active = False
 
-        self.tp_threshold = TP_DEFAULT
+        self.tp_threshold = self.params["tp_default"]
         self.sl_threshold = SL_DEFAULT
         self.dca_target = 0
 
-    def fetch_signal(self):
-        try:
-            res = client.session.get(SIGNAL_SERVER_URL)
-            if res.status_code == 200:
-                return res.json()  # Return full JSON dict, not just signal string
-        except Exception as e:
-            print(f"[ERROR] Failed to fetch signal: {e}")
-        return None
+        if saved is not None:
+            self.restore(saved)
+            print(f"[RESTORE] {self.symbol} state restored: {self.position.state} {self.active_position or ''}")
+
+    # Position fields live in the state machine; these keep the old attribute names readable
+    @property
+    def active_position(self):
+        return self.position.side
+
+    @property
+    def entry_price(self):
+        return self.position.entry_price
+
+    @property
+    def trailing_tp(self):
+        return self.position.trailing_tp
+
+    @property
+    def tp_target(self):
+        return self.position.tp_target
+
+    # Portfolio trailing state, shared with check_portfolio_shrink
+    @property
+    def init_tracking_point(self):
+        return self.trailing.init_tracking_point
+
+    @init_tracking_point.setter
+    def init_tracking_point(self, value):
+        self.trailing.init_tracking_point = value
+
+    @property
+    def tracking_trigger(self):
+        return self.trailing.tracking_trigger
+
+    @tracking_trigger.setter
+    def tracking_trigger(self, value):
+        self.trailing.tracking_trigger = value
+
+    @property
+    def tracking_active(self):
+        return self.trailing.tracking_active
+
+    STATE_FIELDS = (
+        "initial_portfolio_value", "shrinking_active", "open_timestamp",
+        "tp_count", "dca_count", "profit_capture", "loss_limit",
+        "tp_threshold", "sl_threshold", "dca_target", "pending",
+    )
+
+    def state_dict(self):
+        state = {name: getattr(self, name) for name in self.STATE_FIELDS}
+        state["position"] = self.position.snapshot()
+        state["trailing"] = self.trailing.snapshot()
+        return state
+
+    def restore(self, state):
+        for name in self.STATE_FIELDS:
+            setattr(self, name, state[name])
+        self.position.restore(state["position"])
+        self.trailing.restore(state["trailing"])
+
+    def save_state(self, sync=False):
+        if self.journal is not None:
+            self.journal.record(self.state_dict(), sync)
+
+    def _begin_order(self, action, side, **details):
+        # Journaled (and fsynced) before the order leaves, so a crash mid-order
+        # leaves a record reconcile() can check against the exchange's fills.
+        # Returns the clOrdId the order must be sent with.
+        cl_ord_id = new_cl_ord_id()
+        self.pending = dict(action=action, side=side, at=int(time.time() * 1000), cl_ord_id=cl_ord_id, **details)
+        self.save_state(sync=True)
+        if self.ledger is not None:
+            self.ledger.expect(cl_ord_id, self.symbol, action, side)
+        return cl_ord_id
+
+    def _submit(self, side, amount, cl_ord_id):
+        return self.execution.submit(side, amount, self.symbol, self.params["order_type"], cl_ord_id)
+
+    def _submit_sliced(self, side, amount, cl_ord_id):
+        return self.execution.submit_sliced(side, amount, self.symbol, self.params["exit_slices"],
+                                            self.params["exit_style"], cl_ord_id)
+
+    def _submit_exit(self, side, amount, cl_ord_id, notional=None):
+        # An exit deeper than the book holds within the slippage budget is paced
+        # out as TWAP slices so the book can refill between them
+        capacity = self.depth_capacity(side) if notional is not None else None
+        if capacity and notional > capacity:
+            slices = max(math.ceil(notional / capacity), self.params["exit_slices"])
+            print(f"[DEPTH] {self.symbol} exit of {notional:.2f} USDT exceeds the {capacity:.2f} USDT "
+                  f"the book holds within budget; sending {slices} TWAP slices.")
+            return self.execution.submit_sliced(side, amount, self.symbol, slices, TWAP, cl_ord_id)
+        # A sliced exit goes out as child orders in one batch; a single one uses the bot's order type
+        if self.params["exit_slices"] > 1:
+            return self._submit_sliced(side, amount, cl_ord_id)
+        return self._submit(side, amount, cl_ord_id)
+
+    def _end_order(self):
+        self.pending = None
+        self.save_state(sync=True)
+
+    @request_lane(RISK)
+    def reconcile(self):
+        """Squares state restored from the journal with the exchange.
+
+        An order that was in flight at shutdown is looked up in the fills
+        since it was sent: an open that filled becomes the position (at its
+        average fill price), an exit that filled flattens it, and one that
+        never filled is dropped. A long with no coin left is dropped too.
+        """
+        pending = self.pending
+        if pending is not None:
+            order_side = "buy" if pending["side"] == "long" else "sell"
+            # Cleared only once the fills are read, so warm-up can retry a failed read
+            fills = self.client.get_fills(self.symbol, begin=pending["at"])
+            if fills is None:
+                raise ConnectionError(f"{self.symbol} fills could not be read")
+            self.pending = None
+            fills = [fill for fill in fills if fill.get("side") == order_side]
+            if pending.get("cl_ord_id"):
+                # Only this order and its market follow-up, not anything else traded since
+                fills = [fill for fill in fills if fill.get("clOrdId", "").startswith(pending["cl_ord_id"])]
+            if not fills:
+                print(f"[RESTORE] {self.symbol} {pending['action']} order never filled.")
+            elif pending["action"] == "open":
+                size = sum(float(fill["fillSz"]) for fill in fills)
+                price = sum(float(fill["fillPx"]) * float(fill["fillSz"]) for fill in fills) / size
+                self.open_timestamp = datetime.fromtimestamp(pending["at"] / 1000, timezone.utc).isoformat()
+                self.position.open(pending["side"], price, pending["tp_threshold"],
+                                   pending["sl_threshold"], pending["dca_target"])
+                print(f"[RESTORE] {self.symbol} {pending['side'].upper()} open filled at {price}.")
+            else:
+                self.position.reset()
+                self.open_timestamp = None
+                print(f"[RESTORE] {self.symbol} {pending['action']} order filled; position flat.")
+
+        if self.position.state in (CLOSED, DCA):
+            # The exit decision was made but its order never went out; decide again
+            # from the armed or trailing state it left, locked TP included
+            self.position.resume()
+
+        if self.active_position == "long" and self.get_portfolio_value()[2] <= 0:
+            print(f"[RESTORE] {self.symbol} long dropped: no {self.coin} left on the account.")
+            self.position.reset()
+            self.open_timestamp = None
+
+        self.save_state(sync=True)
+
+    def warm(self, snapshot=None):
+        # Reads the start value a fresh bot tracks growth from; `snapshot` is a
+        # (total, usdt, coin, price) tuple the caller already fetched
+        if self.initial_portfolio_value is None:
+            snapshot = snapshot or self.get_portfolio_value()
+            self.initial_portfolio_value = snapshot[0]
+            self.trailing.rebase(self.account_value(snapshot))
+        return self
 
     def get_portfolio_value(self):
-        pi = client.get_balance(QUOTE_CURRENCY)
-        usdt = client.get_balance(BASE_CURRENCY)
-        price = client.get_price()
-        return usdt + (pi * price), usdt, pi, price
-
-    def calculate_amount(self, percent, price):
-        portfolio_value, _, _, _ = self.get_portfolio_value()
+        return self.portfolio.get(self.symbol)
+
+    def account_value(self, snapshot=None):
+        # Portfolio trailing follows the whole account, so pairs sharing it all see the same value
+        return self.portfolio.account_value(snapshot or self.get_portfolio_value(), self.symbol)
+
+    def exit_snapshot(self, price):
+        # Cached balances revalued at the trigger price: exits are sized without a round trip
+        return self.portfolio.reprice(self.symbol, price) or self.get_portfolio_value()
+
+    def depth_capacity(self, side):
+        # USDT a `side` market order can take within the slippage budget; None without a live book
+        budget = self.params["slippage_budget"]
+        if not budget or self.book is None or not self.book.fresh():
+            return None
+        return self.book.capacity(side, budget)[1]
+
+    def calculate_amount(self, percent, price, portfolio_value=None, side=None):
+        # With a side, the size is capped to what the book holds within the slippage budget
+        if portfolio_value is None:
+            portfolio_value, _, _, _ = self.get_portfolio_value()
         usdt_value = portfolio_value * percent
+        capacity = self.depth_capacity(side) if side is not None else None
+        if capacity is not None and usdt_value > capacity:
+            print(f"[DEPTH] {self.symbol} {side} order capped from {usdt_value:.2f} to {capacity:.2f} USDT "
+                  f"({self.params['slippage_budget']:.2%} slippage budget).")
+            usdt_value = capacity
         return usdt_value / price
 
-    def force_sell_all(self):
-        _, _, pi_balance, _ = self.get_portfolio_value()
+    def force_sell_all(self, pi_balance=None):
+        # Sized from the balance the caller just read. Resting orders are pulled
+        # first; the coin they locked is only counted after a fresh read.
+        # Returns the sale's Execution, or None when there was no coin to sell
+        if self.execution.cancel_all(self.symbol) or pi_balance is None:
+            _, _, pi_balance, _ = self.get_portfolio_value()
         if pi_balance > 0:
-            result = client.place_order("short", pi_balance)
-            print(f"[FORCE SELL] Sold {pi_balance} PI to lock portfolio growth.")
-        else:
-            print("[FORCE SELL] No PI to sell.")
-
-    def check_portfolio_trailing(self):
-        current_value, _, pi_balance, _ = self.get_portfolio_value()
+            cl_ord_id = self._begin_order("force", "short")
+            # Risk exits never rest on the book: market, or IOC slices when configured
+            report = self._submit_sliced("short", pi_balance, cl_ord_id)
+            report = self._fill_rest(report, "short", pi_balance, cl_ord_id)
+            if report.ok:
+                print(f"[FORCE SELL] Sold {report.filled} {self.coin} at {report.avg_px} to lock portfolio growth.")
+            else:
+                print(f"[ERROR] Force sell failed: {report.msg or report.state}")
+            return report
+        print(f"[FORCE SELL] No {self.coin} to sell.")
+        return None
 
-        if not self.tracking_active and current_value > self.init_tracking_point * 1.005:
-            self.tracking_active = True
-            print("[TRAILING] Growth threshold reached. Tracking activated.")
+    def _force_exit_done(self, report):
+        # A force sell that left coin unsold keeps the position (and the trailing
+        # baseline) as they were, so the limit that fired is checked again
+        return report is None or self._exit_done(report, "force sell")
 
-        if self.tracking_active and current_value > self.init_tracking_point:
-            self.init_tracking_point = current_value
-            self.tracking_trigger = self.init_tracking_point * 0.999
+    @request_lane(RISK)
+    @serialized
+    def check_portfolio_trailing(self):
+        snapshot = self.get_portfolio_value()
+        current_value, pi_balance = self.account_value(snapshot), snapshot[2]
 
-        if self.tracking_active and current_value < self.tracking_trigger and pi_balance > 0:
+        if self.trailing.on_value(current_value, pi_balance):
             print("[TRAILING EXIT] Force sell triggered.")
-            self.force_sell_all()
+            if not self._force_exit_done(self.force_sell_all(pi_balance)):
+                return
             self.profit_capture += 1
-            self.init_tracking_point = self.get_portfolio_value()[0]
-            self.tracking_trigger = self.init_tracking_point
-            self.tracking_active = False
+            self.trailing.rebase(self.account_value())
             self.reset_session()
+        else:
+            self.save_state()
 
+    @request_lane(RISK)
+    @serialized
     def check_portfolio_shrink(self):
-        current_value, _, pi_balance, _ = self.get_portfolio_value()
+        snapshot = self.get_portfolio_value()
+        current_value, pi_balance = self.account_value(snapshot), snapshot[2]
 
         if not self.shrinking_active and current_value < self.init_tracking_point * 0.995:
             self.shrinking_active = True
@@ -93,89 +365,100 @@ class TradingBot:
 
         if self.shrinking_active and current_value <= self.tracking_trigger and pi_balance > 0:
             print("[SHRINK EXIT] Force sell triggered.")
-            self.force_sell_all()
+            if not self._force_exit_done(self.force_sell_all(pi_balance)):
+                return
             self.loss_limit += 1
-            self.init_tracking_point = self.get_portfolio_value()[0]
+            self.init_tracking_point = self.account_value()
             self.tracking_trigger = self.init_tracking_point
             self.shrinking_active = False
-            self.reset_session()    
+            self.reset_session()
+        else:
+            self.save_state()
+
+    @request_lane(RISK)
+    @serialized
+    def risk_exit(self, reason):
+        # Force sell ordered by the RiskEngine; a trailing stop counts as a profit
+        # capture, any other limit as a loss limit, and tracking restarts from what is left
+        print(f"[RISK EXIT] {self.symbol} {reason}: force sell triggered.")
+        if not self._force_exit_done(self.force_sell_all()):
+            return
+        if reason == "trailing":
+            self.profit_capture += 1
+        else:
+            self.loss_limit += 1
+        self.trailing.rebase(self.account_value())
+        self.shrinking_active = False
+        self.reset_session()
 
-    def open_position(self, signal, price):
+    @serialized
+    def open_position(self, signal, price, signal_data=None):
+        # signal_data: the signals.Signal that passed the caller's checks, used as-is
         portfolio_value, usdt, pi, _ = self.get_portfolio_value()
 
-        signal_data = self.fetch_signal()
-        
-        if signal_data:
-            signal_type = signal_data.get("signal")
-            signal_price = signal_data.get("price")
-            tp = signal_data.get("tp")
-            sl = signal_data.get("sl")
-            dca_target = signal_data.get("dca_trigger")
-        
-            print(f"Signal: {signal_type}, Entry: {signal_price}, TP: {tp}, SL: {sl}, DCA: {dca_target}")
-            signal = signal_type
-            self.tp_threshold = tp
-            self.sl_threshold = sl * -3
-            self.dca_target = dca_target
-        
+        if signal_data is not None:
+            print(f"Signal: {signal_data.signal}, Entry: {signal_data.price}, TP: {signal_data.tp}, "
+                  f"SL: {signal_data.sl}, DCA: {signal_data.dca_trigger}")
+            signal = signal_data.signal
+            self.tp_threshold = signal_data.tp if signal_data.tp is not None else self.params["tp_default"]
+            self.sl_threshold = signal_data.sl * -3 if signal_data.sl is not None else SL_DEFAULT
+            self.dca_target = signal_data.dca_trigger
+
         if signal == "long":
             TP_THRESHOLD = self.tp_threshold
             
-            if usdt < LONG_THRESHOLD * portfolio_value:
+            if usdt < self.params["long_threshold"] * portfolio_value:
                 print("Skipped trade, not enough USDT to buy")
                 return
-            amount = self.calculate_amount(ORDER_PERCENT, price)
-            result = client.place_order("long", amount)
-            if result.get("code") != "0":
-                print(f"[ERROR] LONG order failed: {result.get('msg', 'Unknown error')}")
+            amount = self.calculate_amount(self.params["order_percent"], price, side="long")
+            cl_ord_id = self._begin_order("open", "long", tp_threshold=TP_THRESHOLD,
+                                          sl_threshold=self.sl_threshold, dca_target=self.dca_target)
+            self._record_signal_latency(signal_data)
+            report = self._submit("long", amount, cl_ord_id)
+            if not report.ok:
+                print(f"[ERROR] LONG order failed: {report.msg or report.state}")
+                self._end_order()
                 return
-            self.active_position = "long"
-            self.entry_price = price
-            self.trailing_tp = price * (1 + TP_THRESHOLD)
-            self.tp_target = self.trailing_tp
+            # TP/DCA levels are measured from what was actually paid, not the signal's price
+            entry = report.avg_px or price
             self.open_timestamp = datetime.now(timezone.utc).isoformat()
-            print(f"[LONG] Opened at {price}")
-            time.sleep(15)
+            self.position.open("long", entry, TP_THRESHOLD, self.sl_threshold, self.dca_target)
+            self._end_order()
+            print(f"[LONG] Opened at {entry} ({report.filled} {self.coin} filled)")
 
         elif signal == "short":
             TP_THRESHOLD = self.tp_threshold
             
-            if pi * price < SHORT_THRESHOLD * portfolio_value:
-                print("Skipped trade, not enough PI to sell")
+            if pi * price < self.params["short_threshold"] * portfolio_value:
+                print(f"Skipped trade, not enough {self.coin} to sell")
                 return
-            quote_amount = self.calculate_amount(ORDER_PERCENT, price)
+            quote_amount = self.calculate_amount(self.params["order_percent"], price, side="short")
             amount = quote_amount / price  # convert to base amount
-            result = client.place_order("short", amount)
-            if result.get("code") != "0":
-                print(f"[ERROR] SHORT order failed: {result.get('msg', 'Unknown error')}")
+            cl_ord_id = self._begin_order("open", "short", tp_threshold=TP_THRESHOLD,
+                                          sl_threshold=self.sl_threshold, dca_target=self.dca_target)
+            self._record_signal_latency(signal_data)
+            report = self._submit("short", amount, cl_ord_id)
+            if not report.ok:
+                print(f"[ERROR] SHORT order failed: {report.msg or report.state}")
+                self._end_order()
                 return
-            self.active_position = "short"
-            self.entry_price = price
-            self.trailing_tp = price * (1 - TP_THRESHOLD)
-            self.tp_target = self.trailing_tp
+            # TP/DCA levels are measured from what was actually paid, not the signal's price
+            entry = report.avg_px or price
             self.open_timestamp = datetime.now(timezone.utc).isoformat()
-            print(f"[SHORT] Opened at {price}")
-            time.sleep(15)
+            self.position.open("short", entry, TP_THRESHOLD, self.sl_threshold, self.dca_target)
+            self._end_order()
+            print(f"[SHORT] Opened at {entry} ({report.filled} {self.coin} filled)")
 
-    def check_tp_sl(self, price):
-        TP_THRESHOLD = self.tp_threshold
-        SL_THRESHOLD = self.sl_threshold
-        
-        if not self.active_position or not self.entry_price:
-            return
-        
-        time.sleep(15)
-        change = (price - self.entry_price) / self.entry_price
-        if self.active_position == "short":
-            change = -change
+    def on_price(self, price, received=None):
+        """Feed one price update through the position state machine.
 
-        live_pnl = (price - self.entry_price) / self.entry_price
-        if self.active_position == "short":
-            live_pnl = -live_pnl
+        Cheap and free of I/O, so it can run on every tick; returns the action
+        (EXIT / DCA_AND_CLOSE) that execute() must carry out, or None.
+        """
+        if not self.position.active:
+            return None
 
-        #sl_target = self.entry_price * (1 + SL_THRESHOLD) if self.active_position == "long" else self.entry_price * (1 - SL_THRESHOLD)
-        sl_target = self.dca_target
-        
+        live_pnl = self.position.change(price)
         self.chart_position = {
             "side": self.active_position,
             "entry": self.entry_price,
@@ -185,80 +468,87 @@ class TradingBot:
             "live_pnl_percent": round(live_pnl * 100, 2),
             "tp_count": self.tp_count,
             "dca_count": self.dca_count,
-            "sl": sl_target,
+            "sl": self.position.dca_target,
             "profit_capture": self.profit_capture,
             "loss_limit": self.loss_limit
         }
 
-        locked_tp = self.trailing_tp
-
-        if change >= (TP_THRESHOLD + TRAIL_TRIGGER):
-            if self.active_position == "long":
-                self.trailing_tp = max(self.trailing_tp, price - TRAIL_TRIGGER * price)
-            else:
-                self.trailing_tp = min(self.trailing_tp, price + TRAIL_TRIGGER * price)
-            print(f"[TRAILING] Updated TP: {self.trailing_tp}")
-
-        elif change >= TP_THRESHOLD:
-            if self.active_position == "long":
-                self.trailing_tp = price * (1 - TRAIL_BUFFER)
-            else:
-                self.trailing_tp = price * (1 + TRAIL_BUFFER)
-            print(f"[TP HIT] Activated static TP: {self.trailing_tp}")
-
-        elif change <= SL_THRESHOLD:
-            if self.active_position == "long" and price <= sl_target:
-                self.dca_count += 1
-                self.dca_and_close()
-                return            
-    
-            elif self.active_position == "short" and price >= sl_target:
-                self.dca_count += 1
+        before = (self.position.state, self.position.trailing_tp)
+        action = self.position.on_price(price)
+        if action:
+            self.triggered_at = received if received is not None else time.perf_counter()
+            self.trigger_price = price
+        if (self.position.state, self.position.trailing_tp) != before:
+            self.save_state()
+        return action
+
+    @request_lane(RISK)
+    @serialized
+    def execute(self, action):
+        if self.position.state not in (CLOSED, DCA):
+            return      # another order path (a risk exit) already took the position
+        side = self.active_position
+        try:
+            if action == EXIT:
+                print(f"[EXIT] {side.capitalize()} hit locked TP {self.trailing_tp}")
+                self.close_position(side)
+            elif action == DCA_AND_CLOSE:
                 self.dca_and_close()
-                return            
-        
-        else:
-            print(f"[MONITORING] Position: {self.active_position}, Entry: {self.entry_price}, TP: {self.trailing_tp} | Chart: {self.chart_position}")
-            return
-  
-            
-        if self.active_position == "long" and self.trailing_tp > locked_tp:
-            locked_tp = self.trailing_tp
-        elif self.active_position == "short" and self.trailing_tp < locked_tp:
-            locked_tp = self.trailing_tp
-
-        updated_price = client.get_price()
-        if self.active_position == "long" and updated_price <= locked_tp and updated_price > self.tp_target:
-            print(f"[EXIT] Long hit locked TP {locked_tp}, current price {updated_price}")
-            self.tp_count += 1
-            self.close_position("long")
-
-        
-        elif self.active_position == "short" and updated_price >= locked_tp and updated_price < self.tp_target:
-            print(f"[EXIT] Short hit locked TP {locked_tp}, current price {updated_price}")
-            self.tp_count += 1
-            self.close_position("short")
+        except Exception:
+            # on_price already moved to closed/dca; without this the position would never trade again
+            if self.position.state in (CLOSED, DCA):
+                self.position.resume()
+                self.save_state(sync=True)
+            raise
+
+    def check_tp_sl(self, price, received=None):
+        if price is None:
+            return None     # the REST fallback found no price; try again on the next poll
+        action = self.on_price(price, received)
+        if action:
+            self.execute(action)
+        return action
+
+    def _record_trigger_latency(self):
+        if self.triggered_at is not None and self.record_latency:
+            TRIGGER_TO_ORDER.observe(time.perf_counter() - self.triggered_at)
+
+    def _record_exit_latency(self):
+        if self.triggered_at is not None:
+            if self.record_latency:
+                TRIGGER_TO_EXIT.observe(time.perf_counter() - self.triggered_at)
+            self.triggered_at = None
+
+    def _record_signal_latency(self, signal_data):
+        # bot_loop hands the latest signal over again on every pass; only its first order is timed
+        if signal_data is not None and self.record_latency and signal_data.id != self.timed_signal:
+            self.timed_signal = signal_data.id
+            SIGNAL_TO_ORDER.observe(time.time() - signal_data.received_at)
 
     def close_position(self, side):
-        price = client.get_price()
+        price = self.trigger_price or self.client.get_price(self.symbol)
+        portfolio_value = self.exit_snapshot(price)[0]
 
         if side == "short":
-            amount = self.calculate_amount(ORDER_PERCENT, price)  # quote-based
+            amount = self.calculate_amount(self.params["order_percent"], price, portfolio_value)  # quote-based
         else:
-            quote_amount = self.calculate_amount(ORDER_PERCENT, price)
+            quote_amount = self.calculate_amount(self.params["order_percent"], price, portfolio_value)
             amount = quote_amount / price  # convert to base amount   
             
-        success = client.place_order("short" if side == "long" else "long", amount)
-        if not success:
-            print("[ERROR] Failed to close position — order rejected.")
-        self.active_position = None
-        self.entry_price = None
-        self.trailing_tp = None
+        self._record_trigger_latency()
+        cl_ord_id = self._begin_order("close", "short" if side == "long" else "long")
+        report = self._submit_exit("short" if side == "long" else "long", amount, cl_ord_id,
+                                   portfolio_value * self.params["order_percent"])
+        report = self._fill_rest(report, "short" if side == "long" else "long", amount, cl_ord_id)
+        self._record_exit_latency()
+        if not self._exit_done(report, "close"):
+            return False
+        self.tp_count += 1
+        self.position.reset()
         self.open_timestamp = None
         self.chart_position = None
-        self.tp_target = None
 
-        self.tp_threshold = TP_DEFAULT
+        self.tp_threshold = self.params["tp_default"]
         self.sl_threshold = SL_DEFAULT
         self.dca_target = 0        
         
@@ -277,28 +567,64 @@ class TradingBot:
             "profit_capture": self.profit_capture,
             "loss_limit": self.loss_limit            
         }
+        self._end_order()
+        return True
+
+    def _fill_rest(self, report, side, amount, cl_ord_id):
+        # An exit that only part filled (an IOC, or slices the book ran out under)
+        # sends what is left at market; "R" keeps it apart from child and follow-up ids
+        if not report.ok or report.state in (FILLED, UNKNOWN):
+            return report
+        left = amount - report.filled * report.avg_px if side == "long" else amount - report.filled
+        if left <= amount * 1e-6:
+            return report
+        print(f"[EXIT] {self.symbol} {report.cl_ord_id} part filled ({report.state}); sending the rest at market.")
+        return report.merge(self.execution.submit(side, left, self.symbol, MARKET, cl_ord_id + "R"))
+
+    def _exit_done(self, report, action):
+        # True only once the whole exit filled. Otherwise the position stays open
+        # with the coin it still holds and the next tick decides again: the order
+        # went unconfirmed, OKX rejected it, or only part of it filled
+        if report.state == FILLED:
+            return True
+        if report.state == UNKNOWN:
+            print(f"[ERROR] {action.capitalize()} order unconfirmed; keeping the {self.active_position} position open.")
+        elif report.state == REJECTED:
+            print(f"[ERROR] {action.capitalize()} order rejected ({report.msg or report.code}); "
+                  f"keeping the {self.active_position} position open.")
+        else:
+            print(f"[ERROR] {action.capitalize()} order only filled {report.filled} {self.coin} ({report.state}); "
+                  f"keeping the {self.active_position} position open.")
+        self.position.resume()
+        self._end_order()
+        return False
 
     def dca_and_close(self):
-        _, _, _, price = self.get_portfolio_value()
-        
-        dca_amount = self.calculate_amount(DCA_PERCENT, price)
+        if self.trigger_price:
+            portfolio_value, _, _, price = self.exit_snapshot(self.trigger_price)
+        else:
+            portfolio_value, _, _, price = self.get_portfolio_value()
         side = "long" if self.active_position == "long" else "short"
 
         if side == "long":
-            dca_amount = self.calculate_amount(DCA_PERCENT, price)  # quote-based
+            dca_amount = self.calculate_amount(self.params["dca_percent"], price, portfolio_value, side)  # quote-based
         else:
-            quote_amount = self.calculate_amount(DCA_PERCENT, price)
+            quote_amount = self.calculate_amount(self.params["dca_percent"], price, portfolio_value, side)
             dca_amount = quote_amount / price  # convert to base amount
         
-        client.place_order(side, dca_amount)
-        self.active_position = None
-        self.entry_price = None
-        self.trailing_tp = None
+        self._record_trigger_latency()
+        cl_ord_id = self._begin_order("dca", side)
+        report = self._submit(side, dca_amount, cl_ord_id)
+        report = self._fill_rest(report, side, dca_amount, cl_ord_id)
+        self._record_exit_latency()
+        if not self._exit_done(report, "dca"):
+            return False
+        self.dca_count += 1
+        self.position.reset()
         self.chart_position = None
         self.open_timestamp = None
-        self.tp_target = None
 
-        self.tp_threshold = TP_DEFAULT
+        self.tp_threshold = self.params["tp_default"]
         self.sl_threshold = SL_DEFAULT
         self.dca_target = 0        
         
@@ -317,17 +643,16 @@ class TradingBot:
             "profit_capture": self.profit_capture,
             "loss_limit": self.loss_limit            
         }
+        self._end_order()
+        return True
 
     def reset_session(self):
         
-        self.active_position = None
-        self.entry_price = None
-        self.trailing_tp = None
+        self.position.reset()
         self.open_timestamp = None
         self.chart_position = None
-        self.tp_target = None
 
-        self.tp_threshold = TP_DEFAULT
+        self.tp_threshold = self.params["tp_default"]
         self.sl_threshold = SL_DEFAULT
         self.dca_target = 0        
         
@@ -346,3 +671,4 @@ class TradingBot:
             "profit_capture": self.profit_capture,
             "loss_limit": self.loss_limit            
         }
+        self._end_order()